@@ -94,9 +94,17 @@ class Controller(controller.BaseController):
         Queues an image for caching. We do not check to see if
         the image is in the registry here. That is done by the
         prefetcher...
+
+        An optional integer `priority` query parameter moves the
+        image ahead of queued images with a lower priority.
         """
         self._enforce(req)
-        self.cache.queue_image(image_id)
+        try:
+            priority = int(req.params.get('priority', 0))
+        except ValueError:
+            msg = _("priority param must be an integer")
+            raise webob.exc.HTTPBadRequest(explanation=msg)
+        self.cache.queue_image(image_id, priority)
 
     def delete_queued_image(self, req, image_id):
         """
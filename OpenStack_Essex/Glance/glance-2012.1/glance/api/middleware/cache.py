@@ -55,9 +55,10 @@ class CacheFilter(wsgi.Middleware):
         For requests for an image file, we check the local image
         cache. If present, we return the image file, appending
         the image metadata in headers. If not present, we pass
-        the request on to the next application in the pipeline.
+        the request on to the next application in the pipeline,
+        moving the image ahead in the prefetch queue if it is queued.
         """
-        if request.method != 'GET':
+        if request.method not in ('GET', 'HEAD'):
             return None
 
         match = get_images_re.match(request.path)
@@ -73,9 +74,12 @@ class CacheFilter(wsgi.Middleware):
         if '?' in image_id or image_id == 'detail':
             return None
 
-        if self.cache.is_cached(image_id):
+        if not self.cache.is_cached(image_id):
+            self.cache.image_requested(image_id)
+            return None
+
+        if request.method == 'GET':
             logger.debug(_("Cache hit for image '%s'"), image_id)
-            image_iterator = self.get_from_cache(image_id)
             context = request.context
             try:
                 image_meta = registry.get_image_metadata(context, image_id)
@@ -85,6 +89,7 @@ class CacheFilter(wsgi.Middleware):
                     # file size, see LP Bug #900959
                     image_meta['size'] = self.cache.get_image_size(image_id)
 
+                image_iterator = self.get_from_cache(image_id)
                 response = webob.Response(request=request)
                 return self.serializer.show(response, {
                     'image_iterator': image_iterator,
@@ -122,6 +127,9 @@ class CacheFilter(wsgi.Middleware):
                 self.cache.delete_cached_image(image_id)
             return resp
 
+        # The image data has to pass through the caching iterator, so it
+        # cannot be written straight to the client socket
+        request.environ.pop(utils.SOCKET_ENV_KEY, None)
         resp.app_iter = self.cache.get_caching_iter(image_id, resp.app_iter)
         return resp
 
@@ -136,7 +144,22 @@ class CacheFilter(wsgi.Middleware):
 
     def get_from_cache(self, image_id):
         """Called if cache hit"""
-        with self.cache.open_for_read(image_id) as cache_file:
-            chunks = utils.chunkiter(cache_file)
-            for chunk in chunks:
-                yield chunk
+        return CachedImageIterator(self.cache, image_id)
+
+
+class CachedImageIterator(utils.FileIterator):
+
+    """
+    Iterates over a cached image file. The cache hit is recorded once
+    the response has been sent.
+    """
+
+    def __init__(self, cache, image_id):
+        self.reader = cache.open_for_read(image_id)
+        super(CachedImageIterator, self).__init__(self.reader.__enter__())
+
+    def close(self):
+        super(CachedImageIterator, self).close()
+        reader, self.reader = self.reader, None
+        if reader is not None:
+            reader.__exit__(None, None, None)
@@ -919,6 +919,10 @@ class ImageSerializer(wsgi.JSONResponseSerializer):
                 logger.error(msg)
                 raise
 
+            if isinstance(image_iter, utils.FileIterator):
+                # Data sent with sendfile(2) never passes through here
+                bytes_written = image_iter.bytes_sent
+
             if expected_size != bytes_written:
                 msg = _("Backend storage for image %(image_id)s "
                         "disconnected after writing only %(bytes_written)d "
@@ -928,6 +932,8 @@ class ImageSerializer(wsgi.JSONResponseSerializer):
                                              "image %(image_id)s") % locals())
 
         image_iter = result['image_iterator']
+        if isinstance(image_iter, utils.FileIterator):
+            image_iter.use_socket(response.environ)
         # image_meta['size'] is a str
         expected_size = int(image_meta['size'])
         response.app_iter = checked_iter(image_id, expected_size, image_iter)
@@ -44,6 +44,7 @@ class V1Client(base_client.BaseClient):
 
     DEFAULT_PORT = 9292
     DEFAULT_DOC_ROOT = "/v1"
+    POOL_CONNECTIONS = True
 
     def get_images(self, **kwargs):
         """
@@ -235,11 +236,15 @@ class V1Client(base_client.BaseClient):
         num_deleted = data['num_deleted']
         return num_deleted
 
-    def queue_image_for_caching(self, image_id):
+    def queue_image_for_caching(self, image_id, priority=None):
         """
         Queue an image for prefetching into cache
+
+        :param priority: Optional priority; images with a higher priority
+                         are prefetched first
         """
-        self.do_request("PUT", "/queued_images/%s" % image_id)
+        params = {'priority': priority}
+        self.do_request("PUT", "/queued_images/%s" % image_id, params=params)
         return True
 
     def delete_queued_image(self, image_id):
@@ -25,6 +25,8 @@ import functools
 import httplib
 import os
 import select
+import threading
+import time
 import urllib
 import urlparse
 
@@ -47,6 +49,10 @@ from glance.common import exception, utils
 # common chunk size for get and put
 CHUNKSIZE = 65536
 
+# HTTP verbs which may safely be re-sent on a fresh connection when a
+# pooled keep-alive connection turns out to have been closed by the peer
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
 
 def handle_unauthenticated(func):
     """
@@ -194,6 +200,134 @@ class HTTPSClientAuthConnection(httplib.HTTPSConnection):
                                         cert_reqs=ssl.CERT_REQUIRED)
 
 
+class PooledHTTPResponse(httplib.HTTPResponse):
+    """
+    An HTTPResponse which hands its connection back to the pool it
+    was checked out from once the response body has been consumed.
+    """
+
+    release_conn = None
+
+    def close(self):
+        httplib.HTTPResponse.close(self)
+        release_conn, self.release_conn = self.release_conn, None
+        if release_conn is not None:
+            release_conn()
+
+
+class ConnectionPool(object):
+
+    """
+    A pool of idle keep-alive connections to a single endpoint.
+
+    Connections are checked out exclusively by a single caller, so the
+    pool is safe to share between eventlet green threads as well as
+    native threads. The lock is only ever held around list operations
+    and never across any I/O.
+    """
+
+    def __init__(self, connection_type, host, port, connect_kwargs,
+                 max_idle=10, idle_timeout=30):
+        """
+        :param connection_type: httplib connection class to instantiate
+        :param host: The host the connections are made to
+        :param port: The port the connections are made to
+        :param connect_kwargs: Extra keyword arguments to pass to
+                               connection_type
+        :param max_idle: Maximum number of idle connections to keep
+        :param idle_timeout: Seconds after which an idle connection
+                             is discarded rather than reused
+        """
+        self.connection_type = connection_type
+        self.host = host
+        self.port = port
+        self.connect_kwargs = connect_kwargs
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns a tuple of (connection, reused), where reused is True
+        if the connection was taken from the idle pool rather than
+        newly created.
+        """
+        expired = []
+        conn = None
+        deadline = time.time() - self.idle_timeout
+        with self._lock:
+            while self._idle and self._idle[0][1] < deadline:
+                expired.append(self._idle.popleft()[0])
+            if self._idle:
+                conn = self._idle.pop()[0]
+
+        for stale in expired:
+            stale.close()
+
+        if conn is not None:
+            return conn, True
+
+        conn = self.connection_type(self.host, self.port,
+                                    **self.connect_kwargs)
+        if isinstance(conn, httplib.HTTPConnection):
+            conn.response_class = PooledHTTPResponse
+        return conn, False
+
+    def put(self, conn):
+        """
+        Returns a connection to the idle pool, closing it instead if
+        the pool is already full.
+        """
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def release_on_close(self, conn, response):
+        """
+        Arranges for conn to be returned to the pool once response
+        has been fully read. Responses which carry no body are closed,
+        and so released, straight away.
+        """
+        if (not isinstance(response, PooledHTTPResponse) or
+            response.will_close):
+            return
+        response.release_conn = functools.partial(self.put, conn)
+        if response.length == 0:
+            response.close()
+
+    def close(self):
+        """Closes all idle connections held by the pool."""
+        with self._lock:
+            idle = [conn for conn, _last_used in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+
+_CONNECTION_POOLS = {}
+_CONNECTION_POOLS_LOCK = threading.Lock()
+
+
+def get_connection_pool(connection_type, host, port, connect_kwargs,
+                        **kwargs):
+    """
+    Returns the per-process ConnectionPool for the given endpoint,
+    creating it if necessary.
+    """
+    key = (connection_type, host, port,
+           tuple(sorted(connect_kwargs.items())))
+    with _CONNECTION_POOLS_LOCK:
+        pool = _CONNECTION_POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(connection_type, host, port,
+                                  connect_kwargs, **kwargs)
+            _CONNECTION_POOLS[key] = pool
+    return pool
+
+
 class BaseClient(object):
 
     """A base client class"""
@@ -222,6 +356,12 @@ class BaseClient(object):
         httplib.TEMPORARY_REDIRECT,
     )
 
+    # Whether connections should be kept alive and reused across
+    # requests, and how the per-endpoint pool should be bounded
+    POOL_CONNECTIONS = False
+    POOL_MAX_IDLE = 10
+    POOL_IDLE_TIMEOUT = 30
+
     def __init__(self, host, port=None, use_ssl=False, auth_tok=None,
                  creds=None, doc_root=None, key_file=None,
                  cert_file=None, ca_file=None, insecure=False,
@@ -472,7 +612,14 @@ class BaseClient(object):
             if 'x-auth-token' not in headers and self.auth_tok:
                 headers['x-auth-token'] = self.auth_tok
 
-            c = connection_type(url.hostname, url.port, **self.connect_kwargs)
+            if self.POOL_CONNECTIONS:
+                pool = get_connection_pool(connection_type,
+                                           url.hostname, url.port,
+                                           self.connect_kwargs,
+                                           max_idle=self.POOL_MAX_IDLE,
+                                           idle_timeout=self.POOL_IDLE_TIMEOUT)
+            else:
+                pool = None
 
             def _pushing(method):
                 return method.lower() in ('post', 'put')
@@ -496,31 +643,57 @@ class BaseClient(object):
                     connection.send('%x\r\n%s\r\n' % (len(chunk), chunk))
                 connection.send('0\r\n\r\n')
 
-            # Do a simple request or a chunked request, depending
-            # on whether the body param is file-like or iterable and
-            # the method is PUT or POST
-            #
-            if not _pushing(method) or _simple(body):
-                # Simple request...
-                c.request(method, path, body, headers)
-            elif _filelike(body) or self._iterable(body):
-                c.putrequest(method, path)
-
-                for header, value in headers.items():
-                    c.putheader(header, value)
+            def _send(c):
+                # Do a simple request or a chunked request, depending
+                # on whether the body param is file-like or iterable and
+                # the method is PUT or POST
+                #
+                if not _pushing(method) or _simple(body):
+                    # Simple request...
+                    c.request(method, path, body, headers)
+                elif _filelike(body) or self._iterable(body):
+                    c.putrequest(method, path)
+
+                    for header, value in headers.items():
+                        c.putheader(header, value)
+
+                    iter = self.image_iterator(c, headers, body)
+
+                    if self._sendable(body):
+                        # send actual file without copying into userspace
+                        _sendbody(c, iter)
+                    else:
+                        # otherwise iterate and chunk
+                        _chunkbody(c, iter)
+                else:
+                    raise TypeError('Unsupported image type: %s' %
+                                    body.__class__)
 
-                iter = self.image_iterator(c, headers, body)
+                return c.getresponse()
 
-                if self._sendable(body):
-                    # send actual file without copying into userspace
-                    _sendbody(c, iter)
+            while True:
+                if pool is not None:
+                    c, reused = pool.get()
                 else:
-                    # otherwise iterate and chunk
-                    _chunkbody(c, iter)
-            else:
-                raise TypeError('Unsupported image type: %s' % body.__class__)
+                    c = connection_type(url.hostname, url.port,
+                                        **self.connect_kwargs)
+                    reused = False
+
+                try:
+                    res = _send(c)
+                except (socket.error, httplib.BadStatusLine):
+                    c.close()
+                    # A pooled connection may have been dropped by the
+                    # server while idle; replay the request on a fresh
+                    # connection if it is safe to do so
+                    if (reused and _simple(body) and
+                        method.upper() in IDEMPOTENT_METHODS):
+                        continue
+                    raise
+                break
 
-            res = c.getresponse()
+            if pool is not None:
+                pool.release_on_close(c, res)
 
             def _retry(res):
                 return res.getheader('Retry-After')
@@ -0,0 +1,143 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack, LLC
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Streams image data into local files, as done by the filesystem store
+and the image cache.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import sys
+
+import eventlet
+from eventlet import tpool
+
+
+logger = logging.getLogger('glance.common.ingest')
+
+# Allocate the blocks without changing the file size, so a short write
+# does not leave a file padded out with zeroes
+FALLOC_FL_KEEP_SIZE = 1
+
+fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+
+class FallocateWrapper(object):
+
+    """
+    Calls fallocate(2) from libc where it is available, much like Swift's
+    wrapper of the same name
+    """
+
+    def __init__(self):
+        self.func = None
+        libc_name = ctypes.util.find_library('c')
+        if libc_name:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            self.func = getattr(libc, 'fallocate', None)
+        if self.func is None:
+            logger.debug(_("fallocate(2) is not available, image files "
+                           "will not be preallocated"))
+
+    def __call__(self, fd, offset, length):
+        """
+        Preallocates `length` bytes of the file at `offset`
+
+        :retval True if the space was allocated, False if the platform or
+                filesystem does not support it
+        :raises IOError if the filesystem is out of space
+        """
+        if self.func is None or length <= 0:
+            return False
+        ret = self.func(ctypes.c_int(fd),
+                        ctypes.c_int(FALLOC_FL_KEEP_SIZE),
+                        ctypes.c_uint64(offset),
+                        ctypes.c_uint64(length))
+        if ret != 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOSPC, errno.EFBIG):
+                raise IOError(err, os.strerror(err))
+            return False
+        return True
+
+
+fallocate = FallocateWrapper()
+
+
+def _hash_and_write(fp, checksum, chunk):
+    # Runs in a native thread. Both hashlib and file writes release the
+    # GIL for buffers of any real size.
+    if checksum is not None:
+        checksum.update(chunk)
+    fp.write(chunk)
+
+
+def write_iter(fp, image_iter, size=None, checksum=None, sync=False):
+    """
+    Writes the chunks returned by an iterator to a file, starting at the
+    file's current position.
+
+    Each chunk is hashed and written in a native thread while the next
+    chunk is read from `image_iter`, so reading from the network overlaps
+    with hashing and writing to disk. No more than two chunks are held
+    in memory at once.
+
+    :param fp: File object to write to
+    :param image_iter: Iterator returning chunks of image data
+    :param size: If known, the number of bytes to be written, which are
+                 preallocated before writing
+    :param checksum: Optional hashlib object updated with every chunk
+    :param sync: If True, flush the file to disk with a single
+                 fdatasync(2) once all data has been written
+
+    :retval The number of bytes written
+    """
+    if size:
+        fallocate(fp.fileno(), fp.tell(), size)
+
+    bytes_written = 0
+    pending = None
+    try:
+        for chunk in image_iter:
+            if not chunk:
+                continue
+            if pending is not None:
+                pending.wait()
+            pending = eventlet.spawn(tpool.execute, _hash_and_write,
+                                     fp, checksum, chunk)
+            bytes_written += len(chunk)
+    except Exception:
+        exc_info = sys.exc_info()
+        # Make sure the native thread is done with the file before the
+        # caller cleans it up
+        if pending is not None:
+            try:
+                pending.wait()
+            except Exception:
+                pass
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    if pending is not None:
+        pending.wait()
+    fp.flush()
+    if sync:
+        tpool.execute(fdatasync, fp.fileno())
+    return bytes_written
@@ -33,11 +33,21 @@ import iso8601
 
 from glance.common import exception
 
+try:
+    import eventlet.hubs
+    import sendfile
+    SENDFILE_SUPPORTED = True
+except ImportError:
+    SENDFILE_SUPPORTED = False
+
 
 logger = logging.getLogger(__name__)
 
 TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
+# Key under which the API server exposes the client socket in the environ
+SOCKET_ENV_KEY = 'glance.wsgi.socket'
+
 
 def chunkreadable(iter, chunk_size=65536):
     """
@@ -65,6 +75,111 @@ def chunkiter(fp, chunk_size=65536):
             break
 
 
+class FileIterator(object):
+
+    """
+    Iterator over an open file for use as a WSGI response body.
+
+    If use_socket() has been called with an environ in which the server
+    exposed the client socket, only the first chunk is handed to the
+    server, which flushes the response headers along with it, and the
+    rest of the file is written from the page cache to the socket with
+    sendfile(2). Otherwise the file is read in large page-aligned chunks.
+    Without use_socket(), it is read in CHUNKSIZE chunks like any other
+    image iterator.
+    """
+
+    CHUNKSIZE = 65536
+
+    # Used once use_socket() has been called, that is when the file is
+    # being served as a response body
+    RESPONSE_CHUNKSIZE = 1024 * 1024
+
+    # Must be at least the server's minimum_chunk_size, otherwise the
+    # server buffers the first chunk instead of writing out the headers
+    HEADER_CHUNKSIZE = 65536
+
+    def __init__(self, fp, size=None):
+        """
+        :param fp: File object to read from
+        :param size: Number of bytes to send, or None to send up to the
+                     end of the file
+        """
+        self.fp = fp
+        self.size = size
+        self.environ = None
+        self.bytes_sent = 0
+
+    def use_socket(self, environ):
+        """
+        Send the file with sendfile(2) if the server has exposed the
+        client socket in environ, and read it in RESPONSE_CHUNKSIZE
+        chunks otherwise. The socket is looked up when iteration starts,
+        so middleware may still remove it to prevent this.
+        """
+        self.environ = environ
+
+    def seek(self, offset):
+        """Position the internal file pointer at offset"""
+        self.fp.seek(offset)
+
+    def __iter__(self):
+        sock = None
+        if SENDFILE_SUPPORTED and self.environ is not None:
+            sock = self.environ.get(SOCKET_ENV_KEY)
+
+        try:
+            if self.environ is None:
+                chunksize = self.CHUNKSIZE
+            elif sock is None:
+                chunksize = self.RESPONSE_CHUNKSIZE
+            else:
+                chunksize = self.HEADER_CHUNKSIZE
+            while True:
+                chunk = self.fp.read(chunksize)
+                if not chunk:
+                    break
+                self.bytes_sent += len(chunk)
+                yield chunk
+                if sock is not None:
+                    self._sendfile(sock)
+                    break
+        finally:
+            self.close()
+
+    def _sendfile(self, sock):
+        sock_fd = sock.fileno()
+        file_fd = self.fp.fileno()
+        offset = self.fp.tell()
+        if self.size is None:
+            end = os.fstat(file_fd).st_size
+        else:
+            end = offset - self.bytes_sent + self.size
+
+        while offset < end:
+            try:
+                sent = sendfile.sendfile(sock_fd, file_fd, offset,
+                                         min(end - offset,
+                                             self.RESPONSE_CHUNKSIZE))
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EBUSY):
+                    eventlet.hubs.trampoline(sock_fd, write=True)
+                    continue
+                raise
+            if sent == 0:
+                # The file is shorter than expected; let the caller
+                # notice the short count in bytes_sent
+                break
+            offset += sent
+            self.bytes_sent += sent
+
+    def close(self):
+        """Close the internal file pointer"""
+        if self.fp:
+            self.fp.close()
+            self.fp = None
+
+
 def image_meta_to_http_headers(image_meta):
     """
     Returns a set of image metadata into a dict
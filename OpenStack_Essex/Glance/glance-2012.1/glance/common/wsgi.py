@@ -134,6 +134,21 @@ def get_socket(conf, default_port):
     return sock
 
 
+class HttpProtocol(eventlet.wsgi.HttpProtocol):
+    """
+    HttpProtocol which exposes the client socket to the application, so
+    that file-backed responses can be sent with sendfile(2). The socket
+    is not exposed for SSL connections, whose data must pass through
+    userspace to be encrypted.
+    """
+
+    def get_environ(self):
+        env = eventlet.wsgi.HttpProtocol.get_environ(self)
+        if not isinstance(self.connection, ssl.SSLSocket):
+            env[utils.SOCKET_ENV_KEY] = self.connection
+        return env
+
+
 class Server(object):
     """Server class to manage multiple WSGI sockets and applications."""
 
@@ -232,7 +247,8 @@ class Server(object):
         self.pool = eventlet.GreenPool(size=self.threads)
         try:
             eventlet.wsgi.server(self.sock, self.application,
-                    log=WritableLogger(self.logger), custom_pool=self.pool)
+                    log=WritableLogger(self.logger), custom_pool=self.pool,
+                    protocol=HttpProtocol)
         except socket.error, err:
             if err[0] != errno.EINVAL:
                 raise
@@ -242,7 +258,8 @@ class Server(object):
         """Start a WSGI server in a new green thread."""
         self.logger.info(_("Starting single process server"))
         eventlet.wsgi.server(sock, application, custom_pool=self.pool,
-                             log=WritableLogger(self.logger))
+                             log=WritableLogger(self.logger),
+                             protocol=HttpProtocol)
 
 
 class Middleware(object):
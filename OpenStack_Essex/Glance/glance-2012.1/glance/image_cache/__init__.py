@@ -23,6 +23,7 @@ import logging
 
 from glance.common import cfg
 from glance.common import exception
+from glance.common import ingest
 from glance.common import utils
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,7 @@ class ImageCache(object):
         cfg.IntOpt('image_cache_max_size', default=10 * (1024 ** 3)),  # 10 GB
         cfg.IntOpt('image_cache_stall_time', default=86400),  # 24 hours
         cfg.StrOpt('image_cache_dir'),
+        cfg.IntOpt('image_cache_requested_priority', default=1),
         ]
 
     def __init__(self, conf):
@@ -193,7 +195,7 @@ class ImageCache(object):
         """
         self.driver.clean(stall_time)
 
-    def queue_image(self, image_id):
+    def queue_image(self, image_id, priority=0):
         """
         This adds a image to be cache to the queue.
 
@@ -201,8 +203,27 @@ class ImageCache(object):
         cached, we return False, True otherwise
 
         :param image_id: Image ID
+        :param priority: Images with a higher priority are fetched first
         """
-        return self.driver.queue_image(image_id)
+        return self.driver.queue_image(image_id, priority)
+
+    def image_requested(self, image_id):
+        """
+        Called when an image that is not cached is asked for. If the
+        image is queued, it is moved ahead of the images queued with a
+        lower priority than image_cache_requested_priority, so it is
+        prefetched sooner. Returns True if its priority was raised.
+
+        :param image_id: Image ID
+        """
+        priority = self.conf.image_cache_requested_priority
+        current = self.driver.get_queue_priority(image_id)
+        if current is None or current >= priority:
+            return False
+        logger.debug(_("Image '%(image_id)s' was requested, raising its "
+                       "queue priority to %(priority)d"), locals())
+        self.driver.write_queue_entry(image_id, priority)
+        return True
 
     def get_caching_iter(self, image_id, image_iter):
         """
@@ -238,22 +259,30 @@ class ImageCache(object):
 
         return tee_iter(image_id)
 
-    def cache_image_iter(self, image_id, image_iter):
+    def cache_image_iter(self, image_id, image_iter, offset=0,
+                         image_size=None):
         """
         Cache an image with supplied iterator.
 
         :param image_id: Image ID
         :param image_file: Iterator retrieving image chunks
+        :param offset: If non-zero, the iterator supplies the image from
+                       this offset onwards and is appended to a partially
+                       cached image file of that size
+        :param image_size: If known, the size of the image, used to
+                           preallocate the cache file
 
         :retval True if image file was cached, False otherwise
         """
-        if not self.driver.is_cacheable(image_id):
+        if offset:
+            if self.driver.is_cached(image_id):
+                return False
+        elif not self.driver.is_cacheable(image_id):
             return False
 
-        with self.driver.open_for_write(image_id) as cache_file:
-            for chunk in image_iter:
-                cache_file.write(chunk)
-            cache_file.flush()
+        size = image_size - offset if image_size else None
+        with self.driver.open_for_write(image_id, offset) as cache_file:
+            ingest.write_iter(cache_file, image_iter, size=size)
         return True
 
     def cache_image_file(self, image_id, image_file):
@@ -291,10 +320,21 @@ class ImageCache(object):
         """
         return self.driver.get_image_size(image_id)
 
+    def get_incomplete_size(self, image_id, older_than=None):
+        """
+        Return the size of a partially cached image file for an image
+        with supplied identifier, or 0 if there is none.
+
+        :param image_id: Image ID
+        :param older_than: If supplied, partial files modified after
+                           this timestamp are ignored
+        """
+        return self.driver.get_incomplete_size(image_id, older_than)
+
     def get_queued_images(self):
         """
         Returns a list of image IDs that are in the queue. The
-        list should be sorted by the time the image ID was inserted
-        into the queue.
+        list should be sorted by priority and then by the time the
+        image ID was inserted into the queue.
         """
         return self.driver.get_queued_images()
@@ -156,14 +156,82 @@ class Driver(object):
         """
         raise NotImplementedError
 
-    def queue_image(self, image_id):
+    def queue_image(self, image_id, priority=0):
         """
         Puts an image identifier in a queue for caching. Return True
         on successful add to the queue, False otherwise...
 
         :param image_id: Image ID
+        :param priority: Images with a higher priority are fetched first
         """
 
+    def get_queue_priority(self, image_id):
+        """
+        Return the priority an image was queued with, or None if the
+        image is not in the queue.
+
+        :param image_id: Image ID
+        """
+        return read_queue_priority(self.get_image_filepath(image_id, 'queue'))
+
+    def write_queue_entry(self, image_id, priority=0):
+        """
+        Writes the queue entry for an image, recording its priority.
+        Rewriting an existing entry keeps its place among the images
+        queued with the same priority.
+
+        :param image_id: Image ID
+        :param priority: Priority to record for the image
+        """
+        path = self.get_image_filepath(image_id, 'queue')
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        with open(path, "w") as f:
+            f.write(str(priority))
+        if st is not None:
+            # The mtime is the time the image was queued
+            os.utime(path, (st.st_atime, st.st_mtime))
+
+    def order_queue_files(self, paths):
+        """
+        Returns the image IDs for the supplied queue files, highest
+        priority first and then in the order they were queued.
+
+        :param paths: Iterable of queue file paths
+        """
+        items = []
+        for path in paths:
+            priority = read_queue_priority(path)
+            if priority is None:
+                # Dequeued while we were looking at it
+                continue
+            items.append((-priority, os.path.getmtime(path),
+                          os.path.basename(path)))
+
+        items.sort()
+        return [item[2] for item in items]
+
+    def get_incomplete_size(self, image_id, older_than=None):
+        """
+        Return the size of a partially written image file for an image
+        with supplied identifier, or 0 if there is none.
+
+        :param image_id: Image ID
+        :param older_than: If supplied, partial files modified after
+                           this timestamp are ignored, as they may
+                           still be being written to
+        """
+        path = self.get_image_filepath(image_id, 'incomplete')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+        if older_than is not None and stat.st_mtime > older_than:
+            return 0
+        return stat.st_size
+
     def clean(self, stall_time=None):
         """
         Dependent on the driver, clean up and destroy any invalid or incomplete
@@ -178,12 +246,14 @@ class Driver(object):
         """
         raise NotImplementedError
 
-    def open_for_write(self, image_id):
+    def open_for_write(self, image_id, offset=0):
         """
         Open a file for writing the image file for an image
         with supplied identifier.
 
         :param image_id: Image ID
+        :param offset: If non-zero, resume writing a partially written
+                       image file at this offset
         """
         raise NotImplementedError
 
@@ -224,3 +294,20 @@ class Driver(object):
         into the queue.
         """
         raise NotImplementedError
+
+
+def read_queue_priority(path):
+    """
+    Return the priority recorded in a queue file, or None if the
+    file does not exist. Queue files written before priorities were
+    introduced are empty and are treated as priority 0.
+    """
+    try:
+        with open(path) as f:
+            data = f.read().strip()
+    except IOError:
+        return None
+    try:
+        return int(data or 0)
+    except ValueError:
+        return 0
@@ -277,12 +277,14 @@ class Driver(base.Driver):
         return image_id, file_info[stat.ST_SIZE]
 
     @contextmanager
-    def open_for_write(self, image_id):
+    def open_for_write(self, image_id, offset=0):
         """
         Open a file for writing the image file for an image
         with supplied identifier.
 
         :param image_id: Image ID
+        :param offset: If non-zero, resume writing a partially written
+                       image file at this offset
         """
         incomplete_path = self.get_image_filepath(image_id, 'incomplete')
 
@@ -322,8 +324,12 @@ class Driver(base.Driver):
                            WHERE image_id = ?""", (image_id, ))
                 db.commit()
 
+        mode = 'r+b' if offset else 'wb'
         try:
-            with open(incomplete_path, 'wb') as cache_file:
+            with open(incomplete_path, mode) as cache_file:
+                if offset:
+                    cache_file.seek(offset)
+                    cache_file.truncate()
                 yield cache_file
         except Exception as e:
             rollback(e)
@@ -373,14 +379,16 @@ class Driver(base.Driver):
         finally:
             conn.close()
 
-    def queue_image(self, image_id):
+    def queue_image(self, image_id, priority=0):
         """
         This adds a image to be cache to the queue.
 
         If the image already exists in the queue or has already been
-        cached, we return False, True otherwise
+        cached, we return False, True otherwise. Queueing an image that
+        is already queued with a higher priority raises its priority.
 
         :param image_id: Image ID
+        :param priority: Images with a higher priority are fetched first
         """
         if self.is_cached(image_id):
             msg = _("Not queueing image '%s'. Already cached.") % image_id
@@ -394,16 +402,17 @@ class Driver(base.Driver):
             return False
 
         if self.is_queued(image_id):
+            current = self.get_queue_priority(image_id)
+            if current is not None and priority > current:
+                logger.debug(_("Raising priority of queued image "
+                               "'%(image_id)s' to %(priority)d."), locals())
+                self.write_queue_entry(image_id, priority)
+                return True
             msg = _("Not queueing image '%s'. Already queued.") % image_id
             logger.warn(msg)
             return False
 
-        path = self.get_image_filepath(image_id, 'queue')
-
-        # Touch the file to add it to the queue
-        with open(path, "w") as f:
-            pass
-
+        self.write_queue_entry(image_id, priority)
         return True
 
     def delete_invalid_files(self):
@@ -429,17 +438,10 @@ class Driver(base.Driver):
     def get_queued_images(self):
         """
         Returns a list of image IDs that are in the queue. The
-        list should be sorted by the time the image ID was inserted
-        into the queue.
+        list is sorted by priority and then by the time the image ID
+        was inserted into the queue.
         """
-        files = [f for f in self.get_cache_files(self.queue_dir)]
-        items = []
-        for path in files:
-            mtime = os.path.getmtime(path)
-            items.append((mtime, os.path.basename(path)))
-
-        items.sort()
-        return [image_id for (mtime, image_id) in items]
+        return self.order_queue_files(self.get_cache_files(self.queue_dir))
 
     def get_cache_files(self, basepath):
         """
@@ -20,9 +20,11 @@ Prefetches images into the Image Cache
 """
 
 import logging
+import time
 
 import eventlet
 
+from glance.common import cfg
 from glance.common import exception
 from glance.image_cache import ImageCache
 from glance import registry
@@ -39,14 +41,102 @@ from glance.store import get_from_backend
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter(object):
+
+    """
+    Token bucket shared by all prefetch workers, bounding the aggregate
+    rate at which image data is pulled into the cache.
+    """
+
+    def __init__(self, rate):
+        """
+        :param rate: Maximum bytes per second, or 0 for no limit
+        """
+        self.rate = rate
+        self.allowance = float(rate)
+        self.last_check = time.time()
+
+    def consume(self, nbytes):
+        """
+        Account for nbytes having been read, sleeping the calling
+        green thread for as long as the limit has been exceeded.
+        """
+        if not self.rate:
+            return
+
+        now = time.time()
+        self.allowance = min(self.rate, self.allowance +
+                             (now - self.last_check) * self.rate)
+        self.last_check = now
+        self.allowance -= nbytes
+        if self.allowance < 0:
+            eventlet.sleep(-self.allowance / self.rate)
+
+
+def skip_bytes(image_iter, nbytes):
+    """
+    Return an iterator over the chunks of image_iter with the first
+    nbytes bytes of data discarded.
+    """
+    for chunk in image_iter:
+        if nbytes >= len(chunk):
+            nbytes -= len(chunk)
+            continue
+        if nbytes:
+            chunk = chunk[nbytes:]
+            nbytes = 0
+        yield chunk
+
+
 class Prefetcher(object):
 
+    opts = [
+        cfg.IntOpt('image_cache_prefetch_workers', default=4),
+        cfg.IntOpt('image_cache_prefetch_rate_limit', default=0),
+        cfg.IntOpt('image_cache_prefetch_resume_grace', default=300),
+        ]
+
     def __init__(self, conf, **local_conf):
         self.conf = conf
+        self.conf.register_opts(self.opts)
         glance.store.create_stores(conf)
         self.cache = ImageCache(conf)
         registry.configure_registry_client(conf)
         registry.configure_registry_admin_creds(conf)
+        self.rate_limiter = RateLimiter(conf.image_cache_prefetch_rate_limit)
+        self.progress = {}
+
+    def _get_resume_offset(self, image_id, image_size):
+        """
+        Returns the number of bytes of a previous, interrupted fetch of
+        the image which can be kept, or 0 to fetch from the start.
+        """
+        older_than = time.time() - self.conf.image_cache_prefetch_resume_grace
+        offset = self.cache.get_incomplete_size(image_id, older_than)
+        if offset and image_size and offset >= image_size:
+            offset = 0
+        return offset
+
+    def _fetch_iter(self, image_id, image_iter, offset, image_size):
+        """
+        Wraps the backend iterator for an image, applying the aggregate
+        rate limit and logging progress every 10%.
+        """
+        fetched = offset
+        reported = 0
+        self.progress[image_id] = (fetched, image_size)
+        for chunk in image_iter:
+            self.rate_limiter.consume(len(chunk))
+            fetched += len(chunk)
+            self.progress[image_id] = (fetched, image_size)
+            if image_size:
+                percent = fetched * 100 / image_size
+                if percent >= reported + 10:
+                    reported = percent - percent % 10
+                    logger.info(_("Prefetching image '%(image_id)s': "
+                                  "%(fetched)d of %(image_size)d bytes "
+                                  "(%(percent)d%%)"), locals())
+            yield chunk
 
     def fetch_image_into_cache(self, image_id):
         ctx = context.RequestContext(is_admin=True, show_deleted=True)
@@ -63,8 +153,24 @@ class Prefetcher(object):
             return False
 
         image_data, image_size = get_from_backend(image_meta['location'])
-        logger.debug(_("Caching image '%s'"), image_id)
-        self.cache.cache_image_iter(image_id, image_data)
+        offset = self._get_resume_offset(image_id, image_size)
+        if offset:
+            logger.debug(_("Resuming caching of image '%(image_id)s' "
+                           "at byte %(offset)d"), locals())
+            if hasattr(image_data, 'seek'):
+                image_data.seek(offset)
+            else:
+                image_data = skip_bytes(image_data, offset)
+        else:
+            logger.debug(_("Caching image '%s'"), image_id)
+
+        image_iter = self._fetch_iter(image_id, image_data, offset,
+                                      image_size)
+        try:
+            self.cache.cache_image_iter(image_id, image_iter, offset,
+                                        image_size)
+        finally:
+            self.progress.pop(image_id, None)
         return True
 
     def run(self):
@@ -77,7 +183,11 @@ class Prefetcher(object):
         num_images = len(images)
         logger.debug(_("Found %d images to prefetch"), num_images)
 
-        pool = eventlet.GreenPool(num_images)
+        # Images are handed to the workers in queue order, so with a
+        # bounded pool the highest priority images are fetched first
+        workers = max(1, min(num_images,
+                             self.conf.image_cache_prefetch_workers))
+        pool = eventlet.GreenPool(workers)
         results = pool.imap(self.fetch_image_into_cache, images)
         successes = sum([1 for r in results if r is True])
         if successes != num_images:
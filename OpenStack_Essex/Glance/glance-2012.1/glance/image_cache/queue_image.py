@@ -40,7 +40,7 @@ class Queuer(object):
         registry.configure_registry_client(conf)
         registry.configure_registry_admin_creds(conf)
 
-    def queue_image(self, image_id):
+    def queue_image(self, image_id, priority=0):
         ctx = context.RequestContext(is_admin=True, show_deleted=True)
         try:
             image_meta = registry.get_image_metadata(ctx, image_id)
@@ -54,7 +54,7 @@ class Queuer(object):
             return False
 
         logger.debug(_("Queueing image '%s'"), image_id)
-        self.cache.queue_image(image_id)
+        self.cache.queue_image(image_id, priority)
         return True
 
     def run(self, images):
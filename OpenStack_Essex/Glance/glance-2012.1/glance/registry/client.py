@@ -32,6 +32,7 @@ class RegistryClient(BaseClient):
     """A client for the Registry image metadata service"""
 
     DEFAULT_PORT = 9191
+    POOL_CONNECTIONS = True
 
     def __init__(self, host=None, port=None, metadata_encryption_key=None,
                  **kwargs):
@@ -16,7 +16,6 @@
 #    under the License.
 
 import logging
-import os
 import sys
 import time
 
@@ -262,20 +261,12 @@ def schedule_delete_from_backend(uri, conf, context, image_id, **kwargs):
             # avoid falling through to the delayed deletion logic
             return
 
+    # Imported here as the scrubber module imports the store drivers
+    from glance.store import scrubber
+
     datadir = get_scrubber_datadir(conf)
     delete_time = time.time() + conf.scrub_time
-    file_path = os.path.join(datadir, str(image_id))
-    utils.safe_mkdirs(datadir)
-
-    if os.path.exists(file_path):
-        msg = _("Image id %(image_id)s already queued for delete") % {
-                'image_id': image_id}
-        raise exception.Duplicate(msg)
-
-    with open(file_path, 'w') as f:
-        f.write('\n'.join([uri, str(int(delete_time))]))
-    os.chmod(file_path, 0600)
-    os.utime(file_path, (delete_time, delete_time))
+    scrubber.ScrubberQueue(datadir).add(image_id, uri, delete_time)
 
     registry.update_image_metadata(context, image_id,
                                    {'status': 'pending_delete'})
@@ -27,6 +27,7 @@ import urlparse
 
 from glance.common import cfg
 from glance.common import exception
+from glance.common import ingest
 from glance.common import utils
 import glance.store
 import glance.store.base
@@ -62,36 +63,16 @@ class StoreLocation(glance.store.location.StoreLocation):
         self.path = path
 
 
-class ChunkedFile(object):
+class ChunkedFile(utils.FileIterator):
 
     """
     We send this back to the Glance API server as
     something that can iterate over a large file
     """
 
-    CHUNKSIZE = 65536
-
     def __init__(self, filepath):
         self.filepath = filepath
-        self.fp = open(self.filepath, 'rb')
-
-    def __iter__(self):
-        """Return an iterator over the image file"""
-        try:
-            while True:
-                chunk = self.fp.read(ChunkedFile.CHUNKSIZE)
-                if chunk:
-                    yield chunk
-                else:
-                    break
-        finally:
-            self.close()
-
-    def close(self):
-        """Close the internal file pointer"""
-        if self.fp:
-            self.fp.close()
-            self.fp = None
+        super(ChunkedFile, self).__init__(open(self.filepath, 'rb'))
 
 
 class Store(glance.store.base.Store):
@@ -195,14 +176,12 @@ class Store(glance.store.base.Store):
                                       % filepath)
 
         checksum = hashlib.md5()
-        bytes_written = 0
         try:
             with open(filepath, 'wb') as f:
-                for buf in utils.chunkreadable(image_file,
-                                              ChunkedFile.CHUNKSIZE):
-                    bytes_written += len(buf)
-                    checksum.update(buf)
-                    f.write(buf)
+                bytes_written = ingest.write_iter(
+                        f, utils.chunkreadable(image_file,
+                                               ChunkedFile.CHUNKSIZE),
+                        size=image_size, checksum=checksum, sync=True)
         except IOError as e:
             if e.errno in [errno.EFBIG, errno.ENOSPC]:
                 raise exception.StorageFull()
@@ -16,8 +16,10 @@
 #    under the License.
 
 import calendar
+from contextlib import contextmanager
 import eventlet
 import logging
+import sqlite3
 import time
 import os
 
@@ -28,7 +30,9 @@ import glance.store.swift
 from glance import registry
 from glance import store
 from glance.common import cfg
+from glance.common import exception
 from glance.common import utils
+from glance.image_cache.drivers.sqlite import SqliteConnection
 from glance.registry import client
 
 
@@ -60,12 +64,147 @@ class Daemon(object):
         logger.debug(_("Next run scheduled in %s seconds") % self.wakeup_time)
 
 
+class ScrubberQueue(object):
+
+    """
+    The queue of images pending deletion, kept in an SQLite database in
+    the scrubber datadir and indexed on the time each image becomes due,
+    so that a run only reads the entries it is going to scrub.
+    """
+
+    DB_NAME = "scrubber.db"
+
+    def __init__(self, datadir):
+        self.datadir = datadir
+        self.db_path = os.path.join(datadir, self.DB_NAME)
+        utils.safe_mkdirs(datadir)
+
+        with self.get_db() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS pending_deletes (
+                    image_id TEXT PRIMARY KEY,
+                    uri TEXT NOT NULL,
+                    delete_time INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_pending_deletes_delete_time
+                    ON pending_deletes (delete_time);
+            """)
+
+    @contextmanager
+    def get_db(self):
+        """
+        Returns a context manager that produces a database connection that
+        commits on success, rolls back if an error occurs and self-closes
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               factory=SqliteConnection)
+        conn.text_factory = str
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        try:
+            yield conn
+            conn.commit()
+        except sqlite3.DatabaseError, e:
+            msg = _("Error executing SQLite call. Got error: %s") % e
+            logger.error(msg)
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def add(self, image_id, uri, delete_time):
+        """
+        Queues an image for deletion at `delete_time`
+
+        :raises `glance.common.exception.Duplicate` if the image is
+                already queued
+        """
+        try:
+            with self.get_db() as db:
+                db.execute("""INSERT INTO pending_deletes
+                              (image_id, uri, delete_time)
+                              VALUES (?, ?, ?)""",
+                           (str(image_id), uri, int(delete_time)))
+        except sqlite3.IntegrityError:
+            msg = _("Image id %(image_id)s already queued for delete") % {
+                    'image_id': image_id}
+            raise exception.Duplicate(msg)
+
+    def get_due(self, now):
+        """
+        Returns a list of (image_id, uri) tuples for the images whose
+        delete time has passed, oldest first
+        """
+        with self.get_db() as db:
+            rows = db.execute("""SELECT image_id, uri FROM pending_deletes
+                                 WHERE delete_time <= ?
+                                 ORDER BY delete_time""", (int(now),))
+            return [tuple(row) for row in rows]
+
+    def is_queued(self, image_id):
+        """
+        Returns True if the image is queued for deletion, False otherwise
+        """
+        with self.get_db() as db:
+            row = db.execute("""SELECT 1 FROM pending_deletes
+                                WHERE image_id = ?""",
+                             (str(image_id),)).fetchone()
+            return row is not None
+
+    def get_queued_ids(self):
+        """
+        Returns the set of the ids of all the images queued for deletion
+        """
+        with self.get_db() as db:
+            rows = db.execute("SELECT image_id FROM pending_deletes")
+            return set(row[0] for row in rows)
+
+    def remove(self, image_id):
+        """
+        Removes an image from the queue
+        """
+        with self.get_db() as db:
+            db.execute("DELETE FROM pending_deletes WHERE image_id = ?",
+                       (str(image_id),))
+
+    def import_queue_files(self, skip=()):
+        """
+        Moves any per-image queue files left in the datadir by earlier
+        releases into the database, removing each file once it is queued.
+
+        :param skip: File names in the datadir which are not queue files
+        :retval Number of queue files imported
+        """
+        skip = set(skip) | set([self.DB_NAME, self.DB_NAME + '-journal'])
+        imported = 0
+        for id in os.listdir(self.datadir):
+            file_path = os.path.join(self.datadir, id)
+            if id in skip or not os.path.isfile(file_path):
+                continue
+
+            try:
+                uri, delete_time = read_queue_file(file_path)
+            except (IOError, ValueError), e:
+                msg = _("Unable to read queue file %(file_path)s: %(e)s")
+                logger.error(msg % locals())
+                continue
+
+            try:
+                self.add(id, uri, delete_time)
+            except exception.Duplicate:
+                pass
+            utils.safe_remove(file_path)
+            imported += 1
+        return imported
+
+
 class Scrubber(object):
     CLEANUP_FILE = ".cleanup"
 
     opts = [
         cfg.BoolOpt('cleanup_scrubber', default=False),
-        cfg.IntOpt('cleanup_scrubber_time', default=86400)
+        cfg.IntOpt('cleanup_scrubber_time', default=86400),
+        cfg.IntOpt('scrubber_delete_concurrency', default=10)
         ]
 
     def __init__(self, conf, **local_conf):
@@ -75,17 +214,20 @@ class Scrubber(object):
         self.datadir = store.get_scrubber_datadir(conf)
         self.cleanup = self.conf.cleanup_scrubber
         self.cleanup_time = self.conf.cleanup_scrubber_time
+        self.delete_concurrency = max(
+            1, self.conf.scrubber_delete_concurrency)
 
         host, port = registry.get_registry_addr(conf)
 
         logger.info(_("Initializing scrubber with conf: %s") %
                     {'datadir': self.datadir, 'cleanup': self.cleanup,
                      'cleanup_time': self.cleanup_time,
+                     'delete_concurrency': self.delete_concurrency,
                      'registry_host': host, 'registry_port': port})
 
         self.registry = client.RegistryClient(host, port)
 
-        utils.safe_mkdirs(self.datadir)
+        self.queue = ScrubberQueue(self.datadir)
 
         store.create_stores(conf)
 
@@ -96,43 +238,45 @@ class Scrubber(object):
             logger.info(_("%s does not exist") % self.datadir)
             return
 
-        delete_work = []
-        for root, dirs, files in os.walk(self.datadir):
-            for id in files:
-                if id == self.CLEANUP_FILE:
-                    continue
-
-                file_name = os.path.join(root, id)
-                delete_time = os.stat(file_name).st_mtime
-
-                if delete_time > now:
-                    continue
-
-                uri, delete_time = read_queue_file(file_name)
+        imported = self.queue.import_queue_files(skip=[self.CLEANUP_FILE])
+        if imported:
+            logger.info(_("Imported %s queue files") % imported)
 
-                if delete_time > now:
-                    continue
-
-                delete_work.append((id, uri, now))
+        # The daemon's pool is sized for running the application; the
+        # backend deletes themselves get a pool of their own so that a
+        # large backlog does not flood the stores or the registry.
+        delete_pool = eventlet.greenpool.GreenPool(self.delete_concurrency)
 
+        delete_work = self.queue.get_due(now)
         logger.info(_("Deleting %s images") % len(delete_work))
-        pool.starmap(self._delete, delete_work)
+        self._delete_all(delete_pool, delete_work)
 
         if self.cleanup:
-            self._cleanup(pool)
+            self._cleanup(delete_pool)
+
+    def _delete_all(self, pool, delete_work):
+        # spawn_n blocks while the pool is full, so no more than the
+        # pool's size of deletes are ever in flight. An image whose
+        # delete fails stays queued and is retried on the next run.
+        for id, uri in delete_work:
+            pool.spawn_n(self._delete, id, uri)
+        pool.waitall()
 
-    def _delete(self, id, uri, now):
-        file_path = os.path.join(self.datadir, str(id))
+    def _delete(self, id, uri):
         try:
             logger.debug(_("Deleting %(uri)s") % {'uri': uri})
             store.delete_from_backend(uri)
         except store.UnsupportedBackend:
             msg = _("Failed to delete image from store (%(uri)s).")
             logger.error(msg % {'uri': uri})
-            write_queue_file(file_path, uri, now)
+            # Leave the image queued so that the next run retries it
+            return
+        except exception.NotFound:
+            msg = _("Image already removed from store (%(uri)s).")
+            logger.info(msg % {'uri': uri})
 
         self.registry.update_image(id, {'status': 'deleted'})
-        utils.safe_remove(file_path)
+        self.queue.remove(id)
 
     def _cleanup(self, pool):
         now = time.time()
@@ -153,12 +297,18 @@ class Scrubber(object):
                    'status': 'pending_delete'}
         pending_deletes = self.registry.get_images_detailed(filters=filters)
 
+        # Images still in the queue are scrubbed once they are due
+        queued_ids = self.queue.get_queued_ids()
+
         delete_work = []
         for pending_delete in pending_deletes:
             deleted_at = pending_delete.get('deleted_at')
             if not deleted_at:
                 continue
 
+            if str(pending_delete['id']) in queued_ids:
+                continue
+
             time_fmt = "%Y-%m-%dT%H:%M:%S"
             delete_time = calendar.timegm(time.strptime(deleted_at,
                                                         time_fmt))
@@ -167,11 +317,10 @@ class Scrubber(object):
                 continue
 
             delete_work.append((pending_delete['id'],
-                                pending_delete['location'],
-                                now))
+                                pending_delete['location']))
 
         logger.info(_("Deleting %s images") % len(delete_work))
-        pool.starmap(self._delete, delete_work)
+        self._delete_all(pool, delete_work)
 
 
 def read_queue_file(file_path):
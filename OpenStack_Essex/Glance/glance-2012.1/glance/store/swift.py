@@ -25,6 +25,8 @@ import logging
 import math
 import urlparse
 
+import eventlet
+
 from glance.common import cfg
 from glance.common import exception
 import glance.store
@@ -39,6 +41,7 @@ except ImportError:
 DEFAULT_CONTAINER = 'glance'
 DEFAULT_LARGE_OBJECT_SIZE = 5 * 1024  # 5GB
 DEFAULT_LARGE_OBJECT_CHUNK_SIZE = 200  # 200M
+DEFAULT_DELETE_CONCURRENCY = 10
 ONE_MB = 1000 * 1024
 
 logger = logging.getLogger('glance.store.swift')
@@ -200,12 +203,16 @@ class Store(glance.store.base.Store):
         cfg.IntOpt('swift_store_large_object_chunk_size',
                    default=DEFAULT_LARGE_OBJECT_CHUNK_SIZE),
         cfg.BoolOpt('swift_store_create_container_on_put', default=False),
+        cfg.IntOpt('swift_store_delete_concurrency',
+                   default=DEFAULT_DELETE_CONCURRENCY),
         ]
 
     def configure(self):
         self.conf.register_opts(self.opts)
         self.snet = self.conf.swift_enable_snet
         self.auth_version = self._option_get('swift_store_auth_version')
+        self.delete_concurrency = max(
+            1, self.conf.swift_store_delete_concurrency)
 
     def configure_add(self):
         """
@@ -297,9 +304,13 @@ class Store(glance.store.base.Store):
         except Exception:
             return 0
 
-    def _make_swift_connection(self, auth_url, user, key):
+    def _make_swift_connection(self, auth_url, user, key,
+                               preauthurl=None, preauthtoken=None):
         """
         Creates a connection using the Swift client library.
+
+        If `preauthurl` and `preauthtoken` are given, the connection
+        reuses them instead of authenticating again.
         """
         snet = self.snet
         auth_version = self.auth_version
@@ -309,6 +320,7 @@ class Store(glance.store.base.Store):
                      locals())
         return swift_client.Connection(
             authurl=auth_url, user=user, key=key, snet=snet,
+            preauthurl=preauthurl, preauthtoken=preauthtoken,
             auth_version=auth_version)
 
     def _option_get(self, param):
@@ -494,16 +506,14 @@ class Store(glance.store.base.Store):
             if manifest:
                 # Delete all the chunks before the object manifest itself
                 obj_container, obj_prefix = manifest.split('/', 1)
-                for segment in swift_conn.get_container(obj_container,
-                                                        prefix=obj_prefix)[1]:
-                    # TODO(jaypipes): This would be an easy area to parallelize
-                    # since we're simply sending off parallelizable requests
-                    # to Swift to delete stuff. It's not like we're going to
-                    # be hogging up network or file I/O here...
-                    swift_conn.delete_object(obj_container, segment['name'])
+                segments = swift_conn.get_container(obj_container,
+                                                    prefix=obj_prefix)[1]
+                names = [segment['name'] for segment in segments
+                         if (obj_container, segment['name']) !=
+                            (loc.container, loc.obj)]
+                self._delete_segments(swift_conn, loc, obj_container, names)
 
-            else:
-                swift_conn.delete_object(loc.container, loc.obj)
+            swift_conn.delete_object(loc.container, loc.obj)
 
         except swift_client.ClientException, e:
             if e.http_status == httplib.NOT_FOUND:
@@ -513,6 +523,34 @@ class Store(glance.store.base.Store):
             else:
                 raise
 
+    def _delete_segments(self, swift_conn, loc, container, names):
+        """
+        Deletes the named segment objects from a container, sending up
+        to `swift_store_delete_concurrency` requests to Swift at once.
+
+        Each green thread gets its own connection, authenticated with
+        the token already held by `swift_conn`, and deletes an
+        interleaved slice of the segments.
+        """
+        workers = min(self.delete_concurrency, len(names))
+        if workers <= 1:
+            for name in names:
+                swift_conn.delete_object(container, name)
+            return
+
+        def delete_slice(slice_names):
+            conn = self._make_swift_connection(
+                auth_url=loc.swift_auth_url, user=loc.user, key=loc.key,
+                preauthurl=swift_conn.url, preauthtoken=swift_conn.token)
+            for name in slice_names:
+                conn.delete_object(container, name)
+
+        pool = eventlet.GreenPool(workers)
+        slices = [names[i::workers] for i in xrange(workers)]
+        # Consuming the results re-raises any ClientException here
+        for _result in pool.imap(delete_slice, slices):
+            pass
+
 
 class ChunkReader(object):
     def __init__(self, fd, checksum, total):
@@ -16,6 +16,7 @@
 #    under the License.
 
 import datetime
+import httplib
 import json
 import os
 import StringIO
@@ -26,6 +27,7 @@ import stubout
 import webob
 
 from glance import client
+from glance.common import client as base_client
 from glance.common import context
 from glance.common import exception
 from glance.common import utils
@@ -2085,3 +2087,142 @@ class TestConfigureClientFromURL(unittest.TestCase):
             use_ssl=True,
             doc_root='/prefix/'
         )
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    class FakeConnection(object):
+
+        def __init__(self, host, port, **kwargs):
+            self.host = host
+            self.port = port
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    def _make_pool(self, **kwargs):
+        return base_client.ConnectionPool(self.FakeConnection,
+                                          '0.0.0.0', 9191, {}, **kwargs)
+
+    def test_reuses_idle_connection(self):
+        pool = self._make_pool()
+        conn, reused = pool.get()
+        self.assertFalse(reused)
+        pool.put(conn)
+        conn2, reused = pool.get()
+        self.assertTrue(reused)
+        self.assertTrue(conn is conn2)
+
+    def test_expires_idle_connection(self):
+        pool = self._make_pool(idle_timeout=-1)
+        conn, _reused = pool.get()
+        pool.put(conn)
+        conn2, reused = pool.get()
+        self.assertFalse(reused)
+        self.assertFalse(conn is conn2)
+        self.assertTrue(conn.closed)
+
+    def test_max_idle(self):
+        pool = self._make_pool(max_idle=1)
+        conn1, _reused = pool.get()
+        conn2, _reused = pool.get()
+        pool.put(conn1)
+        pool.put(conn2)
+        self.assertFalse(conn1.closed)
+        self.assertTrue(conn2.closed)
+
+    def test_pool_shared_per_endpoint(self):
+        pool1 = base_client.get_connection_pool(self.FakeConnection,
+                                                '0.0.0.0', 9191, {})
+        pool2 = base_client.get_connection_pool(self.FakeConnection,
+                                                '0.0.0.0', 9191, {})
+        pool3 = base_client.get_connection_pool(self.FakeConnection,
+                                                '0.0.0.0', 9292, {})
+        self.assertTrue(pool1 is pool2)
+        self.assertFalse(pool1 is pool3)
+
+
+class TestPooledRequestRetry(unittest.TestCase):
+
+    class FakeResponse(object):
+        status = 200
+
+    class FakeConnection(object):
+
+        created = []
+
+        def __init__(self, host, port, **kwargs):
+            self.stale = False
+            self.requests = []
+            self.closed = False
+            self.created.append(self)
+
+        def request(self, method, path, body, headers):
+            self.requests.append(method)
+
+        def putrequest(self, method, path):
+            self.requests.append(method)
+
+        def putheader(self, header, value):
+            pass
+
+        def endheaders(self):
+            pass
+
+        def send(self, data):
+            pass
+
+        def getresponse(self):
+            if self.stale:
+                raise httplib.BadStatusLine('')
+            return TestPooledRequestRetry.FakeResponse()
+
+        def close(self):
+            self.closed = True
+
+    class PooledClient(base_client.BaseClient):
+
+        POOL_CONNECTIONS = True
+
+        def get_connection_type(self):
+            return TestPooledRequestRetry.FakeConnection
+
+    def setUp(self):
+        self.client = self.PooledClient('0.0.0.0', 9191, auth_tok='token')
+        pool = base_client.get_connection_pool(self.FakeConnection,
+                                               '0.0.0.0', 9191, {})
+        pool.close()
+        # The server has dropped the idle connection in the pool
+        self.stale_conn = self.FakeConnection('0.0.0.0', 9191)
+        self.stale_conn.stale = True
+        pool.put(self.stale_conn)
+        del self.FakeConnection.created[:]
+
+    def tearDown(self):
+        base_client.get_connection_pool(self.FakeConnection,
+                                        '0.0.0.0', 9191, {}).close()
+
+    def _do_request(self, method, body=None):
+        url = self.client._construct_url('/images')
+        return self.client._do_request(method, url, body, {})
+
+    def test_idempotent_request_retried(self):
+        res = self._do_request('GET')
+        self.assertEqual(200, res.status)
+        self.assertEqual(['GET'], self.stale_conn.requests)
+        self.assertTrue(self.stale_conn.closed)
+        self.assertEqual(1, len(self.FakeConnection.created))
+        self.assertEqual(['GET'], self.FakeConnection.created[0].requests)
+
+    def test_post_not_retried(self):
+        self.assertRaises(httplib.BadStatusLine, self._do_request, 'POST')
+        self.assertEqual(['POST'], self.stale_conn.requests)
+        self.assertEqual([], self.FakeConnection.created)
+
+    def test_file_body_not_retried(self):
+        body = StringIO.StringIO('chunk')
+        self.assertRaises(httplib.BadStatusLine, self._do_request, 'PUT',
+                          body)
+        self.assertEqual(['PUT'], self.stale_conn.requests)
+        self.assertEqual([], self.FakeConnection.created)
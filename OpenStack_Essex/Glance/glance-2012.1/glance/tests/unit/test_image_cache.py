@@ -224,6 +224,88 @@ class ImageCacheTestCase(object):
         self.assertEqual(self.cache.get_queued_images(),
                          ['0', '1', '2'])
 
+    @skip_if_disabled
+    def test_queue_priority(self):
+        """
+        Test that images queued with a higher priority are returned
+        first, and that re-queueing an image can raise its priority
+        """
+        self.assertTrue(self.cache.queue_image(0))
+        self.assertTrue(self.cache.queue_image(1, priority=5))
+        self.assertTrue(self.cache.queue_image(2))
+
+        self.assertEqual(self.cache.get_queued_images(),
+                         ['1', '0', '2'])
+
+        # Lowering the priority of a queued image is not allowed
+        self.assertFalse(self.cache.queue_image(1, priority=1))
+        self.assertTrue(self.cache.queue_image(2, priority=10))
+
+        self.assertEqual(self.cache.get_queued_images(),
+                         ['2', '1', '0'])
+
+    @skip_if_disabled
+    def test_raised_priority_keeps_queue_order(self):
+        """
+        Test that raising the priority of a queued image keeps the
+        time it was queued, which orders images of equal priority
+        """
+        for x in xrange(3):
+            self.assertTrue(self.cache.queue_image(x))
+            path = self.cache.driver.get_image_filepath(x, 'queue')
+            os.utime(path, (1000 + x, 1000 + x))
+
+        self.assertTrue(self.cache.queue_image(2, priority=5))
+        self.assertTrue(self.cache.queue_image(0, priority=5))
+
+        self.assertEqual(self.cache.get_queued_images(),
+                         ['0', '2', '1'])
+
+    @skip_if_disabled
+    def test_image_requested(self):
+        """
+        Test that requesting a queued image moves it ahead of images
+        queued with the default priority, and that it does not queue
+        images or lower their priority
+        """
+        for x in xrange(3):
+            self.assertTrue(self.cache.queue_image(x))
+        self.assertTrue(self.cache.queue_image(3, priority=5))
+
+        self.assertTrue(self.cache.image_requested(1))
+        self.assertFalse(self.cache.image_requested(1))
+        self.assertFalse(self.cache.image_requested(3))
+        self.assertFalse(self.cache.image_requested(4))
+
+        self.assertFalse(self.cache.is_queued(4))
+        self.assertEqual(self.cache.get_queued_images(),
+                         ['3', '1', '0', '2'])
+
+    @skip_if_disabled
+    def test_cache_image_iter_resume(self):
+        """
+        Test that a partially written image file can be resumed
+        """
+        incomplete_path = self.cache.driver.get_image_filepath(1,
+                                                               'incomplete')
+        with open(incomplete_path, 'wb') as f:
+            f.write(FIXTURE_DATA[:100] + 'garbage')
+
+        self.assertEqual(107, self.cache.get_incomplete_size(1))
+        self.assertEqual(0, self.cache.get_incomplete_size(1, older_than=0))
+
+        self.assertTrue(self.cache.cache_image_iter(1, [FIXTURE_DATA[100:]],
+                                                    offset=100))
+        self.assertTrue(self.cache.is_cached(1))
+        self.assertEqual(0, self.cache.get_incomplete_size(1))
+
+        buff = StringIO.StringIO()
+        with self.cache.open_for_read(1) as cache_file:
+            for chunk in cache_file:
+                buff.write(chunk)
+
+        self.assertEqual(FIXTURE_DATA, buff.getvalue())
+
 
 class TestImageCacheXattr(unittest.TestCase,
                           ImageCacheTestCase):
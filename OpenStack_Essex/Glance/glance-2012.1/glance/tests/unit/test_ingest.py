@@ -0,0 +1,67 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack, LLC
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import os
+import shutil
+import unittest
+
+from glance.common import ingest
+from glance.tests import utils as test_utils
+
+
+class TestWriteIter(unittest.TestCase):
+
+    def setUp(self):
+        self.test_id, self.test_dir = test_utils.get_isolated_test_env()
+        self.path = os.path.join(self.test_dir, 'image')
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_write_iter(self):
+        chunks = ['a' * 4096, '', 'b' * 4096, 'c']
+        checksum = hashlib.md5()
+        with open(self.path, 'wb') as f:
+            written = ingest.write_iter(f, iter(chunks), size=8193,
+                                        checksum=checksum, sync=True)
+
+        data = ''.join(chunks)
+        self.assertEqual(len(data), written)
+        self.assertEqual(hashlib.md5(data).hexdigest(), checksum.hexdigest())
+        with open(self.path, 'rb') as f:
+            self.assertEqual(data, f.read())
+
+    def test_write_iter_short(self):
+        """A short write is not padded out to the preallocated size"""
+        with open(self.path, 'wb') as f:
+            f.write('x' * 10)
+            written = ingest.write_iter(f, iter(['y' * 10]), size=4096)
+
+        self.assertEqual(10, written)
+        self.assertEqual(20, os.path.getsize(self.path))
+
+    def test_write_iter_error(self):
+        def image_iter():
+            yield 'a' * 10
+            raise IOError('read failed')
+
+        with open(self.path, 'wb') as f:
+            self.assertRaises(IOError, ingest.write_iter, f, image_iter())
+            f.flush()
+        self.assertEqual(10, os.path.getsize(self.path))
@@ -0,0 +1,134 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack, LLC
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests the scrubber's queue of pending deletes"""
+
+import os
+import shutil
+import unittest
+
+import stubout
+
+from glance.common import exception
+from glance import store
+from glance.store import scrubber
+from glance.tests import utils as test_utils
+
+
+class TestScrubberQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.test_id, self.test_dir = test_utils.get_isolated_test_env()
+        self.datadir = os.path.join(self.test_dir, 'scrubber')
+        self.queue = scrubber.ScrubberQueue(self.datadir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_get_due(self):
+        """Only due images are returned, oldest first"""
+        self.queue.add('2', 'file:///2', 200)
+        self.queue.add('1', 'file:///1', 100)
+        self.queue.add('3', 'file:///3', 300)
+
+        self.assertEqual([], self.queue.get_due(99))
+        self.assertEqual([('1', 'file:///1'), ('2', 'file:///2')],
+                         self.queue.get_due(250))
+
+        self.queue.remove('1')
+        self.assertFalse(self.queue.is_queued('1'))
+        self.assertTrue(self.queue.is_queued('2'))
+        self.assertEqual([('2', 'file:///2'), ('3', 'file:///3')],
+                         self.queue.get_due(300))
+
+    def test_get_queued_ids(self):
+        self.assertEqual(set(), self.queue.get_queued_ids())
+        self.queue.add('1', 'file:///1', 100)
+        self.queue.add('2', 'file:///2', 200)
+        self.assertEqual(set(['1', '2']), self.queue.get_queued_ids())
+
+    def test_add_duplicate(self):
+        self.queue.add('1', 'file:///1', 100)
+        self.assertRaises(exception.Duplicate,
+                          self.queue.add, '1', 'file:///1', 200)
+
+    def test_import_queue_files(self):
+        """Queue files from earlier releases are moved into the queue"""
+        scrubber.write_queue_file(os.path.join(self.datadir, '1'),
+                                  'file:///1', 100)
+        scrubber.write_queue_file(os.path.join(self.datadir, '.cleanup'),
+                                  'cleanup', 100)
+
+        self.assertEqual(1, self.queue.import_queue_files(['.cleanup']))
+        self.assertEqual([('1', 'file:///1')], self.queue.get_due(100))
+        self.assertFalse(os.path.exists(os.path.join(self.datadir, '1')))
+        self.assertTrue(os.path.exists(os.path.join(self.datadir,
+                                                    '.cleanup')))
+        self.assertEqual(0, self.queue.import_queue_files(['.cleanup']))
+
+
+class FakeRegistry(object):
+
+    def __init__(self):
+        self.updates = []
+
+    def update_image(self, image_id, image_meta):
+        self.updates.append((image_id, image_meta))
+
+
+class TestScrubberDelete(unittest.TestCase):
+
+    def setUp(self):
+        self.test_id, self.test_dir = test_utils.get_isolated_test_env()
+        self.stubs = stubout.StubOutForTesting()
+        self.scrubber = scrubber.Scrubber.__new__(scrubber.Scrubber)
+        self.scrubber.queue = scrubber.ScrubberQueue(
+            os.path.join(self.test_dir, 'scrubber'))
+        self.scrubber.registry = FakeRegistry()
+        self.scrubber.queue.add('1', 'file:///1', 100)
+
+    def tearDown(self):
+        self.stubs.UnsetAll()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _stub_delete(self, error=None):
+        def fake_delete_from_backend(uri):
+            if error is not None:
+                raise error
+        self.stubs.Set(store, 'delete_from_backend', fake_delete_from_backend)
+
+    def test_delete(self):
+        self._stub_delete()
+        self.scrubber._delete('1', 'file:///1')
+        self.assertEqual([('1', {'status': 'deleted'})],
+                         self.scrubber.registry.updates)
+        self.assertFalse(self.scrubber.queue.is_queued('1'))
+
+    def test_already_deleted(self):
+        self._stub_delete(exception.NotFound())
+        self.scrubber._delete('1', 'file:///1')
+        self.assertEqual([('1', {'status': 'deleted'})],
+                         self.scrubber.registry.updates)
+        self.assertFalse(self.scrubber.queue.is_queued('1'))
+
+    def test_failed_delete_stays_queued(self):
+        self._stub_delete(store.UnsupportedBackend())
+        self.scrubber._delete('1', 'file:///1')
+        self.assertEqual([], self.scrubber.registry.updates)
+        self.assertTrue(self.scrubber.queue.is_queued('1'))
@@ -79,8 +79,10 @@ def stub_out_swift_common_client(stubs, conf):
         if not fixture_key in fixture_headers.keys():
             if kwargs.get('headers'):
                 etag = kwargs['headers']['ETag']
+                manifest = kwargs['headers']['X-Object-Manifest']
                 fixture_headers[fixture_key] = {'manifest': True,
-                                                'etag': etag}
+                                                'etag': etag,
+                                                'x-object-manifest': manifest}
                 return etag
             if hasattr(contents, 'read'):
                 fixture_object = StringIO.StringIO()
@@ -153,7 +155,21 @@ def stub_out_swift_common_client(stubs, conf):
                         http_status=httplib.NOT_FOUND)
         else:
             del fixture_headers[fixture_key]
-            del fixture_objects[fixture_key]
+            fixture_objects.pop(fixture_key, None)
+
+    def fake_get_container(url, token, container, prefix=None, **kwargs):
+        # GET returns the tuple (container headers, list of objects)
+        if container not in fixture_containers:
+            msg = "No container %s found" % container
+            raise swift.common.client.ClientException(msg,
+                        http_status=httplib.NOT_FOUND)
+        objects = []
+        for fixture_key in sorted(fixture_headers.keys()):
+            obj_container, name = fixture_key.split('/', 1)
+            if obj_container == container and \
+                    name.startswith(prefix or ''):
+                objects.append({'name': name})
+        return {}, objects
 
     def fake_http_connection(*args, **kwargs):
         return None
@@ -179,6 +195,8 @@ def stub_out_swift_common_client(stubs, conf):
               'head_object', fake_head_object)
     stubs.Set(swift.common.client,
               'get_object', fake_get_object)
+    stubs.Set(swift.common.client,
+              'get_container', fake_get_container)
     stubs.Set(swift.common.client,
               'get_auth', fake_get_auth)
     stubs.Set(swift.common.client,
@@ -542,6 +560,31 @@ class SwiftTests(object):
 
         self.assertRaises(exception.NotFound, self.store.get, loc)
 
+    def test_delete_large_object(self):
+        """
+        Test we delete every segment of a large object, and its manifest
+        """
+        self.conf['swift_store_delete_concurrency'] = 3
+        self.store = Store(test_utils.TestConfigOpts(self.conf))
+        self.store.large_object_size = 1024
+        self.store.large_object_chunk_size = 1024
+        image_id = utils.generate_uuid()
+        image_swift = StringIO.StringIO("*" * FIVE_KB)
+        location = self.store.add(image_id, image_swift, FIVE_KB)[0]
+
+        loc = get_location_from_uri(location)
+        swift_conn = self.store._make_swift_connection(
+            auth_url=loc.store_location.swift_auth_url, user='user',
+            key='key')
+        self.assertEqual(6, len(swift_conn.get_container(
+            'glance', prefix=image_id)[1]))
+
+        self.store.delete(loc)
+
+        self.assertEqual([], swift_conn.get_container(
+            'glance', prefix=image_id)[1])
+        self.assertRaises(exception.NotFound, self.store.get, loc)
+
     def test_delete_non_existing(self):
         """
         Test that trying to delete a swift that doesn't exist
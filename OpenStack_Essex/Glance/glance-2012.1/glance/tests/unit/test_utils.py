@@ -15,11 +15,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import socket
+import tempfile
 import unittest
 
 import iso8601
 
 from glance.common import utils
+from glance.tests import utils as test_utils
 
 
 class TestUtils(unittest.TestCase):
@@ -152,3 +155,57 @@ class TestIso8601Time(unittest.TestCase):
         west = utils.parse_isotime(str)
         normed = utils.normalize_time(west)
         self._instaneous(normed, 2012, 2, 13, 23, 53, 07, 0)
+
+
+class FileIteratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = ''.join(chr(i % 256) for i in xrange(100000))
+        self.tmp = tempfile.NamedTemporaryFile()
+        self.tmp.write(self.data)
+        self.tmp.flush()
+
+    def tearDown(self):
+        self.tmp.close()
+
+    def test_read_without_socket(self):
+        iterator = utils.FileIterator(open(self.tmp.name, 'rb'))
+        iterator.CHUNKSIZE = 4096
+        chunks = list(iterator)
+        self.assertEqual(self.data, ''.join(chunks))
+        self.assertEqual(4096, len(chunks[0]))
+        self.assertEqual(len(self.data), iterator.bytes_sent)
+        self.assertTrue(iterator.fp is None)
+
+    def test_read_response_without_socket(self):
+        iterator = utils.FileIterator(open(self.tmp.name, 'rb'))
+        iterator.CHUNKSIZE = 4096
+        iterator.RESPONSE_CHUNKSIZE = 8192
+        iterator.use_socket({})
+        chunks = list(iterator)
+        self.assertEqual(self.data, ''.join(chunks))
+        self.assertEqual(8192, len(chunks[0]))
+
+    @test_utils.skip_unless(utils.SENDFILE_SUPPORTED,
+                            "sendfile(2) is not supported")
+    def test_sendfile_to_socket(self):
+        reader, writer = socket.socketpair()
+        iterator = utils.FileIterator(open(self.tmp.name, 'rb'),
+                                      len(self.data))
+        iterator.HEADER_CHUNKSIZE = 1000
+        iterator.use_socket({utils.SOCKET_ENV_KEY: writer})
+
+        for chunk in iterator:
+            # The server writes the first chunk out itself
+            writer.sendall(chunk)
+
+        writer.close()
+        received = []
+        while True:
+            data = reader.recv(65536)
+            if not data:
+                break
+            received.append(data)
+
+        self.assertEqual(self.data, ''.join(received))
+        self.assertEqual(len(self.data), iterator.bytes_sent)
@@ -16,6 +16,7 @@
 #    under the License.
 
 import unittest
+
 import webob
 
 from glance.common import wsgi
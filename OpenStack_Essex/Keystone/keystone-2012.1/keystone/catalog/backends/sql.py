@@ -15,6 +15,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import time
+
 import sqlalchemy.exc
 import webob.exc
 
@@ -78,9 +80,23 @@ class Endpoint(sql.ModelBase, sql.DictBase):
 
 
 class Catalog(sql.Base, catalog.Driver):
+    # Bumped on every change to a service or endpoint, so that each driver
+    # instance in the process rebuilds its compiled catalog. Changes made
+    # by other processes are picked up after CONF.catalog.cache_time.
+    _generation = 0
+
+    def __init__(self):
+        super(Catalog, self).__init__()
+        self._compiled_catalog = None
+        self._compiled_generation = None
+        self._compiled_at = 0
+
     def db_sync(self):
         migration.db_sync()
 
+    def _invalidate_catalog(self):
+        Catalog._generation += 1
+
     # Services
     def list_services(self):
         session = self.get_session()
@@ -102,6 +118,7 @@ class Catalog(sql.Base, catalog.Driver):
         with session.begin():
             session.delete(service_ref)
             session.flush()
+        self._invalidate_catalog()
 
     def create_service(self, service_id, service_ref):
         session = self.get_session()
@@ -109,6 +126,7 @@ class Catalog(sql.Base, catalog.Driver):
             service = Service.from_dict(service_ref)
             session.add(service)
             session.flush()
+        self._invalidate_catalog()
         return service.to_dict()
 
     # Endpoints
@@ -118,6 +136,7 @@ class Catalog(sql.Base, catalog.Driver):
         with session.begin():
             session.add(new_endpoint)
             session.flush()
+        self._invalidate_catalog()
         return new_endpoint.to_dict()
 
     def delete_endpoint(self, endpoint_id):
@@ -129,6 +148,7 @@ class Catalog(sql.Base, catalog.Driver):
         with session.begin():
             session.delete(endpoint_ref)
             session.flush()
+        self._invalidate_catalog()
 
     def get_endpoint(self, endpoint_id):
         session = self.get_session()
@@ -141,31 +161,42 @@ class Catalog(sql.Base, catalog.Driver):
         endpoints = session.query(Endpoint)
         return [e['id'] for e in list(endpoints)]
 
+    def _compile_catalog(self):
+        """Build the catalog from a single query over endpoints and services.
+
+        URLs are compiled into :class:`keystone.catalog.Template` objects
+        so that rendering the catalog for a tenant is cheap.
+
+        """
+        session = self.get_session()
+        query = session.query(Endpoint, Service)
+        query = query.filter(Endpoint.service_id == Service.id)
+
+        compiled = {}
+        for endpoint_ref, service_ref in query:
+            ep = endpoint_ref.to_dict()
+            service = service_ref.to_dict()
+            region_ref = compiled.setdefault(ep['region'], {})
+            region_ref[service['type']] = {
+                'name': service['name'],
+                'publicURL': catalog.Template(ep['publicurl']),
+                'adminURL': catalog.Template(ep['adminurl']),
+                'internalURL': catalog.Template(ep['internalurl']),
+            }
+        return compiled
+
+    def _get_compiled_catalog(self):
+        now = time.time()
+        if (self._compiled_catalog is None
+                or self._compiled_generation != Catalog._generation
+                or now - self._compiled_at > CONF.catalog.cache_time):
+            generation = Catalog._generation
+            self._compiled_catalog = self._compile_catalog()
+            self._compiled_generation = generation
+            self._compiled_at = now
+        return self._compiled_catalog
+
     def get_catalog(self, user_id, tenant_id, metadata=None):
-        d = dict(CONF.iteritems())
-        d.update({'tenant_id': tenant_id,
-                  'user_id': user_id})
-        catalog = {}
-
-        endpoints = [self.get_endpoint(e)
-                     for e in self.list_endpoints()]
-        for ep in endpoints:
-            service = self.get_service(ep['service_id'])
-            srv_type = service['type']
-            srv_name = service['name']
-            region = ep['region']
-
-            if region not in catalog:
-                catalog[region] = {}
-
-            catalog[region][srv_type] = {}
-
-            internal_url = ep['internalurl'].replace('$(', '%(')
-            public_url = ep['publicurl'].replace('$(', '%(')
-            admin_url = ep['adminurl'].replace('$(', '%(')
-            catalog[region][srv_type]['name'] = srv_name
-            catalog[region][srv_type]['publicURL'] = public_url % d
-            catalog[region][srv_type]['adminURL'] = admin_url % d
-            catalog[region][srv_type]['internalURL'] = internal_url % d
-
-        return catalog
+        return catalog.render_catalog(self._get_compiled_catalog(),
+                                      tenant_id=tenant_id,
+                                      user_id=user_id)
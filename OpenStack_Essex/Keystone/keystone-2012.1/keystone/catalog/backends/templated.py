@@ -14,6 +14,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from keystone import catalog
 from keystone import config
 from keystone.common import logging
 from keystone.catalog.backends import kvs
@@ -52,6 +53,17 @@ def parse_templates(template_lines):
     return o
 
 
+def compile_templates(templates):
+    """Compile the values parsed by parse_templates into Templates."""
+    o = {}
+    for region, region_ref in templates.iteritems():
+        o[region] = {}
+        for service, service_ref in region_ref.iteritems():
+            o[region][service] = dict((k, catalog.Template(v))
+                                      for k, v in service_ref.iteritems())
+    return o
+
+
 # TODO(jaypipes): should be templated.Catalog,
 # not templated.TemplatedCatalog to be consistent with
 # other catalog backends
@@ -92,6 +104,7 @@ class TemplatedCatalog(kvs.Catalog):
             self.templates = templates
         else:
             self._load_templates(CONF.catalog.template_file)
+        self.compiled_templates = compile_templates(self.templates)
         super(TemplatedCatalog, self).__init__()
 
     def _load_templates(self, template_file):
@@ -102,17 +115,6 @@ class TemplatedCatalog(kvs.Catalog):
             raise
 
     def get_catalog(self, user_id, tenant_id, metadata=None):
-        d = dict(CONF.iteritems())
-        d.update({'tenant_id': tenant_id,
-                  'user_id': user_id})
-
-        o = {}
-        for region, region_ref in self.templates.iteritems():
-            o[region] = {}
-            for service, service_ref in region_ref.iteritems():
-                o[region][service] = {}
-                for k, v in service_ref.iteritems():
-                    v = v.replace('$(', '%(')
-                    o[region][service][k] = v % d
-
-        return o
+        return catalog.render_catalog(self.compiled_templates,
+                                      tenant_id=tenant_id,
+                                      user_id=user_id)
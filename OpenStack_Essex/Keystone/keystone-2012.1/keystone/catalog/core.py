@@ -17,6 +17,7 @@
 
 """Main entry point into the Catalog service."""
 
+import re
 import uuid
 
 from keystone import config
@@ -30,6 +31,58 @@ from keystone.common import wsgi
 
 CONF = config.CONF
 
+TEMPLATE_KEY_RE = re.compile(r'%\(([^)]*)\)')
+
+
+class Template(object):
+    """An endpoint template, compiled once and rendered for each request.
+
+    Templates contain values to be interpolated that look like
+    ``$(public_port)s``. Each value is taken from the keyword arguments
+    passed to :meth:`render`, notably tenant_id and user_id, or else from
+    the conf instance. Only the keys the template uses are looked up.
+
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._format = template.replace('$(', '%(')
+        self._keys = frozenset(TEMPLATE_KEY_RE.findall(self._format))
+        self._static = '%' not in self._format
+
+    def render(self, **kwargs):
+        if self._static:
+            return self._format
+
+        values = {}
+        for key in self._keys:
+            if key in kwargs:
+                values[key] = kwargs[key]
+            elif key in CONF:
+                values[key] = CONF[key]
+            else:
+                raise KeyError(key)
+        return self._format % values
+
+
+def render_catalog(compiled_catalog, **kwargs):
+    """Render a catalog of {region: {service: {key: value}}}.
+
+    Values that are :class:`Template` objects are rendered with kwargs,
+    anything else is copied as is.
+
+    """
+    o = {}
+    for region, region_ref in compiled_catalog.iteritems():
+        o[region] = {}
+        for service, service_ref in region_ref.iteritems():
+            o[region][service] = {}
+            for k, v in service_ref.iteritems():
+                if isinstance(v, Template):
+                    v = v.render(**kwargs)
+                o[region][service][k] = v
+    return o
+
 
 class Manager(manager.Manager):
     """Default pivot point for the Catalog backend.
@@ -108,10 +108,30 @@ class ImportNovaAuth(BaseApp):
         nova.import_auth(dump_data)
 
 
+class TokenFlush(BaseApp):
+    """Delete expired tokens from the token backend.
+
+    Takes an optional number of tokens to delete per transaction.
+    Meant to be run periodically, from cron for instance.
+
+    """
+
+    name = 'token_flush'
+
+    def main(self):
+        batch_size = 1000
+        if len(self.argv) > 1:
+            batch_size = int(self.argv[1])
+        driver = utils.import_object(CONF.token.driver)
+        flushed = driver.flush_expired_tokens(batch_size=batch_size)
+        print 'Deleted %d expired tokens' % flushed
+
+
 CMDS = {'db_sync': DbSync,
         'import_legacy': ImportLegacy,
         'export_legacy_catalog': ExportLegacyCatalog,
         'import_nova_auth': ImportNovaAuth,
+        'token_flush': TokenFlush,
         }
 
 
@@ -15,6 +15,20 @@
 # under the License.
 
 
+import contextlib
+import cPickle as pickle
+import sqlite3
+
+from keystone import config
+from keystone.common import utils
+
+
+CONF = config.CONF
+config.register_str('driver', group='kvs',
+                    default='keystone.common.kvs.DictKvs')
+config.register_str('path', group='kvs')
+
+
 class DictKvs(dict):
     def set(self, key, value):
         if type(value) is type({}):
@@ -25,14 +39,110 @@ class DictKvs(dict):
     def delete(self, key):
         del self[key]
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """Groups writes that must be made together.
+
+        Nothing can run between writes to a dict, so there is nothing to do.
+
+        """
+        yield
+
+
+class SqliteKvs(object):
+    """A kvs kept in a sqlite database, which several processes can share.
+
+    Values are pickled, so anything a backend stores in a DictKvs can be
+    stored here too.
+
+    """
+
+    def __init__(self, path=None):
+        path = path or CONF.kvs.path
+        self.conn = sqlite3.connect(path, timeout=30,
+                                    isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.execute('CREATE TABLE IF NOT EXISTS kvs'
+                          ' (key TEXT PRIMARY KEY, value BLOB)')
+        self._depth = 0
+
+    def get(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM kvs WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(str(row[0]))
+
+    def __getitem__(self, key):
+        row = self.conn.execute('SELECT value FROM kvs WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(str(row[0]))
+
+    def __contains__(self, key):
+        row = self.conn.execute('SELECT 1 FROM kvs WHERE key = ?',
+                                (key,)).fetchone()
+        return row is not None
+
+    def set(self, key, value):
+        value = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self.conn.execute('INSERT OR REPLACE INTO kvs (key, value)'
+                          ' VALUES (?, ?)', (key, value))
+
+    __setitem__ = set
+
+    def delete(self, key):
+        cursor = self.conn.execute('DELETE FROM kvs WHERE key = ?', (key,))
+        if not cursor.rowcount:
+            raise KeyError(key)
+
+    __delitem__ = delete
+
+    def keys(self):
+        return [row[0] for row in self.conn.execute('SELECT key FROM kvs')]
+
+    def clear(self):
+        self.conn.execute('DELETE FROM kvs')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Makes the writes within it together, or not at all."""
+        if self._depth == 0:
+            self.conn.execute('BEGIN IMMEDIATE')
+        self._depth += 1
+        try:
+            yield
+        except Exception:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('ROLLBACK')
+            raise
+        else:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('COMMIT')
+
 
 INMEMDB = DictKvs()
+_DBS = {}
+
+
+def get_db():
+    """Returns the store used by kvs backends that are not given one."""
+    if CONF.kvs.driver == 'keystone.common.kvs.DictKvs':
+        return INMEMDB
+    key = (CONF.kvs.driver, CONF.kvs.path)
+    if key not in _DBS:
+        _DBS[key] = utils.import_object(CONF.kvs.driver)
+    return _DBS[key]
 
 
 class Base(object):
     def __init__(self, db=None):
         if db is None:
-            db = INMEMDB
+            db = get_db()
         elif type(db) is type({}):
             db = DictKvs(db)
         self.db = db
@@ -14,6 +14,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+import time
+
+from eventlet import semaphore
 import ldap
 
 from keystone import exception
@@ -58,6 +62,175 @@ def safe_iter(attrs):
         yield attrs
 
 
+def _connect(url):
+    if url.startswith('fake://'):
+        return fakeldap.FakeLdap(url)
+    else:
+        return LdapWrapper(url)
+
+
+def _unbind(conn):
+    try:
+        conn.unbind_s()
+    except ldap.LDAPError:
+        pass
+
+
+class SearchCache(object):
+    """Search results, kept for a number of seconds."""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, cache_time):
+        self.cache_time = cache_time
+        self.entries = {}
+
+    def get(self, key):
+        try:
+            expires, result = self.entries[key]
+        except KeyError:
+            return None
+        if expires < time.time():
+            del self.entries[key]
+            return None
+        return copy.deepcopy(result)
+
+    def set(self, key, result):
+        if self.cache_time <= 0:
+            return
+        now = time.time()
+        if len(self.entries) >= self.MAX_ENTRIES:
+            for k, (expires, _result) in self.entries.items():
+                if expires < now:
+                    del self.entries[k]
+            if len(self.entries) >= self.MAX_ENTRIES:
+                self.entries.clear()
+        self.entries[key] = (now + self.cache_time, copy.deepcopy(result))
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ConnectionPool(object):
+    """A bounded pool of connections bound as the service user.
+
+    The pool has the same search_s, add_s, modify_s and delete_s methods as
+    a connection. Each call borrows an idle connection, or binds a new one
+    if there are fewer than `size` connections, or otherwise waits for one
+    to be returned. A connection the server has dropped is replaced and the
+    call retried once. Connections older than `lifetime` seconds are
+    replaced rather than reused.
+
+    Search results are cached, and the cache is cleared by every write made
+    through the pool.
+
+    """
+
+    def __init__(self, url, user, password, size=10, lifetime=600,
+                 cache_time=60):
+        self.url = url
+        self.user = user
+        self.password = password
+        self.lifetime = lifetime
+        self.idle = []
+        self.connections_created = 0
+        self.semaphore = semaphore.Semaphore(size)
+        self.cache = SearchCache(cache_time)
+
+    def _create(self):
+        conn = _connect(self.url)
+        conn.simple_bind_s(self.user, self.password)
+        self.connections_created += 1
+        return conn, time.time()
+
+    def _get(self):
+        while self.idle:
+            conn, created = self.idle.pop()
+            if created + self.lifetime > time.time():
+                return conn, created
+            _unbind(conn)
+        return self._create()
+
+    def _discard_idle(self):
+        idle, self.idle = self.idle, []
+        for conn, _created in idle:
+            _unbind(conn)
+
+    def _call(self, method, *args):
+        self.semaphore.acquire()
+        try:
+            conn, created = self._get()
+            try:
+                try:
+                    return getattr(conn, method)(*args)
+                except ldap.SERVER_DOWN:
+                    # the server has gone away or dropped us, so the other
+                    # idle connections are most likely dead too
+                    LOG.debug('LDAP connection lost, reconnecting')
+                    _unbind(conn)
+                    conn = None
+                    self._discard_idle()
+                    conn, created = self._create()
+                    return getattr(conn, method)(*args)
+            finally:
+                if conn is not None:
+                    self.idle.append((conn, created))
+        finally:
+            self.semaphore.release()
+
+    def search_s(self, dn, scope, query):
+        key = (dn, scope, query)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._call('search_s', dn, scope, query)
+            self.cache.set(key, result)
+        return result
+
+    def _write(self, method, *args):
+        try:
+            return self._call(method, *args)
+        finally:
+            self.cache.clear()
+
+    def add_s(self, dn, attrs):
+        return self._write('add_s', dn, attrs)
+
+    def modify_s(self, dn, modlist):
+        return self._write('modify_s', dn, modlist)
+
+    def delete_s(self, dn):
+        return self._write('delete_s', dn)
+
+    def close(self):
+        self.cache.clear()
+        self._discard_idle()
+
+
+_POOLS = {}
+
+
+def get_pool(conf):
+    """Returns the connection pool shared by everything using `conf.ldap`."""
+    key = (conf.ldap.url, conf.ldap.user, conf.ldap.password)
+    try:
+        return _POOLS[key]
+    except KeyError:
+        pool = ConnectionPool(conf.ldap.url, conf.ldap.user,
+                              conf.ldap.password,
+                              size=conf.ldap.pool_size,
+                              lifetime=conf.ldap.pool_connection_lifetime,
+                              cache_time=conf.ldap.cache_time)
+        _POOLS[key] = pool
+        return pool
+
+
+def close_pools():
+    """Closes every connection pool, dropping their cached results."""
+    for pool in _POOLS.values():
+        pool.close()
+    _POOLS.clear()
+
+
 class BaseLdap(object):
     DEFAULT_SUFFIX = "dc=example,dc=com"
     DEFAULT_OU = None
@@ -94,12 +267,18 @@ class BaseLdap(object):
 
             self.structural_classes = self.DEFAULT_STRUCTURAL_CLASSES
         self.use_dumb_member = getattr(conf.ldap, 'use_dumb_member') or True
+        self.conf = conf
 
     def get_connection(self, user=None, password=None):
-        if self.LDAP_URL.startswith('fake://'):
-            conn = fakeldap.FakeLdap(self.LDAP_URL)
-        else:
-            conn = LdapWrapper(self.LDAP_URL)
+        """Returns a connection bound as `user`.
+
+        Without a user, this is the shared pool of connections bound as the
+        configured service user. Otherwise it is a new connection, which the
+        caller should unbind when done.
+
+        """
+        if user is None and password is None:
+            return get_pool(self.conf)
 
         if user is None:
             user = self.LDAP_USER
@@ -107,9 +286,15 @@ class BaseLdap(object):
         if password is None:
             password = self.LDAP_PASSWORD
 
+        conn = _connect(self.LDAP_URL)
         conn.simple_bind_s(user, password)
         return conn
 
+    def simple_bind(self, user, password):
+        """Checks the credentials of `user` by binding a new connection."""
+        conn = self.get_connection(user, password)
+        _unbind(conn)
+
     def _id_to_dn(self, id):
         return '%s=%s,%s' % (self.id_attr,
                              ldap.dn.escape_dn_chars(str(id)),
@@ -288,6 +473,10 @@ class LdapWrapper(object):
         LOG.debug("LDAP bind: dn=%s", user)
         return self.conn.simple_bind_s(user, password)
 
+    def unbind_s(self):
+        LOG.debug("LDAP unbind")
+        return self.conn.unbind_s()
+
     def add_s(self, dn, attrs):
         ldap_attrs = [(kind, [py2ldap(x) for x in safe_iter(values)])
                       for kind, values in attrs]
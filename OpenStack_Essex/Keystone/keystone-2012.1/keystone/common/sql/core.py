@@ -44,6 +44,7 @@ String = sql.String
 ForeignKey = sql.ForeignKey
 DateTime = sql.DateTime
 IntegrityError = sql.exc.IntegrityError
+or_ = sql.or_
 
 
 # Special Fields
@@ -0,0 +1,87 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from sqlalchemy import *
+from sqlalchemy.engine import reflection
+from migrate import *
+
+
+INDEXED_COLUMNS = ('expires', 'user_id', 'tenant_id')
+BATCH_SIZE = 1000
+
+
+def _backfill(migrate_engine, token):
+    """Copy user and tenant ids out of extra, in batches by id."""
+    last_id = ''
+    while True:
+        query = select([token.c.id, token.c.extra])
+        query = query.where(token.c.id > last_id)
+        query = query.order_by(token.c.id).limit(BATCH_SIZE)
+        rows = migrate_engine.execute(query).fetchall()
+        for row in rows:
+            extra = json.loads(row['extra'] or '{}')
+            values = {
+                'user_id': (extra.get('user') or {}).get('id'),
+                'tenant_id': (extra.get('tenant') or {}).get('id'),
+            }
+            migrate_engine.execute(
+                token.update().where(token.c.id == row['id']).values(values))
+        if len(rows) < BATCH_SIZE:
+            return
+        last_id = rows[-1]['id']
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    token = Table('token', meta, autoload=True)
+
+    # 001 creates its tables from the current models, so databases
+    # created since these columns were added already have them
+    added = False
+    for name in ('user_id', 'tenant_id'):
+        if name not in token.c:
+            Column(name, String(64)).create(token)
+            added = True
+
+    inspector = reflection.Inspector.from_engine(migrate_engine)
+    indexes = set(index['name'] for index in inspector.get_indexes('token'))
+    for name in INDEXED_COLUMNS:
+        index_name = 'ix_token_%s' % name
+        if index_name not in indexes:
+            Index(index_name, token.c[name]).create(migrate_engine)
+
+    if added:
+        _backfill(migrate_engine, token)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    token = Table('token', meta, autoload=True)
+
+    for name in INDEXED_COLUMNS:
+        Index('ix_token_%s' % name, token.c[name]).drop(migrate_engine)
+
+    # reflect again so sqlite's table rebuild does not try to recreate
+    # the indexes dropped above
+    meta = MetaData()
+    meta.bind = migrate_engine
+    token = Table('token', meta, autoload=True)
+    for name in ('user_id', 'tenant_id'):
+        token.c[name].drop()
@@ -22,12 +22,14 @@ import base64
 import hashlib
 import hmac
 import json
+import multiprocessing
 import os
 import subprocess
 import sys
 import time
 import urllib
 
+from eventlet import tpool
 import passlib.hash
 
 from keystone import config
@@ -36,6 +38,7 @@ from keystone.common import logging
 
 CONF = config.CONF
 config.register_int('crypt_strength', default=40000)
+config.register_int('crypt_workers')
 
 LOG = logging.getLogger(__name__)
 
@@ -199,14 +202,81 @@ def trunc_password(password):
         return password
 
 
+def _hash_password(password_utf8, rounds):
+    return passlib.hash.sha512_crypt.encrypt(password_utf8, rounds=rounds)
+
+
+def _check_password(password_utf8, hashed):
+    return passlib.hash.sha512_crypt.verify(password_utf8, hashed)
+
+
+class CryptPool(object):
+    """Runs password hashing in a pool of worker processes.
+
+    Hashing is pure CPU work that holds the GIL, so done inline it stalls
+    every other green thread in the server for the length of the hash.
+    Calls are handed to worker processes instead, and the caller waits for
+    the result in a native thread so that the hub keeps running.
+
+    The pool is started on first use, and again in any process forked
+    after that.
+
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._pid = None
+        self.queue_depth = 0
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def _get_pool(self, workers):
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = multiprocessing.Pool(workers or None)
+            self._pid = os.getpid()
+        return self._pool
+
+    def execute(self, func, *args):
+        workers = CONF.crypt_workers
+        start = time.time()
+        self.queue_depth += 1
+        try:
+            if workers == 0:
+                return func(*args)
+            result = self._get_pool(workers).apply_async(func, args)
+            return tpool.execute(result.get)
+        finally:
+            self.queue_depth -= 1
+            elapsed = time.time() - start
+            self.calls += 1
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self.max_time = max(self.max_time, elapsed)
+            LOG.debug('%s took %.3fs, %d calls queued', func.__name__,
+                      elapsed, self.queue_depth)
+
+    def get_stats(self):
+        """Returns the queue depth and latency of password hashing."""
+        avg_time = self.calls and self.total_time / self.calls or 0.0
+        return {'queue_depth': self.queue_depth,
+                'calls': self.calls,
+                'avg_time': avg_time,
+                'max_time': self.max_time,
+                'last_time': self.last_time}
+
+
+CRYPT_POOL = CryptPool()
+
+
 def hash_password(password):
     """Hash a password. Hard."""
     password_utf8 = trunc_password(password).encode('utf-8')
     if passlib.hash.sha512_crypt.identify(password_utf8):
         return password_utf8
-    h = passlib.hash.sha512_crypt.encrypt(password_utf8,
-                                          rounds=CONF.crypt_strength)
-    return h
+    return CRYPT_POOL.execute(_hash_password, password_utf8,
+                              CONF.crypt_strength)
 
 
 def ldap_hash_password(password):
@@ -234,7 +304,7 @@ def check_password(password, hashed):
     if password is None:
         return False
     password_utf8 = trunc_password(password).encode('utf-8')
-    return passlib.hash.sha512_crypt.verify(password_utf8, hashed)
+    return CRYPT_POOL.execute(_check_password, password_utf8, hashed)
 
 
 # From python 2.7
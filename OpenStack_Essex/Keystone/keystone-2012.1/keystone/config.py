@@ -151,6 +151,7 @@ register_int('idle_timeout', group='sql')
 
 
 register_str('driver', group='catalog')
+register_int('cache_time', group='catalog', default=60)
 register_str('driver', group='identity')
 register_str('driver', group='policy')
 register_str('driver', group='token')
@@ -163,6 +164,9 @@ register_str('user', group='ldap')
 register_str('password', group='ldap')
 register_str('suffix', group='ldap')
 register_bool('use_dumb_member', group='ldap')
+register_int('pool_size', group='ldap', default=10)
+register_int('pool_connection_lifetime', group='ldap', default=600)
+register_int('cache_time', group='ldap', default=60)
 
 register_str('user_tree_dn', group='ldap')
 register_str('user_objectclass', group='ldap')
@@ -67,25 +67,46 @@ class Identity(kvs.Base, identity.Driver):
         return tenant_ref
 
     def get_tenants(self):
-        tenant_keys = filter(lambda x: x.startswith("tenant-"), self.db.keys())
-        return [self.db.get(key) for key in tenant_keys]
+        tenant_ids = self.db.get('tenant_list', [])
+        return [self.get_tenant(x) for x in tenant_ids]
 
     def get_tenant_by_name(self, tenant_name):
-        tenant_ref = self.db.get('tenant_name-%s' % tenant_name)
-        return tenant_ref
+        tenant_id = self.db.get('tenant_name-%s' % tenant_name)
+        if tenant_id is None:
+            return None
+        return self.get_tenant(tenant_id)
 
     def get_tenant_users(self, tenant_id):
-        user_keys = filter(lambda x: x.startswith("user-"), self.db.keys())
-        user_refs = [self.db.get(key) for key in user_keys]
-        return filter(lambda x: tenant_id in x['tenants'], user_refs)
+        user_ids = self.db.get('tenant_users-%s' % tenant_id, [])
+        return [self._get_user(x) for x in user_ids]
 
     def _get_user(self, user_id):
         user_ref = self.db.get('user-%s' % user_id)
         return user_ref
 
     def _get_user_by_name(self, user_name):
-        user_ref = self.db.get('user_name-%s' % user_name)
-        return user_ref
+        user_id = self.db.get('user_name-%s' % user_name)
+        if user_id is None:
+            return None
+        return self._get_user(user_id)
+
+    def _update_tenant_users(self, user_id, old_tenants, new_tenants):
+        """Keeps the tenant-users index in step with a user's tenants."""
+        old_tenants = set(old_tenants or [])
+        new_tenants = set(new_tenants or [])
+        for tenant_id in old_tenants - new_tenants:
+            key = 'tenant_users-%s' % tenant_id
+            user_ids = set(self.db.get(key, []))
+            user_ids.discard(user_id)
+            if user_ids:
+                self.db.set(key, list(user_ids))
+            else:
+                self.db.delete(key)
+        for tenant_id in new_tenants - old_tenants:
+            key = 'tenant_users-%s' % tenant_id
+            user_ids = set(self.db.get(key, []))
+            user_ids.add(user_id)
+            self.db.set(key, list(user_ids))
 
     def get_user(self, user_id):
         return _filter_user(self._get_user(user_id))
@@ -154,77 +175,95 @@ class Identity(kvs.Base, identity.Driver):
 
     # CRUD
     def create_user(self, user_id, user):
-        if self.get_user(user_id):
-            msg = 'Duplicate ID, %s.' % user_id
-            raise exception.Conflict(type='user', details=msg)
-        if self.get_user_by_name(user['name']):
-            msg = 'Duplicate name, %s.' % user['name']
-            raise exception.Conflict(type='user', details=msg)
-        user = _ensure_hashed_password(user)
-        self.db.set('user-%s' % user_id, user)
-        self.db.set('user_name-%s' % user['name'], user)
-        user_list = set(self.db.get('user_list', []))
-        user_list.add(user_id)
-        self.db.set('user_list', list(user_list))
+        with self.db.transaction():
+            if self.get_user(user_id):
+                msg = 'Duplicate ID, %s.' % user_id
+                raise exception.Conflict(type='user', details=msg)
+            if self.get_user_by_name(user['name']):
+                msg = 'Duplicate name, %s.' % user['name']
+                raise exception.Conflict(type='user', details=msg)
+            user = _ensure_hashed_password(user)
+            self.db.set('user-%s' % user_id, user)
+            self.db.set('user_name-%s' % user['name'], user_id)
+            user_list = set(self.db.get('user_list', []))
+            user_list.add(user_id)
+            self.db.set('user_list', list(user_list))
+            self._update_tenant_users(user_id, [], user.get('tenants'))
         return user
 
     def update_user(self, user_id, user):
-        if 'name' in user:
-            existing = self.db.get('user_name-%s' % user['name'])
-            if existing and user_id != existing['id']:
-                msg = 'Duplicate name, %s.' % user['name']
-                raise exception.Conflict(type='user', details=msg)
-        # get the old name and delete it too
-        old_user = self.db.get('user-%s' % user_id)
-        new_user = old_user.copy()
-        user = _ensure_hashed_password(user)
-        new_user.update(user)
-        new_user['id'] = user_id
-        self.db.delete('user_name-%s' % old_user['name'])
-        self.db.set('user-%s' % user_id, new_user)
-        self.db.set('user_name-%s' % new_user['name'], new_user)
+        with self.db.transaction():
+            if 'name' in user:
+                existing = self.db.get('user_name-%s' % user['name'])
+                if existing and user_id != existing:
+                    msg = 'Duplicate name, %s.' % user['name']
+                    raise exception.Conflict(type='user', details=msg)
+            # get the old name and delete it too
+            old_user = self.db.get('user-%s' % user_id)
+            new_user = old_user.copy()
+            user = _ensure_hashed_password(user)
+            new_user.update(user)
+            new_user['id'] = user_id
+            self.db.delete('user_name-%s' % old_user['name'])
+            self.db.set('user-%s' % user_id, new_user)
+            self.db.set('user_name-%s' % new_user['name'], user_id)
+            self._update_tenant_users(user_id, old_user.get('tenants'),
+                                      new_user.get('tenants'))
         return new_user
 
     def delete_user(self, user_id):
         old_user = self.db.get('user-%s' % user_id)
-        self.db.delete('user_name-%s' % old_user['name'])
-        self.db.delete('user-%s' % user_id)
-        user_list = set(self.db.get('user_list', []))
-        user_list.remove(user_id)
-        self.db.set('user_list', list(user_list))
+        with self.db.transaction():
+            self.db.delete('user_name-%s' % old_user['name'])
+            self.db.delete('user-%s' % user_id)
+            user_list = set(self.db.get('user_list', []))
+            user_list.remove(user_id)
+            self.db.set('user_list', list(user_list))
+            self._update_tenant_users(user_id, old_user.get('tenants'), [])
         return None
 
     def create_tenant(self, tenant_id, tenant):
-        if self.get_tenant(tenant_id):
-            msg = 'Duplicate ID, %s.' % tenant_id
-            raise exception.Conflict(type='tenant', details=msg)
-        if self.get_tenant_by_name(tenant['name']):
-            msg = 'Duplicate name, %s.' % tenant['name']
-            raise exception.Conflict(type='tenant', details=msg)
-        self.db.set('tenant-%s' % tenant_id, tenant)
-        self.db.set('tenant_name-%s' % tenant['name'], tenant)
+        with self.db.transaction():
+            if self.get_tenant(tenant_id):
+                msg = 'Duplicate ID, %s.' % tenant_id
+                raise exception.Conflict(type='tenant', details=msg)
+            if self.get_tenant_by_name(tenant['name']):
+                msg = 'Duplicate name, %s.' % tenant['name']
+                raise exception.Conflict(type='tenant', details=msg)
+            self.db.set('tenant-%s' % tenant_id, tenant)
+            self.db.set('tenant_name-%s' % tenant['name'], tenant_id)
+            tenant_list = set(self.db.get('tenant_list', []))
+            tenant_list.add(tenant_id)
+            self.db.set('tenant_list', list(tenant_list))
         return tenant
 
     def update_tenant(self, tenant_id, tenant):
-        if 'name' in tenant:
-            existing = self.db.get('tenant_name-%s' % tenant['name'])
-            if existing and tenant_id != existing['id']:
-                msg = 'Duplicate name, %s.' % tenant['name']
-                raise exception.Conflict(type='tenant', details=msg)
-        # get the old name and delete it too
-        old_tenant = self.db.get('tenant-%s' % tenant_id)
-        new_tenant = old_tenant.copy()
-        new_tenant.update(tenant)
-        new_tenant['id'] = tenant_id
-        self.db.delete('tenant_name-%s' % old_tenant['name'])
-        self.db.set('tenant-%s' % tenant_id, new_tenant)
-        self.db.set('tenant_name-%s' % new_tenant['name'], new_tenant)
+        with self.db.transaction():
+            if 'name' in tenant:
+                existing = self.db.get('tenant_name-%s' % tenant['name'])
+                if existing and tenant_id != existing:
+                    msg = 'Duplicate name, %s.' % tenant['name']
+                    raise exception.Conflict(type='tenant', details=msg)
+            # get the old name and delete it too
+            old_tenant = self.db.get('tenant-%s' % tenant_id)
+            new_tenant = old_tenant.copy()
+            new_tenant.update(tenant)
+            new_tenant['id'] = tenant_id
+            self.db.delete('tenant_name-%s' % old_tenant['name'])
+            self.db.set('tenant-%s' % tenant_id, new_tenant)
+            self.db.set('tenant_name-%s' % new_tenant['name'], tenant_id)
         return new_tenant
 
     def delete_tenant(self, tenant_id):
         old_tenant = self.db.get('tenant-%s' % tenant_id)
-        self.db.delete('tenant_name-%s' % old_tenant['name'])
-        self.db.delete('tenant-%s' % tenant_id)
+        with self.db.transaction():
+            self.db.delete('tenant_name-%s' % old_tenant['name'])
+            self.db.delete('tenant-%s' % tenant_id)
+            tenant_list = set(self.db.get('tenant_list', []))
+            tenant_list.discard(tenant_id)
+            self.db.set('tenant_list', list(tenant_list))
+            if 'tenant_users-%s' % tenant_id in self.db:
+                self.db.delete('tenant_users-%s' % tenant_id)
         return None
 
     def create_metadata(self, user_id, tenant_id, metadata):
@@ -249,10 +288,11 @@ class Identity(kvs.Base, identity.Driver):
             if role['name'] == role_ref['name']:
                 msg = 'Duplicate name, %s.' % role['name']
                 raise exception.Conflict(type='role', details=msg)
-        self.db.set('role-%s' % role_id, role)
-        role_list = set(self.db.get('role_list', []))
-        role_list.add(role_id)
-        self.db.set('role_list', list(role_list))
+        with self.db.transaction():
+            self.db.set('role-%s' % role_id, role)
+            role_list = set(self.db.get('role_list', []))
+            role_list.add(role_id)
+            self.db.set('role_list', list(role_list))
         return role
 
     def update_role(self, role_id, role):
@@ -272,8 +312,9 @@ class Identity(kvs.Base, identity.Driver):
         return role
 
     def delete_role(self, role_id):
-        self.db.delete('role-%s' % role_id)
-        role_list = set(self.db.get('role_list', []))
-        role_list.remove(role_id)
-        self.db.set('role_list', list(role_list))
+        with self.db.transaction():
+            self.db.delete('role-%s' % role_id)
+            role_list = set(self.db.get('role_list', []))
+            role_list.remove(role_id)
+            self.db.set('role_list', list(role_list))
         return None
@@ -24,7 +24,6 @@ from keystone import exception
 from keystone import identity
 from keystone.common import ldap as common_ldap
 from keystone.common import utils
-from keystone.common.ldap import fakeldap
 from keystone.identity import models
 
 
@@ -58,16 +57,7 @@ class Identity(identity.Driver):
         self.role = RoleApi(CONF)
 
     def get_connection(self, user=None, password=None):
-        if self.LDAP_URL.startswith('fake://'):
-            conn = fakeldap.FakeLdap(self.LDAP_URL)
-        else:
-            conn = common_ldap.LDAPWrapper(self.LDAP_URL)
-        if user is None:
-            user = self.LDAP_USER
-        if password is None:
-            password = self.LDAP_PASSWORD
-        conn.simple_bind_s(user, password)
-        return conn
+        return self.user.get_connection(user, password)
 
     # Identity interface
     def authenticate(self, user_id=None, tenant_id=None, password=None):
@@ -81,10 +71,7 @@ class Identity(identity.Driver):
             raise AssertionError('Invalid user / password')
 
         try:
-            conn = self.user.get_connection(self.user._id_to_dn(user_id),
-                                            password)
-            if not conn:
-                raise AssertionError('Invalid user / password')
+            self.user.simple_bind(self.user._id_to_dn(user_id), password)
         except Exception:
             raise AssertionError('Invalid user / password')
 
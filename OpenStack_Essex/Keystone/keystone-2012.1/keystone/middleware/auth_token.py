@@ -90,14 +90,40 @@ HTTP_X_ROLE
 
 """
 
+import calendar
+import collections
 import httplib
 import json
 import logging
+import sys
 import time
 
 import webob
 import webob.exc
 
+try:
+    import eventlet
+    from eventlet.event import Event
+except ImportError:
+    import threading
+
+    eventlet = None
+
+    class Event(object):
+        """The subset of eventlet.event.Event used here, for threads."""
+
+        def __init__(self):
+            self._event = threading.Event()
+            self._value = None
+
+        def send(self, value=None):
+            self._value = value
+            self._event.set()
+
+        def wait(self):
+            self._event.wait()
+            return self._value
+
 
 LOG = logging.getLogger(__name__)
 
@@ -110,6 +136,57 @@ class ServiceError(Exception):
     pass
 
 
+class TokenCache(object):
+    """In-process LRU cache where each entry carries its own expiry."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        value, expires = entry
+        if time.time() >= expires:
+            return None
+        self._data[key] = entry
+        return value
+
+    def set(self, key, value, expires):
+        if self.max_size <= 0:
+            return
+        self._data.pop(key, None)
+        self._data[key] = (value, expires)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class HTTPConnectionPool(object):
+    """Keeps idle keep-alive connections to the auth service for reuse."""
+
+    def __init__(self, factory, max_size):
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = []
+
+    def get(self):
+        """Return a (connection, reused) tuple."""
+        try:
+            return self._idle.pop(), True
+        except IndexError:
+            return self.factory(), False
+
+    def put(self, conn):
+        if len(self._idle) < self.max_size:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+
 class AuthProtocol(object):
     """Auth Middleware that handles authenticating client calls."""
 
@@ -143,12 +220,48 @@ class AuthProtocol(object):
         self.admin_password = conf.get('admin_password')
         self.admin_tenant_name = conf.get('admin_tenant_name', 'admin')
 
+        # Keep-alive connections to the auth service
+        self._connections = HTTPConnectionPool(
+            self._get_http_connection,
+            int(conf.get('http_connection_pool_size', 10)))
+
+        # Validations currently in progress, keyed by token, so that
+        # concurrent requests with the same token share one round-trip
+        self._in_flight = {}
+
+        # Tokens waiting to be validated together in one request, and the
+        # timer that sends them
+        self.token_batch_window = float(conf.get('token_batch_window', 0))
+        self.token_batch_size = int(conf.get('token_batch_size', 50))
+        if self.token_batch_window and eventlet is None:
+            LOG.warn('token_batch_window needs eventlet, disabling batching')
+            self.token_batch_window = 0
+        self._batch = {}
+        self._batch_timer = None
+
+        self.stats = {
+            'local_cache_hits': 0,
+            'memcache_hits': 0,
+            'cache_misses': 0,
+            'shared_validations': 0,
+            'batch_requests': 0,
+            'validations': 0,
+            'validation_time': 0.0,
+            'validation_time_max': 0.0,
+        }
+
+        # By default the token will be cached for 5 minutes
+        self.token_cache_time = int(conf.get('token_cache_time', 300))
+
+        # Token caching in-process, and as a first level cache when
+        # memcache is in use
+        self._local_cache = TokenCache(int(conf.get('token_cache_size',
+                                                    10000)))
+
         # Token caching via memcache
         self._cache = None
         self._iso8601 = None
         memcache_servers = conf.get('memcache_servers')
-        # By default the token will be cached for 5 minutes
-        self.token_cache_time = conf.get('token_cache_time', 300)
         if memcache_servers:
             try:
                 import memcache
@@ -266,8 +379,6 @@ class AuthProtocol(object):
         :raise ServerError when unable to communicate with keystone
 
         """
-        conn = self._get_http_connection()
-
         kwargs = {
             'headers': {
                 'Content-type': 'application/json',
@@ -281,15 +392,27 @@ class AuthProtocol(object):
         if body:
             kwargs['body'] = json.dumps(body)
 
-        try:
-            conn.request(method, path, **kwargs)
-            response = conn.getresponse()
-            body = response.read()
-        except Exception, e:
-            LOG.error('HTTP connection exception: %s' % e)
-            raise ServiceError('Unable to communicate with keystone')
-        finally:
-            conn.close()
+        while True:
+            conn, reused = self._connections.get()
+            try:
+                conn.request(method, path, **kwargs)
+                response = conn.getresponse()
+                body = response.read()
+            except Exception, e:
+                conn.close()
+                if reused:
+                    # The auth service may have dropped an idle
+                    # connection; try again on a new one
+                    LOG.debug('Retrying on a new connection after: %s' % e)
+                    continue
+                LOG.error('HTTP connection exception: %s' % e)
+                raise ServiceError('Unable to communicate with keystone')
+
+            if getattr(response, 'will_close', True):
+                conn.close()
+            else:
+                self._connections.put(conn)
+            break
 
         try:
             data = json.loads(body)
@@ -344,6 +467,49 @@ class AuthProtocol(object):
         if cached:
             return cached
 
+        pending = self._in_flight.get(user_token)
+        if pending is not None:
+            self.stats['shared_validations'] += 1
+            result, exc_info = pending.wait()
+            if exc_info:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            return result
+
+        pending = self._in_flight[user_token] = Event()
+        start = time.time()
+        result, exc_info = None, None
+        try:
+            if self.token_batch_window:
+                result = self._batch_token_validation(user_token)
+            else:
+                result = self._request_token_validation(user_token, retry)
+        except Exception:
+            exc_info = sys.exc_info()
+        finally:
+            del self._in_flight[user_token]
+            elapsed = time.time() - start
+            self.stats['validations'] += 1
+            self.stats['validation_time'] += elapsed
+            self.stats['validation_time_max'] = max(
+                self.stats['validation_time_max'], elapsed)
+            pending.send((result, exc_info))
+
+        if exc_info:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return result
+
+    def _request_token_validation(self, user_token, retry=True):
+        """Validate a user token with keystone, bypassing the caches.
+
+        :param user_token: user's token id
+        :param retry: flag that forces the middleware to retry
+                      user authentication when an indeterminate
+                      response is received. Optional.
+        :return token object received from keystone on success
+        :raise InvalidUserToken if token is rejected
+        :raise ServiceError if unable to authenticate token
+
+        """
         headers = {'X-Auth-Token': self.get_admin_token()}
         response, data = self._json_request('GET',
                                             '/v2.0/tokens/%s' % user_token,
@@ -366,13 +532,124 @@ class AuthProtocol(object):
                          response.status)
         if retry:
             LOG.info('Retrying validation')
-            return self._validate_user_token(user_token, False)
+            return self._request_token_validation(user_token, retry=False)
         else:
             LOG.warn("Invalid user token: %s. Keystone response: %s.",
                      user_token, data)
 
             raise InvalidUserToken()
 
+    def _batch_token_validation(self, user_token):
+        """Validate a user token along with others waiting for validation.
+
+        The token is sent with any others that arrive within
+        token_batch_window seconds, or sooner once token_batch_size tokens
+        are waiting.
+
+        :param user_token: user's token id
+        :return token object received from keystone on success
+        :raise InvalidUserToken if token is rejected
+        :raise ServiceError if unable to authenticate token
+
+        """
+        pending = self._batch[user_token] = Event()
+        if len(self._batch) >= self.token_batch_size:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+            self._batch_timer = eventlet.spawn(self._send_batch)
+        elif self._batch_timer is None:
+            self._batch_timer = eventlet.spawn_after(self.token_batch_window,
+                                                     self._send_batch)
+
+        result, exc_info = pending.wait()
+        if exc_info:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return result
+
+    def _send_batch(self):
+        """Validate the waiting tokens and wake the requests waiting on them.
+
+        Falls back to validating the tokens one at a time if the auth
+        service does not support validating them together.
+
+        """
+        batch, self._batch = self._batch, {}
+        self._batch_timer = None
+        if not batch:
+            return
+
+        try:
+            results = self._request_batch_validation(batch.keys())
+        except Exception:
+            exc_info = sys.exc_info()
+            for pending in batch.itervalues():
+                pending.send((None, exc_info))
+            return
+
+        for user_token, pending in batch.iteritems():
+            result, exc_info = None, None
+            try:
+                if results is None:
+                    result = self._request_token_validation(user_token)
+                else:
+                    result = self._handle_batch_result(user_token,
+                                                       results.get(user_token))
+            except Exception:
+                exc_info = sys.exc_info()
+            pending.send((result, exc_info))
+
+    def _request_batch_validation(self, user_tokens, retry=True):
+        """Validate several user tokens with keystone in one request.
+
+        :param user_tokens: list of user token ids
+        :param retry: flag that forces the middleware to retry when the
+                      admin token is rejected. Optional.
+        :return dict of the results from keystone by token id, or None if
+                keystone cannot validate tokens together
+        :raise ServiceError if unable to validate the tokens
+
+        """
+        headers = {'X-Auth-Token': self.get_admin_token()}
+        response, data = self._json_request('POST',
+                                            '/v2.0/tokens/validate',
+                                            body={'tokens': user_tokens},
+                                            additional_headers=headers)
+        self.stats['batch_requests'] += 1
+
+        if response.status == 200:
+            return dict((result.get('id'), result)
+                        for result in data.get('tokens', []))
+        if response.status in (404, 405, 501):
+            LOG.warn('Keystone cannot validate tokens together, '
+                     'disabling batching')
+            self.token_batch_window = 0
+            return None
+        if response.status == 401 and retry:
+            LOG.info('Keystone rejected admin token %s, resetting', headers)
+            self.admin_token = None
+            return self._request_batch_validation(user_tokens, retry=False)
+
+        LOG.error('Bad response code while validating tokens: %s' %
+                  response.status)
+        raise ServiceError('Unable to validate tokens')
+
+    def _handle_batch_result(self, user_token, result):
+        """Return the token object for one token of a batch validation.
+
+        :raise InvalidUserToken if token is rejected
+
+        """
+        if result and 'access' in result:
+            data = {'access': result['access']}
+            self._cache_put(user_token, data)
+            return data
+        if result and result.get('error', {}).get('code') == 404:
+            self._cache_store_invalid(user_token)
+            LOG.warn("Authorization failed for token %s", user_token)
+            raise InvalidUserToken('Token authorization failed')
+        # keystone had no answer for this token, ask about it alone
+        return self._request_token_validation(user_token)
+
     def _build_user_headers(self, token_info):
         """Convert token object into headers.
 
@@ -469,37 +746,91 @@ class AuthProtocol(object):
     def _cache_get(self, token):
         """Return token information from cache.
 
+        The in-process cache is checked first, then memcache if configured.
         If token is invalid raise InvalidUserToken
         return token only if fresh (not expired).
         """
-        if self._cache and token:
+        if not token:
+            return None
+
+        cached = self._local_cache.get(token)
+        if cached == 'invalid':
+            LOG.debug('Cached Token %s is marked unauthorized', token)
+            raise InvalidUserToken('Token authorization failed')
+        if cached:
+            self.stats['local_cache_hits'] += 1
+            return cached
+
+        if self._cache:
             key = 'tokens/%s' % token
             cached = self._cache.get(key)
             if cached == 'invalid':
                 LOG.debug('Cached Token %s is marked unauthorized', token)
+                self._local_cache.set(token, 'invalid',
+                                      time.time() + self.token_cache_time)
                 raise InvalidUserToken('Token authorization failed')
             if cached:
                 data, expires = cached
                 if time.time() < float(expires):
                     LOG.debug('Returning cached token %s', token)
+                    self.stats['memcache_hits'] += 1
+                    self._local_cache_put(token, data, float(expires))
                     return data
                 else:
                     LOG.debug('Cached Token %s seems expired', token)
 
+        self.stats['cache_misses'] += 1
+
+    def _get_token_expires(self, data):
+        """Return the expiry of a token as seconds since the epoch.
+
+        Returns None if the token carries no expiry, or one that cannot
+        be parsed.
+        """
+        timestamp = data.get('access', {}).get('token', {}).get('expires')
+        if not timestamp:
+            return None
+        try:
+            if self._iso8601:
+                expires = self._iso8601.parse_date(timestamp)
+                return calendar.timegm(expires.utctimetuple())
+            return calendar.timegm(time.strptime(timestamp[:19],
+                                                 '%Y-%m-%dT%H:%M:%S'))
+        except ValueError, e:
+            LOG.debug('Unable to parse token expiry %s: %s', timestamp, e)
+            return None
+
+    def _local_cache_put(self, token, data, expires=None):
+        """Put token data into the in-process cache.
+
+        Entries are kept no longer than token_cache_time, nor past the
+        token's own expiry.
+        """
+        cache_until = time.time() + self.token_cache_time
+        if expires is not None:
+            cache_until = min(cache_until, expires)
+        self._local_cache.set(token, data, cache_until)
+
     def _cache_put(self, token, data):
         """Put token data into the cache.
 
         Stores the parsed expire date in cache allowing
         quick check of token freshness on retrieval.
         """
-        if self._cache and data:
-            key = 'tokens/%s' % token
-            if 'token' in data.get('access', {}):
-                timestamp = data['access']['token']['expires']
-                expires = self._iso8601.parse_date(timestamp).strftime('%s')
-            else:
+        if not data:
+            return
+
+        expires = self._get_token_expires(data)
+        if 'token' not in data.get('access', {}):
+            LOG.error('invalid token format')
+            return
+        self._local_cache_put(token, data, expires)
+
+        if self._cache:
+            if expires is None:
                 LOG.error('invalid token format')
                 return
+            key = 'tokens/%s' % token
             LOG.debug('Storing %s token in memcache', token)
             self._cache.set(key,
                             (data, expires),
@@ -507,6 +838,8 @@ class AuthProtocol(object):
 
     def _cache_store_invalid(self, token):
         """Store invalid token in cache."""
+        self._local_cache.set(token, 'invalid',
+                              time.time() + self.token_cache_time)
         if self._cache:
             key = 'tokens/%s' % token
             LOG.debug('Marking token %s as unauthorized in memcache', token)
@@ -514,6 +847,17 @@ class AuthProtocol(object):
                             'invalid',
                             time=self.token_cache_time)
 
+    def get_stats(self):
+        """Return the validation latency and cache hit counters."""
+        stats = self.stats.copy()
+        if stats['validations']:
+            stats['validation_time_avg'] = (stats['validation_time'] /
+                                            stats['validations'])
+        else:
+            stats['validation_time_avg'] = 0.0
+        stats['local_cache_size'] = len(self._local_cache)
+        return stats
+
 
 def filter_factory(global_conf, **local_conf):
     """Returns a WSGI filter app for use with paste.deploy."""
@@ -14,11 +14,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
 import uuid
 
 import routes
 
 from keystone import catalog
+from keystone import config
 from keystone import exception
 from keystone import identity
 from keystone import policy
@@ -28,6 +30,9 @@ from keystone.common import utils
 from keystone.common import wsgi
 
 
+CONF = config.CONF
+
+
 class AdminRouter(wsgi.ComposingRouter):
     def __init__(self):
         mapper = routes.Mapper()
@@ -43,6 +48,10 @@ class AdminRouter(wsgi.ComposingRouter):
                        controller=auth_controller,
                        action='authenticate',
                        conditions=dict(method=['POST']))
+        mapper.connect('/tokens/validate',
+                       controller=auth_controller,
+                       action='validate_tokens',
+                       conditions=dict(method=['POST']))
         mapper.connect('/tokens/{token_id}',
                        controller=auth_controller,
                        action='validate_token',
@@ -410,6 +419,82 @@ class TokenController(wsgi.Application):
                 metadata=metadata_ref)
         return self._format_token(token_ref, roles_ref, catalog_ref)
 
+    # admin only
+    def validate_tokens(self, context, tokens=None):
+        """Check that each of a list of tokens is valid.
+
+        Accepts the token ids as ``{"tokens": [$token_id, ...]}``, and
+        returns a result for each, in the same order::
+
+            {"tokens": [
+                {"id": $token_id, "access": {...}},
+                {"id": $token_id,
+                 "error": {"code": 404, "title": "Not Found", ...}},
+            ]}
+
+        where ``access`` is what ``validate_token`` would return.
+
+        Like ``validate_token``, belongsTo limits the tokens to a tenant and
+        adds a service catalog to each result. Pass nocatalog to leave the
+        catalogs out.
+
+        """
+        self.assert_admin(context)
+
+        if not isinstance(tokens, list):
+            raise exception.ValidationError(attribute='tokens',
+                                            target='request body')
+        if len(tokens) > CONF.token.max_validate_batch:
+            msg = ('No more than %d tokens can be validated at once'
+                   % CONF.token.max_validate_batch)
+            raise exception.ValidationError(message=msg)
+
+        belongs_to = context['query_string'].get('belongsTo')
+        include_catalog = (belongs_to is not None
+                           and 'nocatalog' not in context['query_string'])
+
+        token_refs = self.token_api.get_tokens(context=context,
+                                               token_ids=tokens)
+        # tokens in a batch mostly share a few roles and users
+        roles = {}
+        catalogs = {}
+        results = []
+        for token_id in tokens:
+            token_ref = token_refs.get(token_id)
+            if (token_ref is None
+                    or (belongs_to
+                        and (token_ref.get('tenant') or {}).get('id')
+                            != belongs_to)):
+                error = exception.TokenNotFound(token_id=token_id)
+                results.append({'id': token_id,
+                                'error': {'code': error.code,
+                                          'title': error.title,
+                                          'message': str(error)}})
+                continue
+
+            metadata_ref = token_ref['metadata']
+            roles_ref = []
+            for role_id in metadata_ref.get('roles', []):
+                if role_id not in roles:
+                    roles[role_id] = self.identity_api.get_role(context,
+                                                                role_id)
+                roles_ref.append(roles[role_id])
+
+            catalog_ref = None
+            if include_catalog:
+                key = (token_ref['user']['id'], token_ref['tenant']['id'])
+                if key not in catalogs:
+                    catalogs[key] = self.catalog_api.get_catalog(
+                        context=context,
+                        user_id=key[0],
+                        tenant_id=key[1],
+                        metadata=metadata_ref)
+                catalog_ref = copy.deepcopy(catalogs[key])
+            result = self._format_token(token_ref, roles_ref, catalog_ref)
+            result['id'] = token_id
+            results.append(result)
+        return {'tokens': results}
+
     def delete_token(self, context, token_id):
         """Delete a token, effectively invalidating it for authz."""
         # TODO(termie): this stuff should probably be moved to middleware
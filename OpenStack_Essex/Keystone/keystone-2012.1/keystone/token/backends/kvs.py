@@ -44,3 +44,34 @@ class Token(kvs.Base, token.Driver):
             return self.db.delete('token-%s' % token_id)
         except KeyError:
             raise exception.TokenNotFound(token_id=token_id)
+
+    def delete_tokens(self, user_id=None, tenant_id=None):
+        if user_id is None and tenant_id is None:
+            raise exception.ValidationError(attribute='user_id or tenant_id',
+                                            target='token')
+        deleted = 0
+        for key in self.db.keys():
+            if not key.startswith('token-'):
+                continue
+            token = self.db.get(key)
+            if (user_id is not None
+                    and (token.get('user') or {}).get('id') != user_id):
+                continue
+            if (tenant_id is not None
+                    and (token.get('tenant') or {}).get('id') != tenant_id):
+                continue
+            self.db.delete(key)
+            deleted += 1
+        return deleted
+
+    def flush_expired_tokens(self, batch_size=1000):
+        now = datetime.datetime.utcnow()
+        flushed = 0
+        for key in self.db.keys():
+            if not key.startswith('token-'):
+                continue
+            expires = self.db.get(key)['expires']
+            if expires is not None and expires <= now:
+                self.db.delete(key)
+                flushed += 1
+        return flushed
@@ -53,6 +53,12 @@ class Token(token.Driver):
 
         return token
 
+    def get_tokens(self, token_ids):
+        ptks = dict((self._prefix_token_id(token_id), token_id)
+                    for token_id in token_ids)
+        tokens = self.client.get_multi(ptks.keys())
+        return dict((ptks[ptk], token) for ptk, token in tokens.iteritems())
+
     def create_token(self, token_id, data):
         data_copy = copy.deepcopy(data)
         ptk = self._prefix_token_id(token_id)
@@ -70,3 +76,7 @@ class Token(token.Driver):
         self.get_token(token_id)
         ptk = self._prefix_token_id(token_id)
         return self.client.delete(ptk)
+
+    def flush_expired_tokens(self, batch_size=1000):
+        # memcache drops tokens itself once they expire
+        return 0
@@ -25,7 +25,9 @@ from keystone import token
 class TokenModel(sql.ModelBase, sql.DictBase):
     __tablename__ = 'token'
     id = sql.Column(sql.String(64), primary_key=True)
-    expires = sql.Column(sql.DateTime(), default=None)
+    expires = sql.Column(sql.DateTime(), default=None, index=True)
+    user_id = sql.Column(sql.String(64), index=True)
+    tenant_id = sql.Column(sql.String(64), index=True)
     extra = sql.Column(sql.JsonBlob())
 
     @classmethod
@@ -35,6 +37,10 @@ class TokenModel(sql.ModelBase, sql.DictBase):
         data = {}
         for k in ('id', 'expires'):
             data[k] = extra.pop(k, None)
+        # user and tenant stay in extra, their ids are copied out so that
+        # tokens can be revoked by user or tenant
+        data['user_id'] = (extra.get('user') or {}).get('id')
+        data['tenant_id'] = (extra.get('tenant') or {}).get('id')
         data['extra'] = extra
         return cls(**data)
 
@@ -49,12 +55,26 @@ class Token(sql.Base, token.Driver):
     # Public interface
     def get_token(self, token_id):
         session = self.get_session()
-        token_ref = session.query(TokenModel).filter_by(id=token_id).first()
         now = datetime.datetime.utcnow()
-        if token_ref and (not token_ref.expires or now < token_ref.expires):
-            return token_ref.to_dict()
-        else:
+        query = session.query(TokenModel).filter_by(id=token_id)
+        query = query.filter(sql.or_(TokenModel.expires == None,
+                                     TokenModel.expires > now))
+        token_ref = query.first()
+        if not token_ref:
             raise exception.TokenNotFound(token_id=token_id)
+        return token_ref.to_dict()
+
+    def get_tokens(self, token_ids):
+        if not token_ids:
+            return {}
+        session = self.get_session()
+        now = datetime.datetime.utcnow()
+        query = session.query(TokenModel)
+        query = query.filter(TokenModel.id.in_(token_ids))
+        query = query.filter(sql.or_(TokenModel.expires == None,
+                                     TokenModel.expires > now))
+        return dict((token_ref.id, token_ref.to_dict())
+                    for token_ref in query)
 
     def create_token(self, token_id, data):
         data_copy = copy.deepcopy(data)
@@ -81,3 +101,35 @@ class Token(sql.Base, token.Driver):
         with session.begin():
             session.delete(token_ref)
             session.flush()
+
+    def delete_tokens(self, user_id=None, tenant_id=None):
+        if user_id is None and tenant_id is None:
+            raise exception.ValidationError(attribute='user_id or tenant_id',
+                                            target='token')
+        session = self.get_session()
+        query = session.query(TokenModel)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if tenant_id is not None:
+            query = query.filter_by(tenant_id=tenant_id)
+        with session.begin():
+            return query.delete(synchronize_session=False)
+
+    def flush_expired_tokens(self, batch_size=1000):
+        session = self.get_session()
+        now = datetime.datetime.utcnow()
+        flushed = 0
+        while True:
+            # Each batch is its own short transaction, selected through the
+            # expires index, so a large purge never holds long locks
+            with session.begin():
+                query = session.query(TokenModel.id)
+                query = query.filter(TokenModel.expires < now)
+                token_ids = [row.id for row in query.limit(batch_size)]
+                if token_ids:
+                    query = session.query(TokenModel)
+                    query = query.filter(TokenModel.id.in_(token_ids))
+                    query.delete(synchronize_session=False)
+            flushed += len(token_ids)
+            if len(token_ids) < batch_size:
+                return flushed
@@ -25,6 +25,7 @@ from keystone.common import manager
 
 CONF = config.CONF
 config.register_int('expiration', group='token', default=86400)
+config.register_int('max_validate_batch', group='token', default=100)
 
 
 class Manager(manager.Manager):
@@ -53,6 +54,25 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def get_tokens(self, token_ids):
+        """Get several tokens by id.
+
+        Backends that can fetch many tokens in one request should override
+        this; by default each token is fetched with get_token.
+
+        :param token_ids: identities of the tokens
+        :type token_ids: list of strings
+        :returns: dict of token_ref by id, for the tokens that were found.
+
+        """
+        token_refs = {}
+        for token_id in token_ids:
+            try:
+                token_refs[token_id] = self.get_token(token_id)
+            except exception.TokenNotFound:
+                pass
+        return token_refs
+
     def create_token(self, token_id, data):
         """Create a token by id and data.
 
@@ -87,6 +107,31 @@ class Driver(object):
         """
         raise exception.NotImplemented()
 
+    def delete_tokens(self, user_id=None, tenant_id=None):
+        """Deletes all tokens of a user, of a tenant, or of a user on a
+        tenant.
+
+        :param user_id: identity of the user
+        :type user_id: string
+        :param tenant_id: identity of the tenant
+        :type tenant_id: string
+        :returns: the number of tokens deleted.
+        :raises: keystone.exception.ValidationError if neither user_id
+                 nor tenant_id is given
+
+        """
+        raise exception.NotImplemented()
+
+    def flush_expired_tokens(self, batch_size=1000):
+        """Deletes expired tokens from the backend.
+
+        :param batch_size: number of tokens deleted per transaction
+        :type batch_size: int
+        :returns: the number of tokens deleted.
+
+        """
+        raise exception.NotImplemented()
+
     def _get_default_expire_time(self):
         """Determine when a token should expire based on the config.
 
@@ -18,6 +18,8 @@ import json
 
 import webob
 import datetime
+import eventlet
+import eventlet.event
 import iso8601
 
 from keystone.middleware import auth_token
@@ -313,6 +315,161 @@ class AuthTokenMiddlewareTest(BaseAuthTokenMiddlewareTest):
         self.middleware(req.environ, self.start_fake_response)
         self.assertEqual(len(self.middleware._cache.set_value), 2)
 
+    def test_local_cache(self):
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = 'valid-token'
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 200)
+
+        self.middleware.http_client_class = None
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 200)
+        stats = self.middleware.get_stats()
+        self.assertEqual(stats['validations'], 1)
+        self.assertEqual(stats['local_cache_hits'], 1)
+
+    def test_local_cache_invalid(self):
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = 'invalid-token'
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 401)
+
+        self.middleware.http_client_class = None
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 401)
+        self.assertEqual(self.middleware.get_stats()['validations'], 1)
+
+    def test_local_cache_token_expired(self):
+        expired = datetime.datetime.utcnow() - datetime.timedelta(minutes=1)
+        data = {'access': {'token': {'id': 'token',
+                                     'expires': expired.isoformat()}}}
+        self.middleware._cache_put('token', data)
+        self.assertEqual(self.middleware._cache_get('token'), None)
+
+    def test_reuse_connection(self):
+        connections = []
+
+        class KeepAliveConnection(FakeHTTPConnection):
+            def __init__(self, *args):
+                connections.append(self)
+
+            def getresponse(self):
+                self.resp.will_close = False
+                return self.resp
+
+        self.middleware.http_client_class = KeepAliveConnection
+        for token in ('valid-token', 'default-tenant-token'):
+            req = webob.Request.blank('/')
+            req.headers['X-Auth-Token'] = token
+            self.middleware(req.environ, self.start_fake_response)
+            self.assertEqual(self.response_status, 200)
+        self.assertEqual(len(connections), 1)
+
+    def test_single_flight(self):
+        waiting = eventlet.event.Event()
+        requests = []
+
+        class SlowConnection(FakeHTTPConnection):
+            def getresponse(self):
+                requests.append(self)
+                waiting.wait()
+                return self.resp
+
+        self.middleware.http_client_class = SlowConnection
+        pool = eventlet.GreenPool()
+        results = []
+
+        def call():
+            req = webob.Request.blank('/')
+            req.headers['X-Auth-Token'] = 'valid-token'
+            results.append(self.middleware(req.environ,
+                                           self.start_fake_response))
+
+        for i in range(3):
+            pool.spawn(call)
+        eventlet.sleep(0)
+        waiting.send()
+        pool.waitall()
+
+        self.assertEqual(results, [['SUCCESS']] * 3)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(self.middleware.get_stats()['shared_validations'], 2)
+
+    def _call_concurrently(self, tokens):
+        pool = eventlet.GreenPool()
+        statuses = {}
+
+        def call(token):
+            req = webob.Request.blank('/')
+            req.headers['X-Auth-Token'] = token
+            self.middleware(req.environ, self.start_fake_response)
+            statuses[token] = self.response_status
+
+        for token in tokens:
+            pool.spawn(call, token)
+        pool.waitall()
+        return statuses
+
+    def test_batch_validation(self):
+        requests = []
+
+        class BatchConnection(FakeHTTPConnection):
+            def request(self, method, path, **kwargs):
+                requests.append(path)
+                if path != '/v2.0/tokens/validate':
+                    return super(BatchConnection, self).request(
+                            method, path, **kwargs)
+                results = []
+                for token_id in json.loads(kwargs['body'])['tokens']:
+                    if token_id in TOKEN_RESPONSES:
+                        result = TOKEN_RESPONSES[token_id].copy()
+                    else:
+                        result = {'error': {'code': 404}}
+                    result['id'] = token_id
+                    results.append(result)
+                self.resp = FakeHTTPResponse(200,
+                                             json.dumps({'tokens': results}))
+
+        self.middleware.http_client_class = BatchConnection
+        self.middleware.token_batch_window = 0.01
+        statuses = self._call_concurrently(['valid-token',
+                                            'default-tenant-token',
+                                            'invalid-token'])
+
+        self.assertEqual(statuses, {'valid-token': 200,
+                                    'default-tenant-token': 200,
+                                    'invalid-token': 401})
+        self.assertEqual(requests, ['/v2.0/tokens/validate'])
+        self.assertEqual(self.middleware.get_stats()['batch_requests'], 1)
+
+        # the results are cached like any other validation
+        statuses = self._call_concurrently(['valid-token', 'invalid-token'])
+        self.assertEqual(statuses, {'valid-token': 200,
+                                    'invalid-token': 401})
+        self.assertEqual(len(requests), 1)
+
+    def test_batch_validation_unsupported(self):
+        requests = []
+
+        class OldConnection(FakeHTTPConnection):
+            def request(self, method, path, **kwargs):
+                requests.append(path)
+                super(OldConnection, self).request(method, path, **kwargs)
+                if path == '/v2.0/tokens/validate':
+                    self.resp = FakeHTTPResponse(404, '')
+
+        self.middleware.http_client_class = OldConnection
+        self.middleware.token_batch_window = 0.01
+        statuses = self._call_concurrently(['valid-token', 'invalid-token'])
+
+        self.assertEqual(statuses, {'valid-token': 200,
+                                    'invalid-token': 401})
+        self.assertEqual(requests[0], '/v2.0/tokens/validate')
+        self.assertEqual(sorted(requests[1:]),
+                         ['/v2.0/tokens/invalid-token',
+                          '/v2.0/tokens/valid-token'])
+        self.assertEqual(self.middleware.token_batch_window, 0)
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
@@ -340,6 +340,67 @@ class TokenTests(object):
         new_data_ref = self.token_api.get_token(token_id)
         self.assertEqual(data_ref, new_data_ref)
 
+    def test_get_tokens(self):
+        valid_id = uuid.uuid4().hex
+        self.token_api.create_token(valid_id, {'id': valid_id, 'a': 'b'})
+        expired_id = uuid.uuid4().hex
+        expire_time = datetime.datetime.utcnow() - datetime.timedelta(
+                minutes=1)
+        self.token_api.create_token(expired_id, {'id': expired_id,
+                                                 'expires': expire_time})
+        missing_id = uuid.uuid4().hex
+
+        token_refs = self.token_api.get_tokens([valid_id, expired_id,
+                                                missing_id])
+        self.assertEqual(token_refs.keys(), [valid_id])
+        self.assertEqual(token_refs[valid_id]['a'], 'b')
+        self.assertEqual(self.token_api.get_tokens([]), {})
+
+
+class TokenPurgeTests(object):
+    def _create_token(self, user_id, tenant_id=None, expires=None):
+        token_id = uuid.uuid4().hex
+        data = {'id': token_id,
+                'user': {'id': user_id},
+                'tenant': tenant_id and {'id': tenant_id} or None,
+                'expires': expires}
+        self.token_api.create_token(token_id, data)
+        return token_id
+
+    def test_delete_tokens(self):
+        foo_bar = self._create_token('foo', 'bar')
+        foo = self._create_token('foo')
+        baz_bar = self._create_token('baz', 'bar')
+        baz = self._create_token('baz')
+
+        self.assertEqual(self.token_api.delete_tokens(user_id='foo'), 2)
+        for token_id in (foo_bar, foo):
+            self.assertRaises(exception.TokenNotFound,
+                    self.token_api.get_token, token_id)
+        self.token_api.get_token(baz)
+
+        self.assertEqual(self.token_api.delete_tokens(tenant_id='bar'), 1)
+        self.assertRaises(exception.TokenNotFound,
+                self.token_api.get_token, baz_bar)
+        self.token_api.get_token(baz)
+
+        self.assertRaises(exception.ValidationError,
+                self.token_api.delete_tokens)
+
+    def test_flush_expired_tokens(self):
+        now = datetime.datetime.utcnow()
+        expired = now - datetime.timedelta(minutes=1)
+        for i in range(5):
+            self._create_token('foo', expires=expired)
+        valid = self._create_token('foo',
+                                   expires=now + datetime.timedelta(hours=1))
+        forever = self._create_token('foo')
+
+        self.assertEqual(self.token_api.flush_expired_tokens(batch_size=2), 5)
+        self.assertEqual(self.token_api.flush_expired_tokens(batch_size=2), 0)
+        self.token_api.get_token(valid)
+        self.token_api.get_token(forever)
+
 
 class CatalogTests(object):
 
@@ -13,7 +13,11 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import os
+import tempfile
+
 from keystone import test
+from keystone.common import kvs
 from keystone.identity.backends import kvs as identity_kvs
 from keystone.token.backends import kvs as token_kvs
 from keystone.catalog.backends import kvs as catalog_kvs
@@ -28,8 +32,64 @@ class KvsIdentity(test.TestCase, test_backend.IdentityTests):
         self.identity_api = identity_kvs.Identity(db={})
         self.load_fixtures(default_fixtures)
 
+    def test_get_tenant_users(self):
+        def tenant_user_ids(tenant_id):
+            return sorted(user_ref['id'] for user_ref in
+                          self.identity_api.get_tenant_users(tenant_id))
+
+        self.assertEqual(tenant_user_ids(self.tenant_baz['id']),
+                         [self.user_no_meta['id'], self.user_two['id']])
+
+        self.identity_api.add_user_to_tenant(self.tenant_baz['id'],
+                                             self.user_foo['id'])
+        self.identity_api.remove_user_from_tenant(self.tenant_baz['id'],
+                                                  self.user_two['id'])
+        self.identity_api.delete_user(self.user_no_meta['id'])
+        self.assertEqual(tenant_user_ids(self.tenant_baz['id']),
+                         [self.user_foo['id']])
+        self.assertEqual(tenant_user_ids(self.tenant_bar['id']),
+                         [self.user_foo['id']])
+
+    def test_delete_tenant_drops_tenant_users(self):
+        self.identity_api.delete_tenant(self.tenant_baz['id'])
+        self.identity_api.create_tenant(self.tenant_baz['id'],
+                                        self.tenant_baz)
+        self.assertEqual(
+                self.identity_api.get_tenant_users(self.tenant_baz['id']),
+                [])
+
+
+class SqliteKvsIdentity(KvsIdentity):
+    def setUp(self):
+        test.TestCase.setUp(self)
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.identity_api = identity_kvs.Identity(
+                db=kvs.SqliteKvs(self.path))
+        self.load_fixtures(default_fixtures)
+
+    def tearDown(self):
+        os.unlink(self.path)
+        super(SqliteKvsIdentity, self).tearDown()
+
+    def test_shared_between_stores(self):
+        other_api = identity_kvs.Identity(db=kvs.SqliteKvs(self.path))
+        user_ref = other_api.get_user_by_name(self.user_foo['name'])
+        self.assertEqual(user_ref['id'], self.user_foo['id'])
+
+    def test_transaction_rollback(self):
+        db = self.identity_api.db
+        try:
+            with db.transaction():
+                db.set('foo', {'a': 'b'})
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertFalse('foo' in db)
+
 
-class KvsToken(test.TestCase, test_backend.TokenTests):
+class KvsToken(test.TestCase, test_backend.TokenTests,
+               test_backend.TokenPurgeTests):
     def setUp(self):
         super(KvsToken, self).setUp()
         self.token_api = token_kvs.Token(db={})
@@ -14,10 +14,12 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import ldap
 import nose.exc
 
 from keystone import config
 from keystone import test
+from keystone.common import ldap as common_ldap
 from keystone.common.ldap import fakeldap
 from keystone.identity.backends import ldap as identity_ldap
 
@@ -31,6 +33,7 @@ CONF = config.CONF
 def clear_database():
     db = fakeldap.FakeShelve().get_instance()
     db.clear()
+    common_ldap.close_pools()
 
 
 class LDAPIdentity(test.TestCase, test_backend.IdentityTests):
@@ -45,3 +48,51 @@ class LDAPIdentity(test.TestCase, test_backend.IdentityTests):
 
     def tearDown(self):
         test.TestCase.tearDown(self)
+
+    def test_connections_are_pooled(self):
+        pool = self.identity_api.get_connection()
+        self.identity_api.authenticate(user_id=self.user_foo['id'],
+                                       tenant_id=self.tenant_bar['id'],
+                                       password=self.user_foo['password'])
+        self.identity_api.get_metadata(self.user_foo['id'],
+                                       self.tenant_bar['id'])
+        self.assertEqual(pool.connections_created, 1)
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_search_cache(self):
+        pool = self.identity_api.get_connection()
+        tenant_dn = self.identity_api.tenant._id_to_dn(self.tenant_bar['id'])
+
+        # changes made behind our back are not seen until the cache expires
+        self.identity_api.get_tenant(self.tenant_bar['id'])
+        db = fakeldap.FakeShelve().get_instance()
+        db['ldap:%s' % tenant_dn]['desc'] = ['changed elsewhere']
+        tenant_ref = self.identity_api.get_tenant(self.tenant_bar['id'])
+        self.assertNotEqual(tenant_ref.get('description'),
+                            'changed elsewhere')
+        pool.cache.clear()
+        tenant_ref = self.identity_api.get_tenant(self.tenant_bar['id'])
+        self.assertEqual(tenant_ref['description'], 'changed elsewhere')
+
+        # our own writes are seen straight away
+        tenant = {'id': self.tenant_bar['id'],
+                  'name': self.tenant_bar['name'],
+                  'description': 'changed here'}
+        self.identity_api.update_tenant(self.tenant_bar['id'], tenant)
+        tenant_ref = self.identity_api.get_tenant(self.tenant_bar['id'])
+        self.assertEqual(tenant_ref['description'], 'changed here')
+
+    def test_reconnect_when_server_down(self):
+        pool = self.identity_api.get_connection()
+        pool.cache.clear()
+        conn, _created = pool.idle[0]
+
+        def server_down(*args):
+            raise ldap.SERVER_DOWN
+
+        self.stubs.Set(conn, 'search_s', server_down)
+        user_ref = self.identity_api.get_user(self.user_foo['id'])
+        self.assertEqual(user_ref['id'], self.user_foo['id'])
+        self.assertEqual(pool.connections_created, 2)
+        self.assertEqual(len(pool.idle), 1)
+        self.assertNotEqual(pool.idle[0][0], conn)
@@ -48,6 +48,16 @@ class MemcacheClient(object):
         else:
             raise exception.TokenNotFound(token_id=key)
 
+    def get_multi(self, keys):
+        """Retrieves the values of the keys that are found."""
+        values = {}
+        for key in keys:
+            try:
+                values[key] = self.get(key)
+            except exception.TokenNotFound:
+                pass
+        return values
+
     def set(self, key, value, time=0):
         """Sets the value for a key."""
         self.check_key(key)
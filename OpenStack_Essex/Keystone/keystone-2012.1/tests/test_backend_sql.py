@@ -16,6 +16,7 @@
 
 from keystone import config
 from keystone import test
+from keystone.catalog.backends import sql as catalog_sql
 from keystone.common.sql import util as sql_util
 from keystone.identity.backends import sql as identity_sql
 from keystone.token.backends import sql as token_sql
@@ -49,7 +50,8 @@ class SqlIdentity(test.TestCase, test_backend.IdentityTests):
         self.assertEquals(tenants, [])
 
 
-class SqlToken(test.TestCase, test_backend.TokenTests):
+class SqlToken(test.TestCase, test_backend.TokenTests,
+               test_backend.TokenPurgeTests):
     def setUp(self):
         super(SqlToken, self).setUp()
         CONF(config_files=[test.etcdir('keystone.conf'),
@@ -59,6 +61,37 @@ class SqlToken(test.TestCase, test_backend.TokenTests):
         self.token_api = token_sql.Token()
 
 
+class SqlCatalog(test.TestCase):
+    def setUp(self):
+        super(SqlCatalog, self).setUp()
+        CONF(config_files=[test.etcdir('keystone.conf'),
+                           test.testsdir('test_overrides.conf'),
+                           test.testsdir('backend_sql.conf')])
+        sql_util.setup_test_database()
+        self.catalog_api = catalog_sql.Catalog()
+        self.load_fixtures(default_fixtures)
+
+    def test_get_catalog(self):
+        url = 'http://localhost:$(compute_port)s/v1.1/$(tenant_id)s'
+        endpoint = {'id': 'COMPUTE_ENDPOINT', 'region': 'RegionOne',
+                    'service_id': 'COMPUTE_ID', 'publicurl': url,
+                    'adminurl': url, 'internalurl': url}
+        self.catalog_api.create_endpoint(endpoint['id'], endpoint)
+
+        catalog_ref = self.catalog_api.get_catalog('foo', 'bar')
+        url = 'http://localhost:%s/v1.1/bar' % CONF.compute_port
+        self.assertDictEquals(catalog_ref, {
+            'RegionOne': {
+                'compute': {'name': self.service_COMPUTE_ID['name'],
+                            'publicURL': url,
+                            'adminURL': url,
+                            'internalURL': url}}})
+
+        # A change made through another driver instance is seen as well
+        catalog_sql.Catalog().delete_endpoint(endpoint['id'])
+        self.assertDictEquals(self.catalog_api.get_catalog('foo', 'bar'), {})
+
+
 #class SqlCatalog(test_backend_kvs.KvsCatalog):
 #  def setUp(self):
 #    super(SqlCatalog, self).setUp()
@@ -554,6 +554,25 @@ class JsonTestCase(RestfulTestCase, CoreApiTests):
     def assertValidVersionResponse(self, r):
         self.assertValidVersion(r.body.get('version'))
 
+    def test_validate_tokens(self):
+        token = self.get_scoped_token()
+        path = '/v2.0/tokens/validate?belongsTo=%s' % self.tenant_bar['id']
+        r = self.admin_request(method='POST', path=path,
+                               body={'tokens': [token, 'invalid']},
+                               token=token)
+        valid, invalid = r.body['tokens']
+        self.assertEqual(valid['id'], token)
+        self.assertEqual(valid['access']['token']['id'], token)
+        self.assertTrue(valid['access']['serviceCatalog'])
+        self.assertEqual(invalid['id'], 'invalid')
+        self.assertEqual(invalid['error']['code'], 404)
+
+        path += '&nocatalog'
+        r = self.admin_request(method='POST', path=path,
+                               body={'tokens': [token]},
+                               token=token)
+        self.assertFalse('serviceCatalog' in r.body['tokens'][0]['access'])
+
 
 class XmlTestCase(RestfulTestCase, CoreApiTests):
     xmlns = 'http://docs.openstack.org/identity/api/v2.0'
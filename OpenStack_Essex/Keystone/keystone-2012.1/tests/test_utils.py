@@ -60,6 +60,17 @@ class UtilsTestCase(test.TestCase):
         self.assertTrue(utils.check_password(password, hashed))
         self.assertFalse(utils.check_password(wrong, hashed))
 
+    def test_hash_in_worker_pool(self):
+        self.opt(crypt_workers=1)
+        hashed = utils.hash_password('right')
+        self.assertTrue(utils.check_password('right', hashed))
+        self.assertFalse(utils.check_password('wrong', hashed))
+
+        stats = utils.CRYPT_POOL.get_stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertTrue(stats['calls'] >= 3)
+        self.assertTrue(stats['max_time'] >= stats['last_time'])
+
     def test_isotime(self):
         dt = datetime.datetime(year=1987, month=10, day=13,
                                hour=1, minute=2, second=3)
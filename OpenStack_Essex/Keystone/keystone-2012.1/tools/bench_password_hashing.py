@@ -0,0 +1,121 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures token validation latency while password checks load a server.
+
+Runs in a single eventlet process, like keystone-all. One green thread
+validates a token every 10ms while a rising number of green threads check
+passwords back to back. Validation latency counts the time the validating
+thread waited past its wakeup, so it shows how long the hub was blocked.
+
+    python tools/bench_password_hashing.py [crypt_workers] [seconds]
+
+Compare crypt_workers=0, which hashes in the server process, with the
+default pool.
+
+"""
+
+import os
+import sys
+import time
+import uuid
+
+import eventlet
+
+possible_topdir = os.path.normpath(os.path.join(os.path.abspath(__file__),
+                                                os.pardir,
+                                                os.pardir))
+if os.path.exists(os.path.join(possible_topdir, 'keystone', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+from keystone import config
+from keystone.common import utils
+from keystone.token.backends import kvs as token_kvs
+
+
+CONF = config.CONF
+INTERVAL = 0.01
+LOADS = (0, 1, 2, 4, 8, 16)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def validate(token_api, token_id, latencies, done):
+    while not done:
+        wakeup = time.time() + INTERVAL
+        eventlet.sleep(INTERVAL)
+        token_api.get_token(token_id)
+        latencies.append(time.time() - wakeup)
+
+
+def authenticate(hashed, counts, done):
+    while not done:
+        utils.check_password('secret', hashed)
+        counts.append(1)
+        # a new request, as the wsgi server would start
+        eventlet.sleep(0)
+
+
+def run(load, seconds, token_api, token_id, hashed):
+    latencies = []
+    counts = []
+    done = []
+    pool = eventlet.GreenPool()
+    pool.spawn_n(validate, token_api, token_id, latencies, done)
+    for i in range(load):
+        pool.spawn_n(authenticate, hashed, counts, done)
+    max_depth = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        eventlet.sleep(INTERVAL)
+        max_depth = max(max_depth, utils.CRYPT_POOL.queue_depth)
+    done.append(True)
+    pool.waitall()
+    print '%5d %10.1f %10.1f %10.1f %10d' % (
+        load,
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 99) * 1000,
+        len(counts) / float(seconds),
+        max_depth)
+
+
+def main(argv):
+    CONF(config_files=[])
+    if len(argv) > 1:
+        CONF.set_override('crypt_workers', int(argv[1]))
+    seconds = len(argv) > 2 and float(argv[2]) or 5.0
+
+    token_api = token_kvs.Token(db={})
+    token_id = uuid.uuid4().hex
+    token_api.create_token(token_id, {'id': token_id})
+    hashed = utils.hash_password('secret')
+
+    print 'crypt_workers=%s crypt_strength=%d' % (CONF.crypt_workers,
+                                                  CONF.crypt_strength)
+    print '%5s %10s %10s %10s %10s' % ('auths', 'p50 ms', 'p99 ms',
+                                       'auth/s', 'max queue')
+    for load in LOADS:
+        run(load, seconds, token_api, token_id, hashed)
+    print utils.CRYPT_POOL.get_stats()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
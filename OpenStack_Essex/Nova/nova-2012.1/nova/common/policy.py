@@ -18,6 +18,7 @@
 """Common Policy Engine Implementation"""
 
 import json
+import re
 import urllib
 import urllib2
 
@@ -45,7 +46,7 @@ def reset():
     _BRAIN = None
 
 
-def enforce(match_list, target_dict, credentials_dict):
+def enforce(match_list, target_dict, credentials_dict, cache=None):
     """Enforces authorization of some rules against credentials.
 
     :param match_list: nested tuples of data to match against
@@ -106,18 +107,108 @@ def enforce(match_list, target_dict, credentials_dict):
       Credentials dicts contain as much information as we can about the user
       performing the action.
 
+    :param cache: optional dict, such as one kept for the duration of a
+      request, in which results are remembered by the credentials and target
+      values they depend on
+
     :raises NotAuthorized: if the check fails
 
     """
     global _BRAIN
-    if not _BRAIN:
-        _BRAIN = Brain()
-    if not _BRAIN.check(match_list, target_dict, credentials_dict):
+    brain = _BRAIN
+    if not brain:
+        brain = _BRAIN = Brain()
+    if not brain.check(match_list, target_dict, credentials_dict, cache):
         raise NotAuthorized()
 
 
+class _Check(object):
+    """A compiled match list.
+
+    :param func: callable taking (target_dict, cred_dict, roles), where
+                 roles is a frozenset of the lowercased credential roles
+    :param target_keys: target keys the result depends on, or None if it
+                        may depend on the whole target
+    :param cred_keys: credential keys the result depends on, or None if it
+                      may depend on all credentials
+    :param uses_roles: True if the result depends on the roles
+
+    """
+    __slots__ = ['func', 'target_keys', 'cred_keys', 'uses_roles']
+
+    def __init__(self, func, target_keys=(), cred_keys=(), uses_roles=False):
+        self.func = func
+        self.target_keys = target_keys
+        self.cred_keys = cred_keys
+        self.uses_roles = uses_roles
+
+    def cache_key(self, target_dict, cred_dict):
+        """Returns the values the result depends on, or None."""
+        if (self.target_keys is None or self.cred_keys is None or
+            not isinstance(target_dict, dict)):
+            return None
+        key = (self,
+               tuple(map(target_dict.get, self.target_keys)),
+               tuple(map(cred_dict.get, self.cred_keys)))
+        if self.uses_roles:
+            key += (tuple(cred_dict['roles']),)
+        return key
+
+
+_TRUE = _Check(lambda target_dict, cred_dict, roles: True)
+_FALSE = _Check(lambda target_dict, cred_dict, roles: False)
+
+# Matches the named substitutions in a generic match
+_SUBSTITUTION = re.compile(r'%\(([^)]*)\)')
+
+
+def _merge_keys(checks, attr):
+    keys = set()
+    for check in checks:
+        if getattr(check, attr) is None:
+            return None
+        keys.update(getattr(check, attr))
+    return tuple(sorted(keys))
+
+
+def _combine(checks, any_of):
+    """Flattens checks into one that passes if any (or all) of them do."""
+    short_circuit, skip = any_of and (_TRUE, _FALSE) or (_FALSE, _TRUE)
+    checks = [check for check in checks if check is not skip]
+    if short_circuit in checks:
+        return short_circuit
+    if not checks:
+        return skip
+    if len(checks) == 1:
+        return checks[0]
+
+    funcs = tuple(check.func for check in checks)
+    if any_of:
+        def func(target_dict, cred_dict, roles):
+            for f in funcs:
+                if f(target_dict, cred_dict, roles):
+                    return True
+            return False
+    else:
+        def func(target_dict, cred_dict, roles):
+            for f in funcs:
+                if not f(target_dict, cred_dict, roles):
+                    return False
+            return True
+
+    return _Check(func,
+                  _merge_keys(checks, 'target_keys'),
+                  _merge_keys(checks, 'cred_keys'),
+                  any(check.uses_roles for check in checks))
+
+
 class Brain(object):
-    """Implements policy checking."""
+    """Implements policy checking.
+
+    Rules are compiled into closures when they are loaded, with rule:
+    references inlined, so checks do not interpret the match lists again.
+
+    """
     @classmethod
     def load_json(cls, data, default_rule=None):
         """Init a brain using json instead of a rules dictionary."""
@@ -127,76 +218,163 @@ class Brain(object):
     def __init__(self, rules=None, default_rule=None):
         self.rules = rules or {}
         self.default_rule = default_rule
+        self._compile()
 
     def add_rule(self, key, match):
         self.rules[key] = match
+        self._compile()
+
+    def _compile(self):
+        """Compiles all of the rules, replacing the compiled set at once."""
+        compiled = {}
+        for name in self.rules:
+            self._compile_rule(name, compiled, set())
+        self._compiled = compiled
+        self._match_lists = {}
+
+    def _compile_rule(self, name, compiled, compiling):
+        if name in compiled:
+            return compiled[name]
+        if name in compiling:
+            # The rule refers to itself, so look it up when checked
+            return _Check(lambda target_dict, cred_dict, roles:
+                          compiled[name].func(target_dict, cred_dict, roles),
+                          None, None, True)
 
-    def _check(self, match, target_dict, cred_dict):
-        match_kind, match_value = match.split(':', 1)
         try:
-            f = getattr(self, '_check_%s' % match_kind)
-        except AttributeError:
-            if not self._check_generic(match, target_dict, cred_dict):
-                return False
-        else:
-            if not f(match_value, target_dict, cred_dict):
-                return False
-        return True
-
-    def check(self, match_list, target_dict, cred_dict):
-        """Checks authorization of some rules against credentials.
-
-        Detailed description of the check with examples in policy.enforce().
-
-        :param match_list: nested tuples of data to match against
-        :param target_dict: dict of object properties
-        :param credentials_dict: dict of actor properties
-
-        :returns: True if the check passes
-
-        """
+            match_list = self.rules[name]
+        except KeyError:
+            if self.default_rule and name != self.default_rule:
+                return self._compile_rule(self.default_rule, compiled,
+                                          compiling)
+            return _FALSE
+
+        compiling.add(name)
+        check = self._compile_match_list(match_list, compiled, compiling)
+        compiling.discard(name)
+        compiled[name] = check
+        return check
+
+    def _compile_match_list(self, match_list, compiled, compiling):
         if not match_list:
-            return True
+            return _TRUE
+        or_checks = []
         for and_list in match_list:
             if isinstance(and_list, basestring):
                 and_list = (and_list,)
-            if all([self._check(item, target_dict, cred_dict)
-                    for item in and_list]):
-                return True
-        return False
+            or_checks.append(_combine([self._compile_match(match, compiled,
+                                                           compiling)
+                                       for match in and_list], False))
+        return _combine(or_checks, True)
+
+    def _compile_match(self, match, compiled, compiling):
+        if ':' not in match:
+            # a malformed match never passes
+            return _FALSE
+        match_kind, match_value = match.split(':', 1)
+        if match_kind == 'rule':
+            return self._compile_rule(match_value, compiled, compiling)
+        if match_kind == 'role':
+            role = match_value.lower()
+            return _Check(lambda target_dict, cred_dict, roles: role in roles,
+                          uses_roles=True)
 
-    def _check_rule(self, match, target_dict, cred_dict):
-        """Recursively checks credentials based on the brains rules."""
         try:
-            new_match_list = self.rules[match]
-        except KeyError:
-            if self.default_rule and match != self.default_rule:
-                new_match_list = ('rule:%s' % self.default_rule,)
-            else:
-                return False
-
-        return self.check(new_match_list, target_dict, cred_dict)
-
-    def _check_role(self, match, target_dict, cred_dict):
-        """Check that there is a matching role in the cred dict."""
-        return match.lower() in [x.lower() for x in cred_dict['roles']]
+            f = getattr(self, '_check_%s' % match_kind)
+        except AttributeError:
+            return self._compile_generic(match)
+        # Custom checks may look at anything, so are never memoized
+        return _Check(lambda target_dict, cred_dict, roles:
+                      f(match_value, target_dict, cred_dict),
+                      None, None, False)
 
-    def _check_generic(self, match, target_dict, cred_dict):
-        """Check an individual match.
+    def _compile_generic(self, match):
+        """Compile an individual match.
 
         Matches look like:
 
             tenant:%(tenant_id)s
             role:compute:admin
 
-        """
+        The target dict is substituted into the match using the % operator
+        and the result is matched against the creds dict.
 
+        """
         # TODO(termie): do dict inspection via dot syntax
-        match = match % target_dict
         key, value = match.split(':', 1)
-        if key in cred_dict:
-            return value == cred_dict[key]
-        return False
+        if '%' in key:
+            def func(target_dict, cred_dict, roles):
+                key, value = (match % target_dict).split(':', 1)
+                return key in cred_dict and value == cred_dict[key]
+            return _Check(func, None, None, False)
+
+        if '%' not in value:
+            return _Check(lambda target_dict, cred_dict, roles:
+                          key in cred_dict and value == cred_dict[key],
+                          (), (key,), False)
+
+        if '%' in _SUBSTITUTION.sub('', value.replace('%%', '')):
+            # positional substitutions see the whole target dict
+            target_keys = None
+        else:
+            target_keys = tuple(sorted(set(_SUBSTITUTION.findall(value))))
+        return _Check(lambda target_dict, cred_dict, roles:
+                      key in cred_dict and
+                      value % target_dict == cred_dict[key],
+                      target_keys, (key,), False)
+
+    def _get_check(self, match_list):
+        match_lists = self._match_lists
+        try:
+            return match_lists[match_list]
+        except (KeyError, TypeError):
+            pass
+        if isinstance(match_list, basestring):
+            key = match_list
+        else:
+            # match lists loaded from json are lists, which can't be keys
+            key = tuple(isinstance(and_list, basestring) and and_list or
+                        tuple(and_list) for and_list in match_list or ())
+        check = match_lists.get(key)
+        if check is None:
+            check = self._compile_match_list(match_list, self._compiled,
+                                             set())
+            match_lists[key] = check
+        return check
+
+    def check(self, match_list, target_dict, cred_dict, cache=None):
+        """Checks authorization of some rules against credentials.
+
+        Detailed description of the check with examples in policy.enforce().
+
+        :param match_list: nested tuples of data to match against
+        :param target_dict: dict of object properties
+        :param credentials_dict: dict of actor properties
+        :param cache: optional dict remembering results across checks
+
+        :returns: True if the check passes
+
+        """
+        check = self._get_check(match_list)
+        key = None
+        if cache is not None:
+            key = check.cache_key(target_dict, cred_dict)
+        if key is not None:
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable values can not be memoized
+                key = None
+
+        roles = None
+        if check.uses_roles:
+            roles = frozenset(role.lower() for role in cred_dict['roles'])
+        result = check.func(target_dict, cred_dict, roles)
+        if key is not None:
+            cache[key] = result
+        return result
 
 
 class HttpBrain(Brain):
@@ -2284,77 +2284,49 @@ class ComputeManager(manager.SchedulerDependentManager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        The hypervisor is authoritative for the power_state data, but we don't
-        want to do an expensive call to the virt driver's list_instances_detail
-        method. Instead, we do a less-expensive call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database. We call eventlet.sleep(0) after
-        each loop to allow the periodic task eventlet to do other work.
+        The hypervisor is authoritative for the power_state data. We fetch
+        the power states of all of its instances with a single call to the
+        virt driver's list_instances_detail method and match them to the
+        database records by name. Instances it does not list, such as the
+        ones a driver only lists while they run, and all instances of
+        drivers without list_instances_detail, are checked one at a time
+        with get_info, calling eventlet.sleep(0) after each to allow the
+        periodic task eventlet to do other work. The power states that
+        changed are then saved in one database update.
 
         If the instance is not found on the hypervisor, but is in the database,
         then it will be set to power_state.NOSTATE.
         """
         db_instances = self.db.instance_get_all_by_host(context, self.host)
 
-        num_vm_instances = self.driver.get_num_instances()
+        try:
+            vm_power_states = dict((vm_instance.name, vm_instance.state)
+                    for vm_instance in self.driver.list_instances_detail())
+            num_vm_instances = len(vm_power_states)
+        except NotImplementedError:
+            vm_power_states = {}
+            num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
             LOG.warn(_("Found %(num_db_instances)s in the database and "
                        "%(num_vm_instances)s on the hypervisor.") % locals())
 
+        updates = {}
         for db_instance in db_instances:
-            # Allow other periodic tasks to do some work...
-            greenthread.sleep(0)
             db_power_state = db_instance['power_state']
-            try:
-                vm_instance = self.driver.get_info(db_instance)
-                vm_power_state = vm_instance['state']
-            except exception.InstanceNotFound:
-                # This exception might have been caused by a race condition
-                # between _sync_power_states and live migrations. Two cases
-                # are possible as documented below. To this aim, refresh the
-                # DB instance state.
+            vm_power_state = vm_power_states.get(db_instance['name'])
+            if vm_power_state is None:
+                # Allow other periodic tasks to do some work...
+                greenthread.sleep(0)
                 try:
-                    u = self.db.instance_get_by_uuid(context,
-                                                     db_instance['uuid'])
-                    if self.host != u['host']:
-                        # on the sending end of nova-compute _sync_power_state
-                        # may have yielded to the greenthread performing a live
-                        # migration; this in turn has changed the resident-host
-                        # for the VM; However, the instance is still active, it
-                        # is just in the process of migrating to another host.
-                        # This implies that the compute source must relinquish
-                        # control to the compute destination.
-                        LOG.info(_("During the sync_power process the "
-                                   "instance %(uuid)s has moved from "
-                                   "host %(src)s to host %(dst)s") %
-                                   {'uuid': db_instance['uuid'],
-                                    'src': self.host,
-                                    'dst': u['host']})
-                    elif (u['host'] == self.host and
-                          u['vm_state'] == vm_states.MIGRATING):
-                        # on the receiving end of nova-compute, it could happen
-                        # that the DB instance already report the new resident
-                        # but the actual VM has not showed up on the hypervisor
-                        # yet. In this case, let's allow the loop to continue
-                        # and run the state sync in a later round
-                        LOG.info(_("Instance %s is in the process of "
-                                   "migrating to this host. Wait next "
-                                   "sync_power cycle before setting "
-                                   "power state to NOSTATE")
-                                   % db_instance['uuid'])
-                    else:
-                        LOG.warn(_("Instance found in database but not "
-                                   "known by hypervisor. Setting power "
-                                   "state to NOSTATE"), locals(),
-                                   instance=db_instance)
-                        vm_power_state = power_state.NOSTATE
+                    vm_instance = self.driver.get_info(db_instance)
+                    vm_power_state = vm_instance['state']
                 except exception.InstanceNotFound:
-                    # no need to update vm_state for deleted instances
-                    continue
+                    vm_power_state = self._get_missing_power_state(
+                            context, db_instance)
+                    if vm_power_state is None:
+                        continue
 
             if vm_power_state == db_power_state:
                 continue
@@ -2364,14 +2336,62 @@ class ComputeManager(manager.SchedulerDependentManager):
                                    power_state.SHUTDOWN,
                                    power_state.CRASHED)
                 and db_instance['vm_state'] == vm_states.ACTIVE):
-                self._instance_update(context,
-                                      db_instance["id"],
-                                      power_state=vm_power_state,
-                                      vm_state=vm_states.SHUTOFF)
+                updates[db_instance['id']] = {'power_state': vm_power_state,
+                                              'vm_state': vm_states.SHUTOFF}
             else:
-                self._instance_update(context,
-                                      db_instance["id"],
-                                      power_state=vm_power_state)
+                updates[db_instance['id']] = {'power_state': vm_power_state}
+
+        if updates:
+            # Instances that were live migrated away meanwhile are skipped
+            self.db.instance_bulk_update(context, updates, host=self.host)
+
+    def _get_missing_power_state(self, context, db_instance):
+        """Returns the power state to save for an instance the hypervisor
+        does not know, or None to leave the instance alone.
+        """
+        # This might have been caused by a race condition between
+        # _sync_power_states and live migrations. Two cases are possible as
+        # documented below. To this aim, refresh the DB instance state.
+        try:
+            u = self.db.instance_get_by_uuid(context, db_instance['uuid'])
+        except exception.InstanceNotFound:
+            # no need to update vm_state for deleted instances
+            return None
+
+        if self.host != u['host']:
+            # on the sending end of nova-compute _sync_power_state
+            # may have yielded to the greenthread performing a live
+            # migration; this in turn has changed the resident-host
+            # for the VM; However, the instance is still active, it
+            # is just in the process of migrating to another host.
+            # This implies that the compute source must relinquish
+            # control to the compute destination.
+            LOG.info(_("During the sync_power process the "
+                       "instance %(uuid)s has moved from "
+                       "host %(src)s to host %(dst)s") %
+                       {'uuid': db_instance['uuid'],
+                        'src': self.host,
+                        'dst': u['host']})
+            return None
+        elif (u['host'] == self.host and
+              u['vm_state'] == vm_states.MIGRATING):
+            # on the receiving end of nova-compute, it could happen
+            # that the DB instance already report the new resident
+            # but the actual VM has not showed up on the hypervisor
+            # yet. In this case, let's allow the loop to continue
+            # and run the state sync in a later round
+            LOG.info(_("Instance %s is in the process of "
+                       "migrating to this host. Wait next "
+                       "sync_power cycle before setting "
+                       "power state to NOSTATE")
+                       % db_instance['uuid'])
+            return None
+
+        LOG.warn(_("Instance found in database but not "
+                   "known by hypervisor. Setting power "
+                   "state to NOSTATE"), locals(),
+                   instance=db_instance)
+        return power_state.NOSTATE
 
     @manager.periodic_task
     def _reclaim_queued_deletes(self, context):
@@ -80,6 +80,8 @@ class RequestContext(object):
             request_id = generate_request_id()
         self.request_id = request_id
         self.auth_token = auth_token
+        # Policy results for this request, see nova.policy.enforce()
+        self.policy_cache = {}
         if overwrite or not hasattr(local.store, 'context'):
             self.update_store()
 
@@ -611,6 +611,18 @@ def instance_update(context, instance_id, values):
     return IMPL.instance_update(context, instance_id, values)
 
 
+def instance_bulk_update(context, updates, host=None):
+    """Set the given properties on many instances at once.
+
+    :param updates: dict mapping instance ids to dicts of values
+    :param host: if given, only update the instances still on this host
+
+    Instances that do not exist are skipped.
+
+    """
+    return IMPL.instance_bulk_update(context, updates, host)
+
+
 def instance_add_security_group(context, instance_id, security_group_id):
     """Associate the given security group with the given instance."""
     return IMPL.instance_add_security_group(context, instance_id,
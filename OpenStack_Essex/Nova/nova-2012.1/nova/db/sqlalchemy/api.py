@@ -1622,6 +1622,26 @@ def instance_update(context, instance_id, values):
     return instance_ref
 
 
+@require_context
+def instance_bulk_update(context, updates, host=None):
+    # Instances given the same values are updated by a single statement
+    instance_ids_by_values = {}
+    for instance_id, values in updates.iteritems():
+        key = tuple(sorted(values.iteritems()))
+        instance_ids_by_values.setdefault(key, []).append(instance_id)
+
+    session = get_session()
+    with session.begin():
+        for key, instance_ids in instance_ids_by_values.iteritems():
+            values = dict(key)
+            values['updated_at'] = utils.utcnow()
+            query = model_query(context, models.Instance, session=session).\
+                            filter(models.Instance.id.in_(instance_ids))
+            if host is not None:
+                query = query.filter_by(host=host)
+            query.update(values, synchronize_session=False)
+
+
 def instance_add_security_group(context, instance_uuid, security_group_id):
     """Associate the given security group with the given instance"""
     session = get_session()
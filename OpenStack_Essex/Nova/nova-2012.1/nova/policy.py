@@ -58,6 +58,8 @@ def init():
 
 
 def _set_brain(data):
+    # The new brain compiles its rules before it replaces the old one, so
+    # concurrent checks see either the old rules or the new ones
     default_rule = FLAGS.policy_default_rule
     policy.set_brain(policy.HttpBrain.load_json(data, default_rule))
 
@@ -85,6 +87,7 @@ def enforce(context, action, target):
     credentials = context.to_dict()
 
     try:
-        policy.enforce(match_list, target, credentials)
+        policy.enforce(match_list, target, credentials,
+                       cache=getattr(context, 'policy_cache', None))
     except policy.NotAuthorized:
         raise exception.PolicyNotAuthorized(action=action)
@@ -27,30 +27,46 @@ AMQP, but is deprecated and predates this code.
 
 import inspect
 import sys
+import time
 import traceback
 import uuid
 
 from eventlet import greenpool
 from eventlet import pools
+from eventlet import queue
+from eventlet import semaphore
 
 from nova import context
 from nova import exception
 from nova import flags
 from nova import local
 from nova import log as logging
+from nova.openstack.common import cfg
 import nova.rpc.common as rpc_common
+from nova.rpc import stats as rpc_stats
 from nova import utils
 
 LOG = logging.getLogger(__name__)
 
+amqp_opts = [
+    cfg.BoolOpt('amqp_rpc_single_reply_queue',
+                default=False,
+                help='Receive the replies to call and multicall on one '
+                     'queue per process, rather than on a queue declared '
+                     'for every call. Only enable this once every service '
+                     'answering the calls has been upgraded to support it.'),
+    ]
 
 FLAGS = flags.FLAGS
+FLAGS.register_opts(amqp_opts)
 
 
 class Pool(pools.Pool):
     """Class that implements a Pool of Connections."""
     def __init__(self, *args, **kwargs):
         self.connection_cls = kwargs.pop("connection_cls", None)
+        self.reply_proxy = None
+        self._reply_proxy_sem = semaphore.Semaphore()
         kwargs.setdefault("max_size", FLAGS.rpc_conn_pool_size)
         kwargs.setdefault("order_as_stack", True)
         super(Pool, self).__init__(*args, **kwargs)
@@ -60,9 +76,21 @@ class Pool(pools.Pool):
         LOG.debug('Pool creating new connection')
         return self.connection_cls()
 
+    def get_reply_proxy(self):
+        """Return the ReplyProxy that receives the replies to the calls
+        made with this pool, creating it on first use.
+        """
+        with self._reply_proxy_sem:
+            if self.reply_proxy is None:
+                self.reply_proxy = ReplyProxy(self)
+        return self.reply_proxy
+
     def empty(self):
         while self.free_items:
             self.get().close()
+        if self.reply_proxy is not None:
+            self.reply_proxy.close()
+            self.reply_proxy = None
 
 
 class ConnectionContext(rpc_common.Connection):
@@ -134,10 +162,41 @@ class ConnectionContext(rpc_common.Connection):
             raise exception.InvalidRPCConnectionReuse()
 
 
-def msg_reply(msg_id, connection_pool, reply=None, failure=None, ending=False):
+class ReplyProxy(ConnectionContext):
+    """A connection that receives the replies to all of the calls made
+    through a connection pool on a single queue, and hands each of them to
+    the MulticallProxyWaiter of its call.
+    """
+
+    def __init__(self, connection_pool):
+        self._call_waiters = {}
+        self.reply_q = 'reply_%s' % uuid.uuid4().hex
+        super(ReplyProxy, self).__init__(connection_pool, pooled=False)
+        self.declare_direct_consumer(self.reply_q, self._process_data)
+        self.consume_in_thread()
+
+    def _process_data(self, message_data):
+        msg_id = message_data.pop('_msg_id', None)
+        waiter = self._call_waiters.get(msg_id)
+        if waiter is None:
+            LOG.warn(_('No call waiting for reply to message %s, '
+                       'dropping it'), msg_id)
+        else:
+            waiter.put(message_data)
+
+    def add_call_waiter(self, waiter, msg_id):
+        self._call_waiters[msg_id] = waiter
+
+    def del_call_waiter(self, msg_id):
+        self._call_waiters.pop(msg_id, None)
+
+
+def msg_reply(msg_id, connection_pool, reply=None, failure=None, ending=False,
+              reply_q=None):
     """Sends a reply or an error on the channel signified by msg_id.
 
-    Failure should be a sys.exc_info() tuple.
+    Failure should be a sys.exc_info() tuple.  If the caller gave a reply_q,
+    the reply is sent there along with its msg_id.
 
     """
     with ConnectionContext(connection_pool) as conn:
@@ -156,20 +215,25 @@ def msg_reply(msg_id, connection_pool, reply=None, failure=None, ending=False):
                     'failure': failure}
         if ending:
             msg['ending'] = True
-        conn.direct_send(msg_id, msg)
+        if reply_q:
+            msg['_msg_id'] = msg_id
+            conn.direct_send(reply_q, msg)
+        else:
+            conn.direct_send(msg_id, msg)
 
 
 class RpcContext(context.RequestContext):
     """Context that supports replying to a rpc.call"""
     def __init__(self, *args, **kwargs):
         self.msg_id = kwargs.pop('msg_id', None)
+        self.reply_q = kwargs.pop('reply_q', None)
         super(RpcContext, self).__init__(*args, **kwargs)
 
     def reply(self, reply=None, failure=None, ending=False,
               connection_pool=None):
         if self.msg_id:
             msg_reply(self.msg_id, connection_pool, reply, failure,
-                      ending)
+                      ending, self.reply_q)
             if ending:
                 self.msg_id = None
 
@@ -185,6 +249,7 @@ def unpack_context(msg):
             value = msg.pop(key)
             context_dict[key[9:]] = value
     context_dict['msg_id'] = msg.pop('_msg_id', None)
+    context_dict['reply_q'] = msg.pop('_reply_q', None)
     ctx = RpcContext.from_dict(context_dict)
     rpc_common._safe_log(LOG.debug, _('unpacked context: %s'), ctx.to_dict())
     return ctx
@@ -207,10 +272,11 @@ def pack_context(msg, context):
 class ProxyCallback(object):
     """Calls methods on a proxy object based on method and args."""
 
-    def __init__(self, proxy, connection_pool):
+    def __init__(self, proxy, connection_pool, topic=None):
         self.proxy = proxy
         self.pool = greenpool.GreenPool(FLAGS.rpc_thread_pool_size)
         self.connection_pool = connection_pool
+        self.topic = topic
 
     def __call__(self, message_data):
         """Consumer callback to call a method on a proxy object.
@@ -238,13 +304,18 @@ class ProxyCallback(object):
             ctxt.reply(_('No method for message: %s') % message_data,
                        connection_pool=self.connection_pool)
             return
-        self.pool.spawn_n(self._process_data, ctxt, method, args)
+        rpc_stats.message_received(self.topic, method, self.pool)
+        self.pool.spawn_n(self._process_data, ctxt, method, args,
+                          time.time())
 
     @exception.wrap_exception()
-    def _process_data(self, ctxt, method, args):
+    def _process_data(self, ctxt, method, args, received):
         """Thread that magically looks for a method on the proxy
         object and calls it.
         """
+        start = time.time()
+        reply_size = 0
+        failed = False
         ctxt.update_store()
         try:
             node_func = getattr(self.proxy, str(method))
@@ -254,15 +325,20 @@ class ProxyCallback(object):
             # Check if the result was a generator
             if inspect.isgenerator(rval):
                 for x in rval:
+                    reply_size += rpc_stats.payload_size(x)
                     ctxt.reply(x, None, connection_pool=self.connection_pool)
             else:
+                reply_size += rpc_stats.payload_size(rval)
                 ctxt.reply(rval, None, connection_pool=self.connection_pool)
             # This final None tells multicall that it is done.
             ctxt.reply(ending=True, connection_pool=self.connection_pool)
         except Exception as e:
+            failed = True
             LOG.exception('Exception during message handling')
             ctxt.reply(None, sys.exc_info(),
                        connection_pool=self.connection_pool)
+        rpc_stats.message_processed(self.topic, method, start - received,
+                                    time.time() - start, reply_size, failed)
         return
 
 
@@ -312,6 +388,57 @@ class MulticallWaiter(object):
             yield result
 
 
+class MulticallProxyWaiter(object):
+    """Returns the replies to a call as the ReplyProxy receives them."""
+
+    def __init__(self, reply_proxy, msg_id, timeout):
+        self._reply_proxy = reply_proxy
+        self._msg_id = msg_id
+        self._timeout = timeout or FLAGS.rpc_response_timeout
+        self._dataqueue = queue.LightQueue()
+        self._done = False
+        self._got_ending = False
+        reply_proxy.add_call_waiter(self, msg_id)
+
+    def put(self, data):
+        self._dataqueue.put(data)
+
+    def done(self):
+        if self._done:
+            return
+        self._done = True
+        self._reply_proxy.del_call_waiter(self._msg_id)
+
+    def _process_data(self, data):
+        if data['failure']:
+            return rpc_common.RemoteError(*data['failure'])
+        elif data.get('ending', False):
+            self._got_ending = True
+        else:
+            return data['result']
+
+    def __iter__(self):
+        """Return a result until we get a 'None' response from consumer"""
+        if self._done:
+            raise StopIteration
+        while True:
+            try:
+                data = self._dataqueue.get(timeout=self._timeout)
+            except queue.Empty:
+                self.done()
+                LOG.error(_('Timed out waiting for RPC response to message '
+                            '%s'), self._msg_id)
+                raise rpc_common.Timeout()
+            result = self._process_data(data)
+            if self._got_ending:
+                self.done()
+                raise StopIteration
+            if isinstance(result, Exception):
+                self.done()
+                raise result
+            yield result
+
+
 def create_connection(new, connection_pool):
     """Create a connection"""
     return ConnectionContext(connection_pool, pooled=not new)
@@ -329,18 +456,36 @@ def multicall(context, topic, msg, timeout, connection_pool):
     LOG.debug(_('MSG_ID is %s') % (msg_id))
     pack_context(msg, context)
 
-    conn = ConnectionContext(connection_pool)
-    wait_msg = MulticallWaiter(conn, timeout)
-    conn.declare_direct_consumer(msg_id, wait_msg)
-    conn.topic_send(topic, msg)
+    if not FLAGS.amqp_rpc_single_reply_queue:
+        conn = ConnectionContext(connection_pool)
+        wait_msg = MulticallWaiter(conn, timeout)
+        conn.declare_direct_consumer(msg_id, wait_msg)
+        conn.topic_send(topic, msg)
+        return wait_msg
+
+    reply_proxy = connection_pool.get_reply_proxy()
+    msg['_reply_q'] = reply_proxy.reply_q
+    wait_msg = MulticallProxyWaiter(reply_proxy, msg_id, timeout)
+    try:
+        with ConnectionContext(connection_pool) as conn:
+            conn.topic_send(topic, msg)
+    except Exception:
+        with utils.save_and_reraise_exception():
+            wait_msg.done()
     return wait_msg
 
 
 def call(context, topic, msg, timeout, connection_pool):
     """Sends a message on a topic and wait for a response."""
-    rv = multicall(context, topic, msg, timeout, connection_pool)
-    # NOTE(vish): return the last result from the multicall
-    rv = list(rv)
+    start = time.time()
+    try:
+        rv = multicall(context, topic, msg, timeout, connection_pool)
+        # NOTE(vish): return the last result from the multicall
+        rv = list(rv)
+    except Exception:
+        with utils.save_and_reraise_exception():
+            rpc_stats.call_finished(topic, msg, time.time() - start, True)
+    rpc_stats.call_finished(topic, msg, time.time() - start, False)
     if not rv:
         return
     return rv[-1]
@@ -352,6 +497,7 @@ def cast(context, topic, msg, connection_pool):
     pack_context(msg, context)
     with ConnectionContext(connection_pool) as conn:
         conn.topic_send(topic, msg)
+    rpc_stats.cast_sent(topic, msg)
 
 
 def fanout_cast(context, topic, msg, connection_pool):
@@ -360,6 +506,7 @@ def fanout_cast(context, topic, msg, connection_pool):
     pack_context(msg, context)
     with ConnectionContext(connection_pool) as conn:
         conn.fanout_send(topic, msg)
+    rpc_stats.cast_sent(topic, msg)
 
 
 def cast_to_server(context, server_params, topic, msg, connection_pool):
@@ -368,6 +515,7 @@ def cast_to_server(context, server_params, topic, msg, connection_pool):
     with ConnectionContext(connection_pool, pooled=False,
             server_params=server_params) as conn:
         conn.topic_send(topic, msg)
+    rpc_stats.cast_sent(topic, msg)
 
 
 def fanout_cast_to_server(context, server_params, topic, msg,
@@ -377,6 +525,7 @@ def fanout_cast_to_server(context, server_params, topic, msg,
     with ConnectionContext(connection_pool, pooled=False,
             server_params=server_params) as conn:
         conn.fanout_send(topic, msg)
+    rpc_stats.cast_sent(topic, msg)
 
 
 def notify(context, topic, msg, connection_pool):
@@ -29,6 +29,8 @@ import eventlet
 from nova import context
 from nova import flags
 from nova.rpc import common as rpc_common
+from nova.rpc import stats as rpc_stats
+from nova import utils
 
 CONSUMERS = {}
 
@@ -60,6 +62,7 @@ class Consumer(object):
 
         def _inner():
             ctxt = RpcContext.from_dict(context.to_dict())
+            start = time.time()
             try:
                 rval = node_func(context=ctxt, **node_args)
                 res = []
@@ -76,9 +79,14 @@ class Consumer(object):
                             res.append(val)
                     else:
                         res.append(rval)
+                rpc_stats.message_processed(self.topic, method, 0,
+                        time.time() - start, rpc_stats.payload_size(res),
+                        False)
                 done.send(res)
             except Exception:
                 exc_info = sys.exc_info()
+                rpc_stats.message_processed(self.topic, method, 0,
+                        time.time() - start, 0, True)
                 done.send_exception(
                         rpc_common.RemoteError(exc_info[0].__name__,
                             str(exc_info[1]),
@@ -150,9 +158,15 @@ def multicall(context, topic, msg, timeout=None):
 
 def call(context, topic, msg, timeout=None):
     """Sends a message on a topic and wait for a response."""
-    rv = multicall(context, topic, msg, timeout)
-    # NOTE(vish): return the last result from the multicall
-    rv = list(rv)
+    start = time.time()
+    try:
+        rv = multicall(context, topic, msg, timeout)
+        # NOTE(vish): return the last result from the multicall
+        rv = list(rv)
+    except Exception:
+        with utils.save_and_reraise_exception():
+            rpc_stats.call_finished(topic, msg, time.time() - start, True)
+    rpc_stats.call_finished(topic, msg, time.time() - start, False)
     if not rv:
         return
     return rv[-1]
@@ -0,0 +1,389 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Instrumentation hooks for nova.rpc.
+
+The rpc drivers report the calls and casts they make and the messages they
+process to the hooks named by the rpc_instrumentation_hooks flag.  A hook is
+a class or a module with any of the methods of RpcHook.  RpcStats is a hook
+that keeps counters and histograms per topic and method, logs them
+periodically and can serve them as JSON on a local unix socket:
+
+    nova.conf: rpc_instrumentation_hooks=nova.rpc.stats.RpcStats
+               rpc_stats_socket=/var/run/nova/rpc-stats-%(pid)s.sock
+
+    $ socat - UNIX-CONNECT:/var/run/nova/rpc-stats-1234.sock
+"""
+
+import bisect
+import json
+import os
+import socket
+import time
+
+import eventlet
+
+from nova import flags
+from nova import log as logging
+from nova.openstack.common import cfg
+from nova import utils
+
+
+LOG = logging.getLogger(__name__)
+
+rpc_stats_opts = [
+    cfg.ListOpt('rpc_instrumentation_hooks',
+                default=[],
+                help='Classes or modules told about every rpc call, cast '
+                     'and processed message, for example '
+                     'nova.rpc.stats.RpcStats'),
+    cfg.IntOpt('rpc_stats_log_interval',
+               default=60,
+               help='Seconds between the log lines in which RpcStats '
+                    'reports rpc activity, 0 to disable them'),
+    cfg.StrOpt('rpc_stats_socket',
+               default=None,
+               help='Path of a unix socket on which RpcStats serves its '
+                    'statistics as JSON. %(pid)s is replaced with the '
+                    'process id'),
+    ]
+
+FLAGS = flags.FLAGS
+FLAGS.register_opts(rpc_stats_opts)
+
+hooks = None
+
+
+def _get_hooks():
+    """Instantiates and returns hooks based on the flag values."""
+    global hooks
+    if hooks is None:
+        hooks = [utils.import_object(hook)
+                 for hook in FLAGS.rpc_instrumentation_hooks]
+    return hooks
+
+
+def _reset_hooks():
+    """Used by unit tests to stop and reset the hooks."""
+    global hooks
+    for hook in hooks or []:
+        stop = getattr(hook, 'stop', None)
+        if stop is not None:
+            stop()
+    hooks = None
+
+
+def _notify(event, *args):
+    for hook in _get_hooks():
+        method = getattr(hook, event, None)
+        if method is None:
+            continue
+        try:
+            method(*args)
+        except Exception:
+            LOG.exception(_('RPC instrumentation hook %(hook)s failed '
+                            'in %(event)s') % locals())
+
+
+def payload_size(value):
+    """Returns the size of value serialized as JSON, or 0 when no hooks are
+    configured, so that callers only pay for it when someone is listening.
+    """
+    if not _get_hooks():
+        return 0
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+def call_finished(topic, msg, elapsed, failed):
+    """Reports a call that returned or failed after elapsed seconds."""
+    if _get_hooks():
+        _notify('call_finished', topic, msg.get('method'), elapsed,
+                payload_size(msg), failed)
+
+
+def cast_sent(topic, msg):
+    """Reports a cast, or a fanout cast, of msg to topic."""
+    if _get_hooks():
+        _notify('cast_sent', topic, msg.get('method'), payload_size(msg))
+
+
+def message_received(topic, method, pool):
+    """Reports a message about to be handed to a thread of pool."""
+    if _get_hooks():
+        _notify('message_received', topic, method, pool.running(),
+                pool.size)
+
+
+def message_processed(topic, method, queue_wait, elapsed, reply_size,
+                      failed):
+    """Reports a message that waited queue_wait seconds for a thread and
+    took elapsed seconds to process.
+    """
+    if _get_hooks():
+        _notify('message_processed', topic, method, queue_wait, elapsed,
+                reply_size, failed)
+
+
+class RpcHook(object):
+    """The methods a hook may implement.  Times are in seconds and sizes in
+    bytes of JSON.
+    """
+
+    def call_finished(self, topic, method, elapsed, request_size, failed):
+        """A call returned, or failed, elapsed seconds after being made."""
+        pass
+
+    def cast_sent(self, topic, method, request_size):
+        """A cast was sent."""
+        pass
+
+    def message_received(self, topic, method, pool_running, pool_size):
+        """A message arrived while pool_running of the pool_size threads
+        that process messages for topic were busy.
+        """
+        pass
+
+    def message_processed(self, topic, method, queue_wait, elapsed,
+                          reply_size, failed):
+        """A message was processed."""
+        pass
+
+
+class Histogram(object):
+    """Counts values in buckets whose upper bounds double from first."""
+
+    def __init__(self, first, buckets=24):
+        self.bounds = [first * 2 ** i for i in xrange(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the given
+        percentile, or the largest value if that is smaller.
+        """
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count,
+                'mean': self.count and self.total / self.count,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+class MethodStats(object):
+    """What RpcStats knows about one method of one topic."""
+
+    def __init__(self):
+        self.calls = 0
+        self.call_errors = 0
+        self.casts = 0
+        self.processed = 0
+        self.errors = 0
+        self.round_trip = Histogram(0.001)
+        self.queue_wait = Histogram(0.001)
+        self.execution = Histogram(0.001)
+        self.request_size = Histogram(64)
+        self.reply_size = Histogram(64)
+
+    def to_dict(self):
+        return {'calls': self.calls,
+                'call_errors': self.call_errors,
+                'casts': self.casts,
+                'processed': self.processed,
+                'errors': self.errors,
+                'round_trip': self.round_trip.to_dict(),
+                'queue_wait': self.queue_wait.to_dict(),
+                'execution': self.execution.to_dict(),
+                'request_size': self.request_size.to_dict(),
+                'reply_size': self.reply_size.to_dict()}
+
+
+class PoolStats(object):
+    """How busy the threads processing the messages of a topic are."""
+
+    def __init__(self):
+        self.size = 0
+        self.received = 0
+        self.saturated = 0
+        self.max_running = 0
+
+    def to_dict(self):
+        return {'size': self.size,
+                'received': self.received,
+                'saturated': self.saturated,
+                'max_running': self.max_running}
+
+
+class RpcStats(RpcHook):
+    """Keeps counters and histograms of the rpc activity of this process,
+    which it logs every rpc_stats_log_interval seconds and serves on
+    rpc_stats_socket.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.methods = {}
+        self.pools = {}
+        self._logged = {}
+        self._log_timer = None
+        self._server_thread = None
+        self._path = None
+        if FLAGS.rpc_stats_log_interval:
+            self._log_timer = utils.LoopingCall(self.log_stats)
+            self._log_timer.start(FLAGS.rpc_stats_log_interval, now=False)
+        if FLAGS.rpc_stats_socket:
+            self._path = FLAGS.rpc_stats_socket % {'pid': os.getpid()}
+            self._server_thread = eventlet.spawn(self.serve, self._path)
+
+    def stop(self):
+        """Stops logging and serving the statistics."""
+        if self._log_timer is not None:
+            self._log_timer.stop()
+            self._log_timer = None
+        if self._server_thread is not None:
+            self._server_thread.kill()
+            self._server_thread = None
+        if self._path is not None:
+            if os.path.exists(self._path):
+                os.unlink(self._path)
+            self._path = None
+
+    def _method(self, topic, method):
+        key = (topic, method)
+        if key not in self.methods:
+            self.methods[key] = MethodStats()
+        return self.methods[key]
+
+    def call_finished(self, topic, method, elapsed, request_size, failed):
+        stats = self._method(topic, method)
+        stats.calls += 1
+        if failed:
+            stats.call_errors += 1
+        stats.round_trip.add(elapsed)
+        stats.request_size.add(request_size)
+
+    def cast_sent(self, topic, method, request_size):
+        stats = self._method(topic, method)
+        stats.casts += 1
+        stats.request_size.add(request_size)
+
+    def message_received(self, topic, method, pool_running, pool_size):
+        if topic not in self.pools:
+            self.pools[topic] = PoolStats()
+        pool = self.pools[topic]
+        pool.size = pool_size
+        pool.received += 1
+        if pool_running >= pool_size:
+            pool.saturated += 1
+        pool.max_running = max(pool.max_running, pool_running)
+
+    def message_processed(self, topic, method, queue_wait, elapsed,
+                          reply_size, failed):
+        stats = self._method(topic, method)
+        stats.processed += 1
+        if failed:
+            stats.errors += 1
+        stats.queue_wait.add(queue_wait)
+        stats.execution.add(elapsed)
+        stats.reply_size.add(reply_size)
+
+    def to_dict(self):
+        methods = {}
+        for (topic, method), stats in self.methods.iteritems():
+            methods.setdefault(topic, {})[method] = stats.to_dict()
+        pools = dict((topic, pool.to_dict())
+                     for topic, pool in self.pools.iteritems())
+        return {'uptime': time.time() - self.started,
+                'methods': methods,
+                'pools': pools}
+
+    def log_stats(self):
+        """Logs a line for each method that was used since the last call,
+        with totals since the process started.
+        """
+        for (topic, method), stats in sorted(self.methods.iteritems()):
+            count = stats.calls + stats.casts + stats.processed
+            if self._logged.get((topic, method)) == count:
+                continue
+            self._logged[(topic, method)] = count
+            LOG.info(_('rpc %(topic)s %(method)s: %(calls)d calls '
+                       '(%(call_errors)d failed) round trip p50 %(rt50).1fms '
+                       'p99 %(rt99).1fms, %(casts)d casts, %(processed)d '
+                       'processed (%(errors)d failed) queue wait p99 '
+                       '%(qw99).1fms execution p50 %(ex50).1fms p99 '
+                       '%(ex99).1fms, mean request %(request)d bytes reply '
+                       '%(reply)d bytes') %
+                     {'topic': topic,
+                      'method': method,
+                      'calls': stats.calls,
+                      'call_errors': stats.call_errors,
+                      'rt50': stats.round_trip.percentile(50) * 1000,
+                      'rt99': stats.round_trip.percentile(99) * 1000,
+                      'casts': stats.casts,
+                      'processed': stats.processed,
+                      'errors': stats.errors,
+                      'qw99': stats.queue_wait.percentile(99) * 1000,
+                      'ex50': stats.execution.percentile(50) * 1000,
+                      'ex99': stats.execution.percentile(99) * 1000,
+                      'request': stats.request_size.to_dict()['mean'],
+                      'reply': stats.reply_size.to_dict()['mean']})
+        for topic, pool in sorted(self.pools.iteritems()):
+            if pool.saturated and self._logged.get(topic) != pool.saturated:
+                self._logged[topic] = pool.saturated
+                LOG.info(_('rpc %(topic)s: all %(size)d threads were busy '
+                           'for %(saturated)d of %(received)d messages') %
+                         dict(topic=topic, **pool.to_dict()))
+
+    def serve(self, path):
+        """Writes the statistics as JSON to each client connecting to the
+        unix socket at path.
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        server = eventlet.listen(path, family=socket.AF_UNIX)
+        try:
+            while True:
+                client, _address = server.accept()
+                try:
+                    client.sendall(json.dumps(self.to_dict(), indent=1,
+                                              sort_keys=True))
+                except Exception:
+                    LOG.exception(_('Failed to send rpc statistics'))
+                finally:
+                    client.close()
+        finally:
+            server.close()
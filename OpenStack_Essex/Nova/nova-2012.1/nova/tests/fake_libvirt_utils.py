@@ -41,6 +41,10 @@ def get_disk_backing_file(path):
     return disk_backing_files.get(path, None)
 
 
+def get_disk_size_and_backing_file(path):
+    return get_disk_size(path), disk_backing_files.get(path, "")
+
+
 def copy_image(src, dest):
     pass
 
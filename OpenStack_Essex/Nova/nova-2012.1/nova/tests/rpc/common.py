@@ -213,6 +213,41 @@ class BaseRpcAMQPTestCase(BaseRpcTestCase):
                  "args": {"value": value}})
         self.assertEqual(value, result)
 
+    def test_calls_share_reply_queue(self):
+        """Make sure replies to every call arrive on the same queue."""
+        self.flags(amqp_rpc_single_reply_queue=True)
+        reply_qs = []
+        for value in (41, 42):
+            result = self.rpc.call(self.context, 'test',
+                    {"method": "echo",
+                     "args": {"value": value}})
+            self.assertEqual(value, result)
+            reply_proxy = self.rpc.Connection.pool.reply_proxy
+            reply_qs.append(reply_proxy.reply_q)
+            self.assertEqual({}, reply_proxy._call_waiters)
+        self.assertEqual(reply_qs[0], reply_qs[1])
+
+    def test_call_timeout_removes_reply_waiter(self):
+        """Make sure a timed out call stops waiting for its reply."""
+        self.flags(amqp_rpc_single_reply_queue=True)
+        self.assertRaises(rpc_common.Timeout,
+                          self.rpc.call,
+                          self.context,
+                          'test',
+                          {"method": "block",
+                           "args": {"value": 42}}, timeout=1)
+        reply_proxy = self.rpc.Connection.pool.reply_proxy
+        self.assertEqual({}, reply_proxy._call_waiters)
+
+    def test_call_without_reply_queue(self):
+        """Make sure calls still work with a reply queue per call."""
+        self.flags(amqp_rpc_single_reply_queue=False)
+        value = 42
+        result = self.rpc.call(self.context, 'test',
+                {"method": "echo",
+                 "args": {"value": value}})
+        self.assertEqual(value, result)
+
 
 class TestReceiver(object):
     """Simple Proxy class so the consumer has methods to call.
@@ -240,6 +240,8 @@ class RpcQpidTestCase(test.TestCase):
         self._test_cast(fanout=True, server_params=server_params)
 
     def _test_call(self, multi):
+        # The expectations below are for a reply queue declared per call.
+        self.flags(amqp_rpc_single_reply_queue=False)
         self.mock_connection = self.mox.CreateMock(self.orig_connection)
         self.mock_session = self.mox.CreateMock(self.orig_session)
         self.mock_sender = self.mox.CreateMock(self.orig_sender)
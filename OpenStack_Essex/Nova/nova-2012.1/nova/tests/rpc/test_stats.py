@@ -0,0 +1,119 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Unit Tests for rpc instrumentation hooks
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from eventlet import greenthread
+from eventlet.green import socket
+
+from nova import context
+from nova.rpc import common as rpc_common
+from nova.rpc import impl_fake
+from nova.rpc import stats as rpc_stats
+from nova import test
+from nova.tests.rpc import common
+
+
+class FailingHook(object):
+    def call_finished(self, *args):
+        raise test.TestingException('moo')
+
+
+class RpcStatsTestCase(test.TestCase):
+    def setUp(self):
+        super(RpcStatsTestCase, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.flags(rpc_instrumentation_hooks=['nova.rpc.stats.RpcStats'],
+                   rpc_stats_log_interval=0,
+                   rpc_stats_socket=os.path.join(self.tempdir, 'stats.sock'))
+        rpc_stats._reset_hooks()
+        self.conn = impl_fake.create_connection(True)
+        self.conn.create_consumer('test', common.TestReceiver(), False)
+        self.context = context.get_admin_context()
+
+    def tearDown(self):
+        self.conn.close()
+        rpc_stats._reset_hooks()
+        shutil.rmtree(self.tempdir)
+        super(RpcStatsTestCase, self).tearDown()
+
+    def test_histogram(self):
+        histogram = rpc_stats.Histogram(1)
+        for value in (0.5, 1, 3, 3, 3, 100):
+            histogram.add(value)
+        self.assertEqual(6, histogram.count)
+        self.assertEqual(100, histogram.max)
+        self.assertEqual(4, histogram.percentile(50))
+        self.assertEqual(100, histogram.percentile(99))
+
+    def test_call_recorded(self):
+        impl_fake.call(self.context, 'test',
+                       {"method": "echo", "args": {"value": 42}})
+        self.assertRaises(rpc_common.RemoteError, impl_fake.call,
+                          self.context, 'test',
+                          {"method": "fail", "args": {"value": 42}})
+        stats = rpc_stats._get_hooks()[0].to_dict()
+        echo = stats['methods']['test']['echo']
+        self.assertEqual(1, echo['calls'])
+        self.assertEqual(0, echo['call_errors'])
+        self.assertEqual(1, echo['processed'])
+        self.assertEqual(1, echo['round_trip']['count'])
+        self.assertEqual(len('[42]'), echo['reply_size']['max'])
+        fail = stats['methods']['test']['fail']
+        self.assertEqual(1, fail['call_errors'])
+        self.assertEqual(1, fail['errors'])
+
+    def test_failing_hook(self):
+        self.flags(rpc_instrumentation_hooks=[
+                'nova.tests.rpc.test_stats.FailingHook'])
+        rpc_stats._reset_hooks()
+        result = impl_fake.call(self.context, 'test',
+                                {"method": "echo", "args": {"value": 42}})
+        self.assertEqual(42, result)
+
+    def test_stats_socket(self):
+        impl_fake.call(self.context, 'test',
+                       {"method": "echo", "args": {"value": 42}})
+        # Let the hook start serving.
+        greenthread.sleep(0)
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(os.path.join(self.tempdir, 'stats.sock'))
+        data = ''
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        stats = json.loads(data)
+        self.assertEqual(1, stats['methods']['test']['echo']['calls'])
+
+    def test_stop(self):
+        hook = rpc_stats._get_hooks()[0]
+        # Let the hook start serving.
+        greenthread.sleep(0)
+        path = os.path.join(self.tempdir, 'stats.sock')
+        self.assertTrue(os.path.exists(path))
+        rpc_stats._reset_hooks()
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(None, hook._server_thread)
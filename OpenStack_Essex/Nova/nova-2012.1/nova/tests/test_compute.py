@@ -1430,6 +1430,56 @@ class ComputeTestCase(BaseTestCase):
         self.assertEqual(len(instances), 1)
         self.assertEqual(power_state.NOSTATE, instances[0]['power_state'])
 
+    def test_sync_power_states_from_instance_list(self):
+        """Make sure listed VMs are not looked up one by one"""
+        self.stubs.Set(compute_manager.ComputeManager,
+                '_report_driver_status', nop_report_driver_status)
+
+        instance = self._create_fake_instance()
+        self.compute.run_instance(self.context, instance['uuid'])
+        ctxt = context.get_admin_context()
+        instance_name = db.instance_get_all(ctxt)[0].name
+        self.compute.driver.instances[instance_name].state = \
+                power_state.SHUTDOWN
+
+        def fake_get_info(instance):
+            self.fail('get_info called for a listed instance')
+
+        def fake_instance_update(context, instance_id, values):
+            self.fail('instance updated on its own')
+
+        self.stubs.Set(self.compute.driver, 'get_info', fake_get_info)
+        self.stubs.Set(db, 'instance_update', fake_instance_update)
+        self.compute._sync_power_states(ctxt)
+
+        instances = db.instance_get_all(ctxt)
+        self.assertEqual(power_state.SHUTDOWN, instances[0]['power_state'])
+        self.assertEqual(vm_states.SHUTOFF, instances[0]['vm_state'])
+
+    def test_sync_power_states_migrated_away(self):
+        """Make sure a VM that left this host keeps its power state"""
+        self.stubs.Set(compute_manager.ComputeManager,
+                '_report_driver_status', nop_report_driver_status)
+
+        instance = self._create_fake_instance()
+        self.compute.run_instance(self.context, instance['uuid'])
+        ctxt = context.get_admin_context()
+        instance_name = db.instance_get_all(ctxt)[0].name
+        self.compute.driver.test_remove_vm(instance_name)
+
+        real_instance_get_by_uuid = db.instance_get_by_uuid
+
+        def fake_instance_get_by_uuid(context, instance_uuid):
+            # The live migration finishes while the power states are synced
+            db.instance_update(context, instance_uuid, {'host': 'dest'})
+            return real_instance_get_by_uuid(context, instance_uuid)
+
+        self.stubs.Set(db, 'instance_get_by_uuid', fake_instance_get_by_uuid)
+        self.compute._sync_power_states(ctxt)
+
+        instances = db.instance_get_all(ctxt)
+        self.assertEqual(power_state.RUNNING, instances[0]['power_state'])
+
     def test_add_instance_fault(self):
         exc_info = None
         instance_uuid = str(utils.gen_uuid())
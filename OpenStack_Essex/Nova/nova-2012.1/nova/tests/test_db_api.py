@@ -199,6 +199,27 @@ class DbApiTestCase(test.TestCase):
         instance_meta = db.instance_metadata_get(ctxt, instance.id)
         self.assertEqual('bar', instance_meta['host'])
 
+    def test_instance_bulk_update(self):
+        """ test instance_bulk_update() sets values per instance """
+        ctxt = context.get_admin_context()
+        inst1 = db.instance_create(ctxt, {'host': 'host1', 'power_state': 1})
+        inst2 = db.instance_create(ctxt, {'host': 'host1', 'power_state': 1})
+        inst3 = db.instance_create(ctxt, {'host': 'host2', 'power_state': 1})
+
+        db.instance_bulk_update(ctxt, {
+                inst1['id']: {'power_state': 0},
+                inst2['id']: {'power_state': 4, 'vm_state': 'stopped'},
+                inst3['id']: {'power_state': 0}}, host='host1')
+
+        inst1 = db.instance_get(ctxt, inst1['id'])
+        inst2 = db.instance_get(ctxt, inst2['id'])
+        inst3 = db.instance_get(ctxt, inst3['id'])
+        self.assertEqual(0, inst1['power_state'])
+        self.assertEqual(4, inst2['power_state'])
+        self.assertEqual('stopped', inst2['vm_state'])
+        # Not on host1, so left alone
+        self.assertEqual(1, inst3['power_state'])
+
     def test_instance_fault_create(self):
         """Ensure we can create an instance fault"""
         ctxt = context.get_admin_context()
@@ -115,6 +115,10 @@ class FakeVirtDomain(object):
         return self._fake_dom_xml
 
 
+def _fake_stat(size, mtime=0):
+    return os.stat_result((0, 0, 0, 0, 0, 0, size, 0, mtime, 0))
+
+
 class LibvirtVolumeTestCase(test.TestCase):
 
     def setUp(self):
@@ -567,6 +571,39 @@ class LibvirtConnTestCase(test.TestCase):
         # Only one should be listed, since domain with ID 0 must be skiped
         self.assertEquals(len(instances), 1)
 
+    @test.skip_if(missing_libvirt(), "Test requires libvirt")
+    def test_list_instances_detail_skips_vanished_domains(self):
+        class VanishedDomain(FakeVirtDomain):
+            def info(self):
+                raise libvirt.libvirtError('Domain not found')
+
+        domains = {1: FakeVirtDomain(), 2: VanishedDomain()}
+
+        self.create_fake_libvirt_mock(listDomainsID=lambda: [0, 1, 2],
+                                      lookupByID=domains.get)
+        self.mox.ReplayAll()
+        conn = connection.LibvirtConnection(False)
+        infos = conn.list_instances_detail()
+        # Domain 0 is the hypervisor and domain 2 went away while listing
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0].name, domains[1].name())
+        self.assertEqual(infos[0].state, power_state.RUNNING)
+
+    @test.skip_if(missing_libvirt(), "Test requires libvirt")
+    def test_list_running_domains_skips_vanished_domains(self):
+        class VanishedDomain(FakeVirtDomain):
+            def ID(self):
+                raise libvirt.libvirtError('Domain not found')
+
+        running = FakeVirtDomain()
+        running.ID = lambda: 1
+
+        self.create_fake_libvirt_mock(
+                listAllDomains=lambda flags: [running, VanishedDomain()])
+        self.mox.ReplayAll()
+        conn = connection.LibvirtConnection(False)
+        self.assertEqual(conn._list_running_domains(), [(1, running)])
+
     def test_get_all_block_devices(self):
         xml = [
             # NOTE(vish): id 0 is skipped
@@ -1233,13 +1270,6 @@ class LibvirtConnTestCase(test.TestCase):
                     "<target dev='vdb' bus='virtio'/></disk>"
                     "</devices></domain>")
 
-        ret = ("image: /test/disk\n"
-               "file format: raw\n"
-               "virtual size: 20G (21474836480 bytes)\n"
-               "disk size: 3.1G\n"
-               "cluster_size: 2097152\n"
-               "backing file: /test/dummy (actual path: /backing/file)\n")
-
         # Preparing mocks
         vdmock = self.mox.CreateMock(libvirt.virDomain)
         self.mox.StubOutWithMock(vdmock, "XMLDesc")
@@ -1255,14 +1285,9 @@ class LibvirtConnTestCase(test.TestCase):
         fake_libvirt_utils.disk_sizes['/test/disk.local'] = 20 * GB
         fake_libvirt_utils.disk_backing_files['/test/disk.local'] = 'file'
 
-        self.mox.StubOutWithMock(os.path, "getsize")
-        os.path.getsize('/test/disk').AndReturn((10737418240))
-
-        self.mox.StubOutWithMock(utils, "execute")
-        utils.execute('qemu-img', 'info',
-                      '/test/disk.local').AndReturn((ret, ''))
-
-        os.path.getsize('/test/disk.local').AndReturn((21474836480))
+        self.mox.StubOutWithMock(os, "stat")
+        os.stat('/test/disk').AndReturn(_fake_stat(10737418240))
+        os.stat('/test/disk.local').AndReturn(_fake_stat(21474836480))
 
         self.mox.ReplayAll()
         conn = connection.LibvirtConnection(False)
@@ -1416,6 +1441,24 @@ class LibvirtConnTestCase(test.TestCase):
                     "uuid": "875a8070-d0b9-4949-8b31-104d125c9a64"}
         conn.destroy(instance, [])
 
+    def test_qcow2_info_is_cached(self):
+        calls = []
+
+        def fake_get_disk_size_and_backing_file(path):
+            calls.append(path)
+            return 21474836480, 'file'
+        self.stubs.Set(fake_libvirt_utils, 'get_disk_size_and_backing_file',
+                       fake_get_disk_size_and_backing_file)
+
+        conn = connection.LibvirtConnection(False)
+        for mtime in (1, 1, 2):
+            info = conn._get_qcow2_info('/test/disk',
+                                        _fake_stat(3 * 1024 ** 3, mtime))
+            self.assertEqual(info, (21474836480, 'file'))
+        # Only the first look and the one after the image changed run
+        # qemu-img
+        self.assertEqual(len(calls), 2)
+
     def test_available_least_handles_missing(self):
         """Ensure destroy calls managedSaveRemove for saved instance"""
         conn = connection.LibvirtConnection(False)
@@ -2053,6 +2096,38 @@ disk size: 4.4M''', ''))
         self.mox.ReplayAll()
         self.assertEquals(libvirt_utils.get_disk_size('/some/path'), 4592640)
 
+    def test_get_disk_size_and_backing_file(self):
+        self.mox.StubOutWithMock(utils, 'execute')
+        utils.execute('qemu-img',
+                      'info',
+                      '/some/path').AndReturn(('''image: /some/path
+file format: qcow2
+virtual size: 20G (21474836480 bytes)
+disk size: 3.1G
+cluster_size: 2097152
+backing file: /test/dummy (actual path: /backing/file)''', ''))
+
+        # Start test
+        self.mox.ReplayAll()
+        self.assertEquals(
+                libvirt_utils.get_disk_size_and_backing_file('/some/path'),
+                (21474836480, 'file'))
+
+    def test_get_disk_size_and_backing_file_without_backing_file(self):
+        self.mox.StubOutWithMock(utils, 'execute')
+        utils.execute('qemu-img',
+                      'info',
+                      '/some/path').AndReturn(('''image: 00000001
+file format: raw
+virtual size: 4.4M (4592640 bytes)
+disk size: 4.4M''', ''))
+
+        # Start test
+        self.mox.ReplayAll()
+        self.assertEquals(
+                libvirt_utils.get_disk_size_and_backing_file('/some/path'),
+                (4592640, ''))
+
     def test_copy_image(self):
         dst_fd, dst_path = tempfile.mkstemp()
         try:
@@ -151,6 +151,90 @@ class PolicyTestCase(test.TestCase):
         policy.enforce(admin_context, lowercase_action, self.target)
         policy.enforce(admin_context, uppercase_action, self.target)
 
+    def test_enforce_memoized(self):
+        calls = []
+
+        def fakeurlopen(url, post_data):
+            calls.append(url)
+            return StringIO.StringIO("True")
+        self.stubs.Set(urllib2, 'urlopen', fakeurlopen)
+
+        action = "example:my_file"
+        policy.enforce(self.context, action, {'project_id': 'fake'})
+        policy.enforce(self.context, action, {'project_id': 'fake',
+                                              'uuid': 'other'})
+        self.assertEqual(len(self.context.policy_cache), 1)
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, {'project_id': 'another'})
+        self.assertEqual(len(self.context.policy_cache), 2)
+
+        # http checks may depend on anything, so they are never memoized
+        policy.enforce(self.context, "example:get_http", self.target)
+        policy.enforce(self.context, "example:get_http", self.target)
+        self.assertEqual(len(calls), 2)
+
+    def test_memoized_result_follows_credentials(self):
+        action = "example:lowercase_admin"
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, self.target)
+        policy.enforce(self.context.elevated(), action, self.target)
+
+
+class BrainTestCase(test.TestCase):
+    def setUp(self):
+        super(BrainTestCase, self).setUp()
+        self.rules = {
+            "admin": [["role:admin"]],
+            "owner": [["project_id:%(project_id)s"]],
+            "admin_or_owner": [["rule:admin"], ["rule:owner"]],
+            "example:nested": [["rule:admin_or_owner", "role:member"]],
+        }
+        self.brain = common_policy.Brain(self.rules, "admin")
+        self.creds = {'project_id': 'fake', 'roles': ['Member']}
+
+    def _check(self, rule, target, creds=None, cache=None):
+        return self.brain.check(('rule:%s' % rule,), target,
+                                creds or self.creds, cache)
+
+    def test_nested_rules(self):
+        self.assertTrue(self._check("example:nested",
+                                    {'project_id': 'fake'}))
+        self.assertFalse(self._check("example:nested",
+                                     {'project_id': 'another'}))
+        self.assertTrue(self._check("example:nested",
+                                    {'project_id': 'another'},
+                                    {'project_id': 'fake',
+                                     'roles': ['admin', 'member']}))
+
+    def test_missing_rule_uses_default(self):
+        admin_creds = {'project_id': 'fake', 'roles': ['admin']}
+        self.assertFalse(self._check("example:noexist", {}))
+        self.assertTrue(self._check("example:noexist", {}, admin_creds))
+
+    def test_add_rule_recompiles(self):
+        target = {'project_id': 'another'}
+        self.assertFalse(self._check("example:nested", target))
+        self.brain.add_rule("owner", [])
+        self.assertTrue(self._check("example:nested", target))
+
+    def test_cache_keyed_by_used_values(self):
+        cache = {}
+        target = {'project_id': 'fake', 'name': 'one'}
+        self.assertTrue(self._check("example:nested", target, cache=cache))
+        target['name'] = 'two'
+        self.assertTrue(self._check("example:nested", target, cache=cache))
+        self.assertEqual(len(cache), 1)
+
+        target['project_id'] = 'another'
+        self.assertFalse(self._check("example:nested", target, cache=cache))
+        self.assertEqual(len(cache), 2)
+
+    def test_unhashable_target_not_cached(self):
+        cache = {}
+        target = {'project_id': ['fake']}
+        self.assertFalse(self._check("owner", target, cache=cache))
+        self.assertEqual(cache, {})
+
 
 class DefaultPolicyTestCase(test.TestCase):
 
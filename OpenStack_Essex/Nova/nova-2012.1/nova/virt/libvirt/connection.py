@@ -249,6 +249,11 @@ class LibvirtConnection(driver.ComputeDriver):
         self._disk_cachemode = None
         self.image_cache_manager = imagecache.ImageCacheManager()
 
+        # qemu-img info results by disk path, see _get_qcow2_info()
+        self._qcow2_info_cache = {}
+        self._qcow2_info_counts = {'hits': 0, 'misses': 0}
+        self.resource_refresh_stats = {}
+
     @property
     def disk_cachemode(self):
         if self._disk_cachemode is None:
@@ -375,9 +380,15 @@ class LibvirtConnection(driver.ComputeDriver):
 
     def list_instances_detail(self):
         infos = []
-        for domain_id in self._conn.listDomainsID():
-            domain = self._conn.lookupByID(domain_id)
-            info = self._map_to_instance_info(domain)
+        for domain_id, domain in self._list_running_domains():
+            if domain_id == 0:
+                # We skip domains with ID 0 (hypervisors).
+                continue
+            try:
+                info = self._map_to_instance_info(domain)
+            except libvirt.libvirtError:
+                # The domain stopped since it was listed
+                continue
             infos.append(info)
         return infos
 
@@ -1719,16 +1730,45 @@ class LibvirtConnection(driver.ComputeDriver):
         stats = libvirt_utils.get_fs_info(FLAGS.instances_path)
         return stats['total'] / (1024 ** 3)
 
-    def get_vcpu_used(self):
+    def _list_running_domains(self):
+        """Returns (id, domain) for each running domain, listing them in a
+        single call where libvirt supports it.
+        """
+        list_all = getattr(self._conn, 'listAllDomains', None)
+        if list_all is not None:
+            list_flags = getattr(libvirt,
+                                 'VIR_CONNECT_LIST_DOMAINS_ACTIVE', 1)
+            domains = []
+            for dom in list_all(list_flags):
+                try:
+                    domains.append((dom.ID(), dom))
+                except libvirt.libvirtError:
+                    # The domain stopped since it was listed
+                    continue
+            return domains
+
+        domains = []
+        for dom_id in self._conn.listDomainsID():
+            try:
+                domains.append((dom_id, self._conn.lookupByID(dom_id)))
+            except libvirt.libvirtError:
+                # The domain stopped since it was listed
+                continue
+        return domains
+
+    def get_vcpu_used(self, domains=None):
         """ Get vcpu usage number of physical computer.
 
+        :param domains: running domains, from _list_running_domains()
         :returns: The total number of vcpu that currently used.
 
         """
 
+        if domains is None:
+            domains = self._list_running_domains()
+
         total = 0
-        for dom_id in self._conn.listDomainsID():
-            dom = self._conn.lookupByID(dom_id)
+        for _dom_id, dom in domains:
             vcpus = dom.vcpus()
             if vcpus is None:
                 # dom.vcpus is not implemented for lxc, but returning 0 for
@@ -1899,18 +1939,41 @@ class LibvirtConnection(driver.ComputeDriver):
         except exception.NotFound:
             raise exception.ComputeServiceUnavailable(host=host)
 
+        start = time.time()
+        domains = self._list_running_domains()
+        list_time = time.time() - start
+        counts = self._qcow2_info_counts.copy()
+        disk_start = time.time()
+        disk_available_least = self.get_disk_available_least(domains)
+        disk_time = time.time() - disk_start
+
         # Updating host information
         dic = {'vcpus': self.get_vcpu_total(),
                'memory_mb': self.get_memory_mb_total(),
                'local_gb': self.get_local_gb_total(),
-               'vcpus_used': self.get_vcpu_used(),
+               'vcpus_used': self.get_vcpu_used(domains),
                'memory_mb_used': self.get_memory_mb_used(),
                'local_gb_used': self.get_local_gb_used(),
                'hypervisor_type': self.get_hypervisor_type(),
                'hypervisor_version': self.get_hypervisor_version(),
                'cpu_info': self.get_cpu_info(),
                'service_id': service_ref['id'],
-               'disk_available_least': self.get_disk_available_least()}
+               'disk_available_least': disk_available_least}
+
+        self.resource_refresh_stats = {
+            'domains': len(domains),
+            'qemu_img_runs': (self._qcow2_info_counts['misses'] -
+                              counts['misses']),
+            'qemu_img_cached': (self._qcow2_info_counts['hits'] -
+                                counts['hits']),
+            'list_domains_seconds': list_time,
+            'disk_seconds': disk_time,
+            'seconds': time.time() - start}
+        LOG.debug(_('Resources of %(domains)d domains gathered in '
+                    '%(seconds).3fs (listing %(list_domains_seconds).3fs, '
+                    'disks %(disk_seconds).3fs, %(qemu_img_runs)d qemu-img '
+                    'runs, %(qemu_img_cached)d cached)') %
+                  self.resource_refresh_stats)
 
         compute_node_ref = service_ref['compute_node']
         if not compute_node_ref:
@@ -2220,19 +2283,12 @@ class LibvirtConnection(driver.ComputeDriver):
 
             # get the real disk size or
             # raise a localized error if image is unavailable
-            dk_size = int(os.path.getsize(path))
+            stat = os.stat(path)
+            dk_size = int(stat.st_size)
 
             disk_type = driver_nodes[cnt].get('type')
             if disk_type == "qcow2":
-                out, err = utils.execute('qemu-img', 'info', path)
-
-                # virtual size:
-                size = [i.split('(')[1].split()[0] for i in out.split('\n')
-                    if i.strip().find('virtual size') >= 0]
-                virt_size = int(size[0])
-
-                # backing file:(actual path:)
-                backing_file = libvirt_utils.get_disk_backing_file(path)
+                virt_size, backing_file = self._get_qcow2_info(path, stat)
             else:
                 backing_file = ""
                 virt_size = 0
@@ -2244,7 +2300,26 @@ class LibvirtConnection(driver.ComputeDriver):
                               'disk_size': dk_size})
         return utils.dumps(disk_info)
 
-    def get_disk_available_least(self):
+    def _get_qcow2_info(self, path, stat):
+        """Returns the virtual size and backing file of a qcow2 image.
+
+        qemu-img only runs when the size or mtime in stat differ from the
+        last time the image was looked at, since unchanged images cannot
+        have been resized or rebased.
+
+        """
+        key = (stat.st_size, stat.st_mtime)
+        cached = self._qcow2_info_cache.get(path)
+        if cached is not None and cached[0] == key:
+            self._qcow2_info_counts['hits'] += 1
+            return cached[1]
+        self._qcow2_info_counts['misses'] += 1
+
+        info = libvirt_utils.get_disk_size_and_backing_file(path)
+        self._qcow2_info_cache[path] = (key, info)
+        return info
+
+    def get_disk_available_least(self, domains=None):
         """Return disk available least size.
 
         The size of available disk, when block_migration command given
@@ -2253,17 +2328,26 @@ class LibvirtConnection(driver.ComputeDriver):
         The size that deducted real nstance disk size from the total size
         of the virtual disk of all instances.
 
+        :param domains: running domains, from _list_running_domains()
+
         """
         # available size of the disk
         dk_sz_gb = self.get_local_gb_total() - self.get_local_gb_used()
 
         # Disk size that all instance uses : virtual_size - disk_size
-        instances_name = self.list_instances()
+        if domains is None:
+            instances_name = self.list_instances()
+        else:
+            # We skip domains with ID 0 (hypervisors).
+            instances_name = [dom.name() for dom_id, dom in domains
+                              if dom_id != 0]
         instances_sz = 0
+        disk_paths = set()
         for i_name in instances_name:
             try:
                 disk_infos = utils.loads(self.get_instance_disk_info(i_name))
                 for info in disk_infos:
+                    disk_paths.add(info['path'])
                     i_vt_sz = int(info['virt_disk_size'])
                     i_dk_sz = int(info['disk_size'])
                     instances_sz += i_vt_sz - i_dk_sz
@@ -2277,6 +2361,11 @@ class LibvirtConnection(driver.ComputeDriver):
                 # Instance was deleted during the check so ignore it
                 pass
 
+        # Forget the images of instances that are gone
+        for path in self._qcow2_info_cache.keys():
+            if path not in disk_paths:
+                del self._qcow2_info_cache[path]
+
         # Disk available least size
         available_least_size = dk_sz_gb * (1024 ** 3) - instances_sz
         return (available_least_size / 1024 / 1024 / 1024)
@@ -72,6 +72,22 @@ def create_cow_image(backing_file, path):
              'cluster_size=2M,backing_file=%s' % backing_file, path)
 
 
+def _parse_disk_size(out):
+    """Get the virtual size from the output of qemu-img info"""
+    size = [i.split('(')[1].split()[0] for i in out.split('\n')
+        if i.strip().find('virtual size') >= 0]
+    return int(size[0])
+
+
+def _parse_backing_file(out):
+    """Get the backing file from the output of qemu-img info"""
+    backing_file = [i.split('actual path:')[1].strip()[:-1]
+        for i in out.split('\n') if 0 <= i.find('backing file')]
+    if backing_file:
+        backing_file = os.path.basename(backing_file[0])
+    return backing_file
+
+
 def get_disk_size(path):
     """Get the (virtual) size of a disk image
 
@@ -80,9 +96,7 @@ def get_disk_size(path):
               by a virtual machine.
     """
     out, err = execute('qemu-img', 'info', path)
-    size = [i.split('(')[1].split()[0] for i in out.split('\n')
-        if i.strip().find('virtual size') >= 0]
-    return int(size[0])
+    return _parse_disk_size(out)
 
 
 def get_disk_backing_file(path):
@@ -92,11 +106,20 @@ def get_disk_backing_file(path):
     :returns: a path to the image's backing store
     """
     out, err = execute('qemu-img', 'info', path)
-    backing_file = [i.split('actual path:')[1].strip()[:-1]
-        for i in out.split('\n') if 0 <= i.find('backing file')]
-    if backing_file:
-        backing_file = os.path.basename(backing_file[0])
-    return backing_file
+    return _parse_backing_file(out)
+
+
+def get_disk_size_and_backing_file(path):
+    """Get the (virtual) size and the backing file of a disk image
+
+    Runs qemu-img only once for both.
+
+    :param path: Path to the disk image
+    :returns: a (size, backing_file) tuple, where backing_file is an empty
+              string if the image has no backing store
+    """
+    out, err = execute('qemu-img', 'info', path)
+    return _parse_disk_size(out), _parse_backing_file(out) or ""
 
 
 def copy_image(src, dest):
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""rpc_call_bench.py - Measures the latency of nova.rpc calls
+
+Runs rpc.call against an echo consumer through nova.rpc.amqp, with and
+without the amqp_rpc_single_reply_queue flag.  The broker is faked in
+process, so the figures show the cost of the code in nova.rpc.amqp plus
+the queue declarations it makes, which --declare-latency charges for as a
+real broker would.
+
+"""
+
+import gettext
+import optparse
+import os
+import sys
+import time
+
+import eventlet
+eventlet.monkey_patch()
+
+# If ../nova/__init__.py exists, add ../ to Python search path, so that
+# it will override what happens to be installed in /usr/(local/)lib/python...
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+gettext.install('nova', unicode=1)
+
+from eventlet import queue
+
+from nova import context
+from nova import flags
+from nova.rpc import amqp as rpc_amqp
+from nova.rpc import common as rpc_common
+
+
+FLAGS = flags.FLAGS
+
+
+class FakeBroker(object):
+    """Queues shared by every FakeConnection, keyed by name."""
+
+    def __init__(self, declare_latency):
+        self.declare_latency = declare_latency
+        self.declares = 0
+        self.queues = {}
+
+    def declare(self, name):
+        self.declares += 1
+        time.sleep(self.declare_latency)
+        return self.queues.setdefault(name, queue.LightQueue())
+
+    def send(self, name, msg):
+        self.queues.setdefault(name, queue.LightQueue()).put(msg)
+
+
+class FakeConnection(object):
+    """The parts of an impl_kombu Connection that nova.rpc.amqp uses."""
+
+    broker = None
+    pool = None
+
+    def __init__(self, server_params=None):
+        self.consumers = []
+        self.threads = []
+
+    def declare_direct_consumer(self, topic, callback):
+        self.consumers.append((self.broker.declare(topic), callback))
+
+    def create_consumer(self, topic, proxy, fanout=False):
+        callback = rpc_amqp.ProxyCallback(proxy, self.pool)
+        self.consumers.append((self.broker.declare(topic), callback))
+
+    def _consume(self, consumer_queue, callback):
+        while True:
+            callback(consumer_queue.get())
+
+    def iterconsume(self, timeout=None):
+        consumer_queue, callback = self.consumers[0]
+        while True:
+            try:
+                callback(consumer_queue.get(timeout=timeout))
+            except queue.Empty:
+                raise rpc_common.Timeout()
+            yield
+
+    def consume_in_thread(self):
+        for consumer_queue, callback in self.consumers:
+            self.threads.append(eventlet.spawn(self._consume,
+                                               consumer_queue, callback))
+
+    def topic_send(self, topic, msg):
+        self.broker.send(topic, msg)
+
+    def direct_send(self, msg_id, msg):
+        self.broker.send(msg_id, msg)
+
+    def reset(self):
+        self.consumers = []
+
+    def close(self):
+        for thread in self.threads:
+            thread.kill()
+        self.threads = []
+
+
+class Receiver(object):
+    @staticmethod
+    def echo(context, value):
+        return value
+
+
+def parse_options():
+    """process command line options."""
+
+    parser = optparse.OptionParser('usage: %prog [options]')
+    parser.add_option('--calls', type='int', default=2000,
+                      help='calls made for each setting of the flag')
+    parser.add_option('--concurrency', type='int', default=10,
+                      help='calls in flight at once')
+    parser.add_option('--declare-latency', type='float', default=0.001,
+                      help='seconds the broker takes to declare a queue')
+
+    options, args = parser.parse_args()
+
+    return options, args
+
+
+def run(options, single_reply_queue):
+    """Returns the seconds taken and the queues declared by the calls."""
+    FLAGS.amqp_rpc_single_reply_queue = single_reply_queue
+    FakeConnection.broker = FakeBroker(options.declare_latency)
+    FakeConnection.pool = rpc_amqp.Pool(connection_cls=FakeConnection)
+
+    server = rpc_amqp.create_connection(True, FakeConnection.pool)
+    server.create_consumer('bench', Receiver())
+    server.consume_in_thread()
+    declares = FakeConnection.broker.declares
+
+    ctxt = context.get_admin_context()
+
+    def call(value):
+        result = rpc_amqp.call(ctxt, 'bench',
+                               {'method': 'echo', 'args': {'value': value}},
+                               None, FakeConnection.pool)
+        assert result == value
+
+    pool = eventlet.GreenPool(options.concurrency)
+    start = time.time()
+    for value in xrange(options.calls):
+        pool.spawn_n(call, value)
+    pool.waitall()
+    elapsed = time.time() - start
+
+    server.close()
+    rpc_amqp.cleanup(FakeConnection.pool)
+    return elapsed, FakeConnection.broker.declares - declares
+
+
+def main():
+    """Main loop."""
+    options, args = parse_options()
+    FLAGS(sys.argv[:1])
+
+    print '%-20s %10s %12s %10s' % ('reply queue', 'seconds', 'ms per call',
+                                    'declares')
+    for single_reply_queue in (False, True):
+        elapsed, declares = run(options, single_reply_queue)
+        print '%-20s %10.3f %12.3f %10d' % (
+            single_reply_queue and 'one per process' or 'one per call',
+            elapsed, elapsed * 1000 / options.calls, declares)
+
+if __name__ == '__main__':
+    main()
@@ -60,9 +60,8 @@ class Controller(common.QuantumController):
         ports_data = None
         if port_details:
             port_list = self._plugin.get_all_ports(tenant_id, network_id)
-            ports_data = [self._plugin.get_port_details(
-                                   tenant_id, network_id, port['port-id'])
-                      for port in port_list]
+            ports_data = filters.load_ports_details(self._plugin, tenant_id,
+                                                    network_id, port_list)
         builder = networks_view.get_view_builder(request, self.version)
         result = builder.build(network, net_details,
                                ports_data, port_details)['network']
@@ -80,8 +79,11 @@ class Controller(common.QuantumController):
         """
         filter_opts = {}
         filter_opts.update(request.GET)
+        plugin_opts, filter_opts = filters.split_filter_opts(
+            filter_opts,
+            getattr(self._plugin, 'supported_network_filters', None))
         networks = self._plugin.get_all_networks(tenant_id,
-                                                 filter_opts=filter_opts)
+                                                 filter_opts=plugin_opts)
         # Inefficient, API-layer filtering
         # will be performed only for the filters not implemented by the plugin
         # NOTE(salvatore-orlando): the plugin is supposed to leave only filters
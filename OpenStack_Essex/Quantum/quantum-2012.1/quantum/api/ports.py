@@ -59,21 +59,18 @@ class Controller(common.QuantumController):
         """
         filter_opts = {}
         filter_opts.update(request.GET)
+        plugin_opts, filter_opts = filters.split_filter_opts(
+            filter_opts, getattr(self._plugin, 'supported_port_filters', None))
         port_list = self._plugin.get_all_ports(tenant_id,
                                                network_id,
-                                               filter_opts=filter_opts)
+                                               filter_opts=plugin_opts)
 
         builder = ports_view.get_view_builder(request, self.version)
 
         # Load extra data for ports if required.
-        # This can be inefficient.
-        # TODO(salvatore-orlando): the fix for bug #834012 should deal with it
         if port_details:
-            port_list_detail = \
-                [self._plugin.get_port_details(
-                            tenant_id, network_id, port['port-id'])
-                  for port in port_list]
-            port_list = port_list_detail
+            port_list = filters.load_ports_details(self._plugin, tenant_id,
+                                                   network_id, port_list)
 
         # Perform manual filtering if not supported by plugin
         # Inefficient, API-layer filtering
@@ -22,6 +22,36 @@ import logging
 LOG = logging.getLogger('quantum.api.views.filters')
 
 
+def split_filter_opts(filter_opts, supported_filters):
+    """Splits filter_opts into the options to pass to a plugin that supports
+    the filters named in supported_filters, and the options the API layer
+    must apply itself.
+
+    A plugin that does not declare the filters it supports gets all the
+    options, and removes from filter_opts those it applied.
+    """
+    if supported_filters is None:
+        return filter_opts, filter_opts
+    plugin_opts = {}
+    api_opts = {}
+    for name, value in filter_opts.iteritems():
+        if name in supported_filters:
+            plugin_opts[name] = value
+        else:
+            api_opts[name] = value
+    return plugin_opts, api_opts
+
+
+def load_ports_details(plugin, tenant_id, network_id, ports):
+    """Returns the details of ports, as returned by get_port_details(), in a
+    single call to plugins that support it."""
+    port_ids = [port['port-id'] for port in ports]
+    if hasattr(plugin, 'get_ports_details'):
+        return plugin.get_ports_details(tenant_id, network_id, port_ids)
+    return [plugin.get_port_details(tenant_id, network_id, port_id)
+            for port_id in port_ids]
+
+
 def _load_network_ports_details(network, **kwargs):
     plugin = kwargs.get('plugin', None)
     tenant_id = kwargs.get('tenant_id', None)
@@ -29,11 +59,9 @@ def _load_network_ports_details(network, **kwargs):
     if not 'net-ports' in network:
         # Don't pass filter options, don't care about unused filters
         port_list = plugin.get_all_ports(tenant_id, network['net-id'])
-        ports_data = [plugin.get_port_details(
-                                   tenant_id, network['net-id'],
-                                   port['port-id'])
-                      for port in port_list]
-        network['net-ports'] = ports_data
+        network['net-ports'] = load_ports_details(plugin, tenant_id,
+                                                  network['net-id'],
+                                                  port_list)
 
 
 def _filter_network_by_name(network, name, **kwargs):
@@ -99,6 +127,9 @@ def _filter_port_has_interface(port, has_interface, **kwargs):
 
 def _do_filtering(items, filters, filter_opts, plugin,
                   tenant_id, network_id=None):
+    if not any(flt in filter_opts for flt in filters):
+        # only filters the plugin applied or this layer does not know
+        return items
     filtered_items = []
     for item in items:
         is_filter_match = False
@@ -148,9 +179,8 @@ def filter_ports(ports, plugin, tenant_id, network_id, filter_opts):
         'has-attachment': _filter_port_has_interface,
         'attachment': _filter_port_by_interface}
     # port details are need for filtering
-    ports = [plugin.get_port_details(tenant_id, network_id,
-                                     port['port-id'])
-              for port in ports]
+    if not all('port-state' in port for port in ports):
+        ports = load_ports_details(plugin, tenant_id, network_id, ports)
     # filter ports
     return _do_filtering(ports,
                          filters,
@@ -33,6 +33,11 @@ _MAKER = None
 BASE = models.BASE
 LOG = logging.getLogger('quantum.db.api')
 
+# Filters, as named in the API, that network_list() and port_list() apply
+NETWORK_FILTERS = ('name', 'op-status', 'port-op-status', 'port-state',
+                   'has-attachment', 'attachment', 'port')
+PORT_FILTERS = ('state', 'op-status', 'has-attachment', 'attachment')
+
 
 class MySQLPingListener(object):
 
@@ -125,11 +130,70 @@ def network_all_tenant_list():
     return session.query(models.Network).all()
 
 
-def network_list(tenant_id):
+def _has_attachment(has_attachment):
+    """Matches ports with an attachment if has_attachment is 'true', and
+    ports without one otherwise."""
+    if has_attachment.lower() == 'true':
+        return models.Port.interface_id != None
+    return models.Port.interface_id == None
+
+
+def _port_op_status(op_status):
+    """Matches ports whose operational status is op_status, as the plugins
+    report it: a port that is not ACTIVE is always DOWN."""
+    active = sql.and_(models.Port.state == 'ACTIVE',
+                      models.Port.op_status == op_status)
+    if op_status == OperationalStatus.DOWN:
+        return sql.or_(models.Port.state != 'ACTIVE', active)
+    return active
+
+
+def _network_filter(name, value):
+    if name == 'name':
+        return models.Network.name == value
+    elif name == 'op-status':
+        return models.Network.op_status == value
+    elif name == 'port-op-status':
+        return models.Network.ports.any(_port_op_status(value))
+    elif name == 'port-state':
+        return models.Network.ports.any(models.Port.state == value)
+    elif name == 'has-attachment':
+        attached = models.Network.ports.any(models.Port.interface_id != None)
+        if value.lower() == 'true':
+            return attached
+        return sql.not_(attached)
+    elif name == 'attachment':
+        return models.Network.ports.any(models.Port.interface_id == value)
+    elif name == 'port':
+        return models.Network.ports.any(models.Port.uuid == value)
+
+
+def _port_filter(name, value):
+    if name == 'state':
+        return models.Port.state == value
+    elif name == 'op-status':
+        return _port_op_status(value)
+    elif name == 'has-attachment':
+        return _has_attachment(value)
+    elif name == 'attachment':
+        return models.Port.interface_id == value
+
+
+def network_list(tenant_id, filters=None):
+    """
+    Lists a tenant's networks.
+
+    :param filters: mapping of API filter names (see NETWORK_FILTERS) to
+        values; filters on ports match networks with at least one such port.
+        Other filters are ignored.
+    """
     session = get_session()
-    return session.query(models.Network).\
-      filter_by(tenant_id=tenant_id).\
-      all()
+    query = session.query(models.Network).\
+      filter_by(tenant_id=tenant_id)
+    for name, value in (filters or {}).iteritems():
+        if name in NETWORK_FILTERS:
+            query = query.filter(_network_filter(name, value))
+    return query.all()
 
 
 def network_get(net_id):
@@ -200,13 +264,22 @@ def port_create(net_id, state=None, op_status=OperationalStatus.UNKNOWN):
         return port
 
 
-def port_list(net_id):
+def port_list(net_id, filters=None):
+    """
+    Lists the ports on a network.
+
+    :param filters: mapping of API filter names (see PORT_FILTERS) to
+        values. Other filters are ignored.
+    """
     # confirm network exists
     network_get(net_id)
     session = get_session()
-    return session.query(models.Port).\
-      filter_by(network_id=net_id).\
-      all()
+    query = session.query(models.Port).\
+      filter_by(network_id=net_id)
+    for name, value in (filters or {}).iteritems():
+        if name in PORT_FILTERS:
+            query = query.filter(_port_filter(name, value))
+    return query.all()
 
 
 def port_get(port_id, net_id, session=None):
@@ -223,6 +296,25 @@ def port_get(port_id, net_id, session=None):
         raise q_exc.PortNotFound(net_id=net_id, port_id=port_id)
 
 
+def ports_get(port_ids, net_id):
+    """Returns the ports with the given ids on a network, in the same order,
+    with a single query."""
+    # confirm network exists
+    network_get(net_id)
+    if not port_ids:
+        return []
+    session = get_session()
+    ports = session.query(models.Port).\
+      filter(models.Port.uuid.in_(port_ids)).\
+      filter_by(network_id=net_id).\
+      all()
+    ports_by_id = dict((port.uuid, port) for port in ports)
+    for port_id in port_ids:
+        if port_id not in ports_by_id:
+            raise q_exc.PortNotFound(net_id=net_id, port_id=port_id)
+    return [ports_by_id[port_id] for port_id in port_ids]
+
+
 def port_update(port_id, net_id, **kwargs):
     # confirm network exists
     network_get(net_id)
@@ -40,6 +40,9 @@ class LinuxBridgePlugin(QuantumPluginBase):
     on each host.
     """
 
+    supported_network_filters = db.NETWORK_FILTERS
+    supported_port_filters = db.PORT_FILTERS
+
     def __init__(self, configfile=None):
         cdb.initialize()
         LOG.debug("Linux Bridge Plugin initialization done successfully")
@@ -68,7 +71,8 @@ class LinuxBridgePlugin(QuantumPluginBase):
         the specified tenant.
         """
         LOG.debug("LinuxBridgePlugin.get_all_networks() called")
-        networks_list = db.network_list(tenant_id)
+        networks_list = db.network_list(tenant_id,
+                                        kwargs.get('filter_opts'))
         new_networks_list = []
         for network in networks_list:
             new_network_dict = cutil.make_net_dict(network[const.UUID],
@@ -76,7 +80,6 @@ class LinuxBridgePlugin(QuantumPluginBase):
                                                    [], network[const.OPSTATUS])
             new_networks_list.append(new_network_dict)
 
-        # This plugin does not perform filtering at the moment
         return new_networks_list
 
     def get_network_details(self, tenant_id, net_id):
@@ -169,13 +172,12 @@ class LinuxBridgePlugin(QuantumPluginBase):
         LOG.debug("LinuxBridgePlugin.get_all_ports() called")
         db.validate_network_ownership(tenant_id, net_id)
         network = db.network_get(net_id)
-        ports_list = db.port_list(net_id)
+        ports_list = db.port_list(net_id, kwargs.get('filter_opts'))
         ports_on_net = []
         for port in ports_list:
             new_port = cutil.make_port_dict(port)
             ports_on_net.append(new_port)
 
-        # This plugin does not perform filtering at the moment
         return ports_on_net
 
     def get_port_details(self, tenant_id, net_id, port_id):
@@ -190,6 +192,15 @@ class LinuxBridgePlugin(QuantumPluginBase):
         new_port_dict = cutil.make_port_dict(port)
         return new_port_dict
 
+    def get_ports_details(self, tenant_id, net_id, port_ids):
+        """
+        Retrieves the details of several ports on a network at once.
+        """
+        LOG.debug("LinuxBridgePlugin.get_ports_details() called")
+        db.validate_network_ownership(tenant_id, net_id)
+        return [cutil.make_port_dict(port)
+                for port in db.ports_get(port_ids, net_id)]
+
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
         """
         Creates a port on the specified Virtual Network.
@@ -27,12 +27,16 @@ from optparse import OptionParser
 from subprocess import *
 
 import ConfigParser
+import errno
 import logging as LOG
 import MySQLdb
 import os
+import select
 import shlex
 import signal
+import socket
 import sqlite3
+import struct
 import sys
 import time
 
@@ -41,6 +45,7 @@ BRIDGE_NAME_PREFIX = "brq"
 GATEWAY_INTERFACE_PREFIX = "gw-"
 TAP_INTERFACE_PREFIX = "tap"
 BRIDGE_FS = "/sys/devices/virtual/net/"
+DEVICE_FS = "/sys/class/net/"
 BRIDGE_NAME_PLACEHOLDER = "bridge_name"
 BRIDGE_INTERFACES_FS = BRIDGE_FS + BRIDGE_NAME_PLACEHOLDER + "/brif/"
 PORT_OPSTATUS_UPDATESQL = "UPDATE ports SET op_status = '%s' WHERE uuid = '%s'"
@@ -51,6 +56,97 @@ PORT_BINDINGS = "port_bindings"
 OP_STATUS_UP = "UP"
 OP_STATUS_DOWN = "DOWN"
 DB_CONNECTION = None
+# Seconds between full checks of all ports and devices
+DEFAULT_RESYNC_INTERVAL = 60
+
+# rtnetlink link notifications, see rtnetlink(7)
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_IFNAME = 3
+NLMSGHDR = struct.Struct("IHHII")
+IFINFOMSG = struct.Struct("BxHiII")
+RTATTR = struct.Struct("HH")
+
+
+def netlink_align(length):
+    return (length + 3) & ~3
+
+
+def parse_link_events(data):
+    """Returns the names of the devices in rtnetlink link messages."""
+    devices = set()
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        msg_len, msg_type = NLMSGHDR.unpack_from(data, offset)[:2]
+        if msg_len < NLMSGHDR.size:
+            break
+        if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+            attr = offset + NLMSGHDR.size + IFINFOMSG.size
+            end = min(offset + msg_len, len(data))
+            while attr + RTATTR.size <= end:
+                attr_len, attr_type = RTATTR.unpack_from(data, attr)
+                if attr_len < RTATTR.size or attr + attr_len > end:
+                    break
+                if attr_type == IFLA_IFNAME:
+                    name = data[attr + RTATTR.size:attr + attr_len]
+                    devices.add(name.rstrip("\0"))
+                    break
+                attr += netlink_align(attr_len)
+        offset += netlink_align(msg_len)
+    return devices
+
+
+class LinkMonitor:
+    """
+    Listens to the kernel's notifications of network devices being
+    added, changed (e.g. added to a bridge) or removed
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                  NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK))
+        self.sock.setblocking(0)
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds for devices to change. Returns the
+        names of the devices that changed, or None if notifications were
+        lost and all devices have to be checked
+        """
+        try:
+            if not select.select([self.sock], [], [], timeout)[0]:
+                return set()
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return set()
+            raise
+        devices = set()
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except socket.error, e:
+                if e.errno == errno.EAGAIN:
+                    return devices
+                if e.errno == errno.ENOBUFS:
+                    LOG.warning("Link notifications were lost, checking all "
+                                "devices")
+                    return None
+                raise
+            devices.update(parse_link_events(data))
+
+    def close(self):
+        self.sock.close()
+
+
+def create_link_monitor():
+    try:
+        return LinkMonitor()
+    except (AttributeError, socket.error), e:
+        LOG.warning("Unable to listen to link notifications, polling "
+                    "every device instead: %s" % e)
+        return None
 
 
 class LinuxBridge:
@@ -58,6 +154,14 @@ class LinuxBridge:
         self.br_name_prefix = br_name_prefix
         self.physical_interface = physical_interface
         self.root_helper = root_helper
+        # Devices are read once and then cached until clear_cache() is
+        # called, which the agent does whenever a device changes.
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._quantum_bridges = None
+        self._bridge_interfaces = {}
+        self._tuntap_devices = None
 
     def run_cmd(self, args):
         cmd = shlex.split(self.root_helper) + args
@@ -72,11 +176,7 @@ class LinuxBridge:
 
     def device_exists(self, device):
         """Check if ethernet device exists."""
-        retval = self.run_cmd(['ip', 'link', 'show', 'dev', device])
-        if retval:
-            return True
-        else:
-            return False
+        return os.path.exists(DEVICE_FS + device)
 
     def get_bridge_name(self, network_id):
         if not network_id:
@@ -99,48 +199,59 @@ class LinuxBridge:
         tap_device_name = TAP_INTERFACE_PREFIX + interface_id[0:11]
         return tap_device_name
 
+    def get_device_name(self, interface_id):
+        """
+        The name of the device of a VIF. The name for the gateway devices
+        is set by the linux net driver, hence we use the name as is
+        """
+        if interface_id.startswith(GATEWAY_INTERFACE_PREFIX):
+            return interface_id
+        return self.get_tap_device_name(interface_id)
+
     def get_all_quantum_bridges(self):
-        quantum_bridge_list = []
-        bridge_list = os.listdir(BRIDGE_FS)
-        for bridge in bridge_list:
-            if bridge.startswith(BRIDGE_NAME_PREFIX):
-                quantum_bridge_list.append(bridge)
-        return quantum_bridge_list
+        if self._quantum_bridges is None:
+            self._quantum_bridges = []
+            bridge_list = os.listdir(BRIDGE_FS)
+            for bridge in bridge_list:
+                if bridge.startswith(BRIDGE_NAME_PREFIX):
+                    self._quantum_bridges.append(bridge)
+        return list(self._quantum_bridges)
 
     def get_interfaces_on_bridge(self, bridge_name):
-        if self.device_exists(bridge_name):
+        if bridge_name not in self._bridge_interfaces:
+            if not self.device_exists(bridge_name):
+                return None
             bridge_interface_path = \
                     BRIDGE_INTERFACES_FS.replace(BRIDGE_NAME_PLACEHOLDER,
                                                  bridge_name)
-            return os.listdir(bridge_interface_path)
+            self._bridge_interfaces[bridge_name] = \
+                    os.listdir(bridge_interface_path)
+        return list(self._bridge_interfaces[bridge_name])
+
+    def get_tuntap_devices(self):
+        if self._tuntap_devices is None:
+            self._tuntap_devices = []
+            retval = self.run_cmd(['ip', 'tuntap'])
+            rows = retval.split('\n')
+            for row in rows:
+                split_row = row.split(':')
+                if split_row[0]:
+                    self._tuntap_devices.append(split_row[0])
+        return self._tuntap_devices
 
     def get_all_tap_devices(self):
-        tap_devices = []
-        retval = self.run_cmd(['ip', 'tuntap'])
-        rows = retval.split('\n')
-        for row in rows:
-            split_row = row.split(':')
-            if split_row[0].startswith(TAP_INTERFACE_PREFIX):
-                tap_devices.append(split_row[0])
-
-        return tap_devices
+        return [device for device in self.get_tuntap_devices()
+                if device.startswith(TAP_INTERFACE_PREFIX)]
 
     def get_all_gateway_devices(self):
-        gw_devices = []
-        retval = self.run_cmd(['ip', 'tuntap'])
-        rows = retval.split('\n')
-        for row in rows:
-            split_row = row.split(':')
-            if split_row[0].startswith(GATEWAY_INTERFACE_PREFIX):
-                gw_devices.append(split_row[0])
-
-        return gw_devices
+        return [device for device in self.get_tuntap_devices()
+                if device.startswith(GATEWAY_INTERFACE_PREFIX)]
 
     def get_bridge_for_tap_device(self, tap_device_name):
         bridges = self.get_all_quantum_bridges()
         for bridge in bridges:
             interfaces = self.get_interfaces_on_bridge(bridge)
-            if tap_device_name in interfaces:
+            if interfaces and tap_device_name in interfaces:
                 return bridge
 
         return None
@@ -184,6 +295,7 @@ class LinuxBridge:
         if not self.device_exists(bridge_name):
             LOG.debug("Starting bridge %s for subinterface %s" % (bridge_name,
                                                                 interface))
+            self.clear_cache()
             if self.run_cmd(['brctl', 'addbr', bridge_name]):
                 return
             if self.run_cmd(['brctl', 'setfd', bridge_name, str(0)]):
@@ -196,6 +308,7 @@ class LinuxBridge:
                       (bridge_name, interface))
 
         self.run_cmd(['brctl', 'addif', bridge_name, interface])
+        self.clear_cache()
 
     def add_tap_interface(self, network_id, vlan_id, tap_device_name):
         """
@@ -218,11 +331,13 @@ class LinuxBridge:
         LOG.debug("Adding device %s to bridge %s" % (tap_device_name,
                                                      bridge_name))
         if current_bridge_name:
+            self.clear_cache()
             if self.run_cmd(['brctl', 'delif', current_bridge_name,
                              tap_device_name]):
                 return False
 
         self.ensure_vlan_bridge(network_id, vlan_id)
+        self.clear_cache()
         if self.run_cmd(['brctl', 'addif', bridge_name, tap_device_name]):
             return False
         LOG.debug("Done adding device %s to bridge %s" % (tap_device_name,
@@ -236,13 +351,8 @@ class LinuxBridge:
             no more processing is required
             """
             return False
-        if interface_id.startswith(GATEWAY_INTERFACE_PREFIX):
-            return self.add_tap_interface(network_id, vlan_id,
-                                              interface_id)
-        else:
-            tap_device_name = self.get_tap_device_name(interface_id)
-            return self.add_tap_interface(network_id, vlan_id,
-                                          tap_device_name)
+        return self.add_tap_interface(network_id, vlan_id,
+                                      self.get_device_name(interface_id))
 
     def delete_vlan_bridge(self, bridge_name):
         if self.device_exists(bridge_name):
@@ -253,6 +363,7 @@ class LinuxBridge:
                     self.delete_vlan(interface)
 
             LOG.debug("Deleting bridge %s" % bridge_name)
+            self.clear_cache()
             if self.run_cmd(['ip', 'link', 'set', bridge_name, 'down']):
                 return
             if self.run_cmd(['brctl', 'delbr', bridge_name]):
@@ -268,6 +379,7 @@ class LinuxBridge:
                 return True
             LOG.debug("Removing device %s from bridge %s" % \
                       (interface_name, bridge_name))
+            self.clear_cache()
             if self.run_cmd(['brctl', 'delif', bridge_name, interface_name]):
                 return False
             LOG.debug("Done removing device %s from bridge %s" % \
@@ -291,9 +403,12 @@ class LinuxBridge:
 class LinuxBridgeQuantumAgent:
 
     def __init__(self, br_name_prefix, physical_interface, polling_interval,
-                 root_helper):
+                 root_helper, resync_interval=DEFAULT_RESYNC_INTERVAL,
+                 link_monitor=None):
         self.polling_interval = int(polling_interval)
+        self.resync_interval = int(resync_interval)
         self.root_helper = root_helper
+        self.link_monitor = link_monitor
         self.setup_linux_bridge(br_name_prefix, physical_interface)
 
     def setup_linux_bridge(self, br_name_prefix, physical_interface):
@@ -311,18 +426,14 @@ class LinuxBridgeQuantumAgent:
         unplugged VIFs, so we need to remove those tap devices from their
         current bridge association
         """
-        plugged_tap_device_names = []
-        plugged_gateway_device_names = []
+        plugged_tap_device_names = set()
+        plugged_gateway_device_names = set()
         for interface in plugged_interfaces:
+            device_name = self.linux_br.get_device_name(interface)
             if interface.startswith(GATEWAY_INTERFACE_PREFIX):
-                """
-                The name for the gateway devices is set by the linux net
-                driver, hence we use the name as is
-                """
-                plugged_gateway_device_names.append(interface)
+                plugged_gateway_device_names.add(device_name)
             else:
-                tap_device_name = self.linux_br.get_tap_device_name(interface)
-                plugged_tap_device_names.append(tap_device_name)
+                plugged_tap_device_names.add(device_name)
 
         LOG.debug("plugged tap device names %s" % plugged_tap_device_names)
         for tap_device in self.linux_br.get_all_tap_devices():
@@ -343,25 +454,36 @@ class LinuxBridgeQuantumAgent:
 
     def process_deleted_networks(self, vlan_bindings):
         current_quantum_networks = vlan_bindings.keys()
-        current_quantum_bridge_names = []
+        current_quantum_bridge_names = set()
         for network in current_quantum_networks:
             bridge_name = self.linux_br.get_bridge_name(network)
-            current_quantum_bridge_names.append(bridge_name)
+            current_quantum_bridge_names.add(bridge_name)
 
         quantum_bridges_on_this_host = self.linux_br.get_all_quantum_bridges()
         for bridge in quantum_bridges_on_this_host:
             if bridge not in current_quantum_bridge_names:
                 self.linux_br.delete_vlan_bridge(bridge)
 
-    def manage_networks_on_host(self, conn, old_vlan_bindings,
-                                old_port_bindings):
+    def query(self, conn, sql):
         if DB_CONNECTION != 'sqlite':
             cursor = MySQLdb.cursors.DictCursor(conn)
         else:
             cursor = conn.cursor()
-        cursor.execute("SELECT * FROM vlan_bindings")
-        rows = cursor.fetchall()
+        cursor.execute(sql)
+        rows = [dict(row) for row in cursor.fetchall()]
         cursor.close()
+        return rows
+
+    def manage_networks_on_host(self, conn, old_vlan_bindings,
+                                old_port_bindings, changed_devices=None):
+        """
+        Plugs the VIFs of the active ports into the bridges of their
+        networks, unplugs the others and deletes the bridges of deleted
+        networks. Only the ports that changed since old_port_bindings was
+        read, or whose device is in changed_devices, are plugged again;
+        all of them are if changed_devices is None
+        """
+        rows = self.query(conn, "SELECT * FROM vlan_bindings")
         vlan_bindings = {}
         vlans_string = ""
         for row in rows:
@@ -369,27 +491,32 @@ class LinuxBridgeQuantumAgent:
             vlans_string = "%s %s" % (vlans_string, row)
 
         plugged_interfaces = []
-        cursor = MySQLdb.cursors.DictCursor(conn)
-        cursor.execute("SELECT * FROM ports where state = 'ACTIVE'")
-        port_bindings = cursor.fetchall()
-        cursor.close()
+        rows = self.query(conn, "SELECT uuid, network_id, interface_id "
+                          "FROM ports WHERE state = 'ACTIVE' "
+                          "AND interface_id IS NOT NULL")
+        port_bindings = {}
 
         ports_string = ""
-        for pb in port_bindings:
+        for pb in rows:
+            port_bindings[pb['uuid']] = pb
             ports_string = "%s %s" % (ports_string, pb)
-            if pb['interface_id']:
+            if not pb['interface_id']:
+                continue
+            device_name = self.linux_br.get_device_name(pb['interface_id'])
+            if (changed_devices is None or device_name in changed_devices or
+                old_port_bindings.get(pb['uuid']) != pb):
                 vlan_id = \
                         str(vlan_bindings[pb['network_id']]['vlan_id'])
                 if self.process_port_binding(pb['uuid'],
                                              pb['network_id'],
                                              pb['interface_id'],
                                              vlan_id):
-                    cursor = MySQLdb.cursors.DictCursor(conn)
-                    sql = PORT_OPSTATUS_UPDATESQL % (pb['uuid'],
-                                                     OP_STATUS_UP)
+                    cursor = conn.cursor()
+                    sql = PORT_OPSTATUS_UPDATESQL % (OP_STATUS_UP,
+                                                     pb['uuid'])
                     cursor.execute(sql)
                     cursor.close()
-                plugged_interfaces.append(pb['interface_id'])
+            plugged_interfaces.append(pb['interface_id'])
 
         if old_port_bindings != port_bindings:
             LOG.debug("Port-bindings: %s" % ports_string)
@@ -405,17 +532,39 @@ class LinuxBridgeQuantumAgent:
         return {VLAN_BINDINGS: vlan_bindings,
                 PORT_BINDINGS: port_bindings}
 
+    def wait_for_changes(self):
+        """
+        Sleeps for polling_interval seconds, or until a device changes if
+        link notifications are available. Returns the names of the devices
+        that changed, or None if they are not known
+        """
+        if not self.link_monitor:
+            time.sleep(self.polling_interval)
+            return None
+        return self.link_monitor.wait(self.polling_interval)
+
     def daemon_loop(self, conn):
         old_vlan_bindings = {}
         old_port_bindings = {}
+        changed_devices = None
+        next_resync = 0
 
         while True:
+            now = time.time()
+            if now >= next_resync:
+                # Check every port and device from time to time, in case
+                # a change was missed
+                changed_devices = None
+                next_resync = now + self.resync_interval
+            if changed_devices is None or changed_devices:
+                self.linux_br.clear_cache()
             bindings = self.manage_networks_on_host(conn,
                                                     old_vlan_bindings,
-                                                    old_port_bindings)
+                                                    old_port_bindings,
+                                                    changed_devices)
             old_vlan_bindings = bindings[VLAN_BINDINGS]
             old_port_bindings = bindings[PORT_BINDINGS]
-            time.sleep(self.polling_interval)
+            changed_devices = self.wait_for_changes()
 
 
 def main():
@@ -445,6 +594,9 @@ def main():
         br_name_prefix = BRIDGE_NAME_PREFIX
         physical_interface = config.get("LINUX_BRIDGE", "physical_interface")
         polling_interval = config.get("AGENT", "polling_interval")
+        resync_interval = DEFAULT_RESYNC_INTERVAL
+        if config.has_option("AGENT", "resync_interval"):
+            resync_interval = config.get("AGENT", "resync_interval")
         root_helper = config.get("AGENT", "root_helper")
         'Establish database connection and load models'
         global DB_CONNECTION
@@ -467,12 +619,16 @@ def main():
                   % (config_file, str(e)))
         sys.exit(1)
 
+    link_monitor = create_link_monitor()
     try:
         plugin = LinuxBridgeQuantumAgent(br_name_prefix, physical_interface,
-                                         polling_interval, root_helper)
+                                         polling_interval, root_helper,
+                                         resync_interval, link_monitor)
         LOG.info("Agent initialized successfully, now running...")
         plugin.daemon_loop(conn)
     finally:
+        if link_monitor:
+            link_monitor.close()
         if conn:
             conn.close()
 
@@ -0,0 +1,263 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Unit tests for the Linux bridge agent which need neither root privileges
+nor real network devices
+"""
+
+import logging as LOG
+import sqlite3
+import struct
+import unittest
+
+import quantum.plugins.linuxbridge.agent.linuxbridge_quantum_agent\
+                                                     as linux_agent
+
+
+LOG.getLogger(__name__)
+
+NET_ID = 'a3b2fd30-8a8c-11e1-b0c4-0800200c9a66'
+NET_ID2 = 'c0dc1ec0-8a8c-11e1-b0c4-0800200c9a66'
+PORT_ID = 'fa1e1d44-8a8c-11e1-b0c4-0800200c9a66'
+PORT_ID2 = '0b1ec7e6-8a8d-11e1-b0c4-0800200c9a66'
+VIF_ID = 'fe701ddf-26a2-42ea-b9e6-7313d1c522cc'
+VIF_ID2 = '1a5d9fbe-8a8d-11e1-b0c4-0800200c9a66'
+
+RTM_NEWADDR = 20
+IFLA_MTU = 4
+
+
+def rtattr(attr_type, payload):
+    attr_len = linux_agent.RTATTR.size + len(payload)
+    padding = "\0" * (linux_agent.netlink_align(attr_len) - attr_len)
+    return linux_agent.RTATTR.pack(attr_len, attr_type) + payload + padding
+
+
+def link_message(msg_type, device):
+    """Builds an rtnetlink message about device, as the kernel sends it."""
+    body = (linux_agent.IFINFOMSG.pack(0, 1, 2, 0, 0) +
+            rtattr(IFLA_MTU, struct.pack("I", 1500)) +
+            rtattr(linux_agent.IFLA_IFNAME, device + "\0"))
+    msg_len = linux_agent.NLMSGHDR.size + len(body)
+    return linux_agent.NLMSGHDR.pack(msg_len, msg_type, 0, 0, 0) + body
+
+
+class ParseLinkEventsTest(unittest.TestCase):
+
+    def test_new_link(self):
+        data = link_message(linux_agent.RTM_NEWLINK, "tap0")
+        self.assertEqual(linux_agent.parse_link_events(data),
+                         set(["tap0"]))
+
+    def test_deleted_link(self):
+        data = link_message(linux_agent.RTM_DELLINK, "brq1234")
+        self.assertEqual(linux_agent.parse_link_events(data),
+                         set(["brq1234"]))
+
+    def test_several_messages(self):
+        data = (link_message(linux_agent.RTM_NEWLINK, "tap0") +
+                link_message(RTM_NEWADDR, "eth0") +
+                link_message(linux_agent.RTM_DELLINK, "gw-12345"))
+        self.assertEqual(linux_agent.parse_link_events(data),
+                         set(["tap0", "gw-12345"]))
+
+    def test_truncated_header(self):
+        data = link_message(linux_agent.RTM_NEWLINK, "tap0")
+        data = data[:linux_agent.NLMSGHDR.size - 1]
+        self.assertEqual(linux_agent.parse_link_events(data), set())
+
+    def test_truncated_name(self):
+        data = link_message(linux_agent.RTM_NEWLINK, "tap0")
+        self.assertEqual(linux_agent.parse_link_events(data[:-4]), set())
+
+    def test_truncated_last_message(self):
+        data = (link_message(linux_agent.RTM_NEWLINK, "tap0") +
+                link_message(linux_agent.RTM_NEWLINK, "tap1")[:20])
+        self.assertEqual(linux_agent.parse_link_events(data),
+                         set(["tap0"]))
+
+    def test_invalid_length(self):
+        data = linux_agent.NLMSGHDR.pack(0, linux_agent.RTM_NEWLINK, 0, 0, 0)
+        self.assertEqual(linux_agent.parse_link_events(data * 2), set())
+
+
+class FakeLinuxBridge(linux_agent.LinuxBridge):
+    """A LinuxBridge that records what it is asked to plug."""
+
+    cache_clears = 0
+
+    def __init__(self):
+        linux_agent.LinuxBridge.__init__(self, linux_agent.BRIDGE_NAME_PREFIX,
+                                         'eth1', 'sudo')
+        self.plugged = []
+        self.plug_result = True
+        self.cache_clears = 0
+
+    def clear_cache(self):
+        linux_agent.LinuxBridge.clear_cache(self)
+        self.cache_clears += 1
+
+    def add_interface(self, network_id, vlan_id, interface_id):
+        self.plugged.append((network_id, vlan_id, interface_id))
+        return self.plug_result
+
+    def get_all_quantum_bridges(self):
+        return []
+
+    def get_tuntap_devices(self):
+        return []
+
+
+class ManageNetworksOnHostTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db_connection = linux_agent.DB_CONNECTION
+        linux_agent.DB_CONNECTION = 'sqlite'
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE vlan_bindings (vlan_id INTEGER,
+                                        network_id VARCHAR(255));
+            CREATE TABLE ports (uuid VARCHAR(255),
+                                network_id VARCHAR(255),
+                                interface_id VARCHAR(255),
+                                state VARCHAR(8),
+                                op_status VARCHAR(16));
+            """)
+        self.conn.executemany("INSERT INTO vlan_bindings VALUES (?, ?)",
+                              [(1000, NET_ID), (1001, NET_ID2)])
+        self.conn.executemany("INSERT INTO ports VALUES (?, ?, ?, ?, ?)",
+                              [(PORT_ID, NET_ID, VIF_ID, 'ACTIVE', 'DOWN'),
+                               (PORT_ID2, NET_ID, VIF_ID2, 'ACTIVE', 'DOWN')])
+        self.conn.commit()
+        self.agent = linux_agent.LinuxBridgeQuantumAgent(
+            linux_agent.BRIDGE_NAME_PREFIX, 'eth1', 2, 'sudo')
+        self.agent.linux_br = FakeLinuxBridge()
+
+    def tearDown(self):
+        self.conn.close()
+        linux_agent.DB_CONNECTION = self.db_connection
+
+    def _manage(self, old_bindings, changed_devices):
+        self.agent.linux_br.plugged = []
+        return self.agent.manage_networks_on_host(
+            self.conn, old_bindings[linux_agent.VLAN_BINDINGS],
+            old_bindings[linux_agent.PORT_BINDINGS], changed_devices)
+
+    def _op_status(self, port_id):
+        cursor = self.conn.execute("SELECT op_status FROM ports "
+                                   "WHERE uuid = ?", (port_id,))
+        return cursor.fetchone()[0]
+
+    def test_all_ports_plugged_without_changed_devices(self):
+        self._manage({linux_agent.VLAN_BINDINGS: {},
+                      linux_agent.PORT_BINDINGS: {}}, None)
+        self.assertEqual(sorted(self.agent.linux_br.plugged),
+                         sorted([(NET_ID, '1000', VIF_ID),
+                                 (NET_ID, '1000', VIF_ID2)]))
+
+    def test_all_ports_plugged_again_without_changed_devices(self):
+        bindings = self._manage({linux_agent.VLAN_BINDINGS: {},
+                                 linux_agent.PORT_BINDINGS: {}}, None)
+        self._manage(bindings, None)
+        self.assertEqual(len(self.agent.linux_br.plugged), 2)
+
+    def test_nothing_plugged_without_changes(self):
+        bindings = self._manage({linux_agent.VLAN_BINDINGS: {},
+                                 linux_agent.PORT_BINDINGS: {}}, None)
+        self._manage(bindings, set())
+        self.assertEqual(self.agent.linux_br.plugged, [])
+
+    def test_changed_device_plugged(self):
+        bindings = self._manage({linux_agent.VLAN_BINDINGS: {},
+                                 linux_agent.PORT_BINDINGS: {}}, None)
+        device = self.agent.linux_br.get_device_name(VIF_ID2)
+        self._manage(bindings, set([device, "eth0"]))
+        self.assertEqual(self.agent.linux_br.plugged,
+                         [(NET_ID, '1000', VIF_ID2)])
+
+    def test_changed_port_binding_plugged(self):
+        bindings = self._manage({linux_agent.VLAN_BINDINGS: {},
+                                 linux_agent.PORT_BINDINGS: {}}, None)
+        self.conn.execute("UPDATE ports SET network_id = ? WHERE uuid = ?",
+                          (NET_ID2, PORT_ID))
+        self.conn.commit()
+        bindings = self._manage(bindings, set())
+        self.assertEqual(self.agent.linux_br.plugged,
+                         [(NET_ID2, '1001', VIF_ID)])
+        self.assertEqual(
+            bindings[linux_agent.PORT_BINDINGS][PORT_ID]['network_id'],
+            NET_ID2)
+
+    def test_plugged_port_set_up(self):
+        self._manage({linux_agent.VLAN_BINDINGS: {},
+                      linux_agent.PORT_BINDINGS: {}}, None)
+        self.assertEqual(self._op_status(PORT_ID), linux_agent.OP_STATUS_UP)
+        self.assertEqual(self._op_status(PORT_ID2), linux_agent.OP_STATUS_UP)
+
+    def test_port_not_set_up_unless_plugged(self):
+        self.agent.linux_br.plug_result = False
+        self._manage({linux_agent.VLAN_BINDINGS: {},
+                      linux_agent.PORT_BINDINGS: {}}, None)
+        self.assertEqual(self._op_status(PORT_ID),
+                         linux_agent.OP_STATUS_DOWN)
+
+    def test_op_status_sql(self):
+        self.assertEqual(linux_agent.PORT_OPSTATUS_UPDATESQL %
+                         (linux_agent.OP_STATUS_UP, PORT_ID),
+                         "UPDATE ports SET op_status = 'UP' "
+                         "WHERE uuid = '%s'" % PORT_ID)
+
+
+class StopLoop(Exception):
+    pass
+
+
+class FakeLinkMonitor(object):
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    def wait(self, timeout):
+        if not self.changes:
+            raise StopLoop()
+        return self.changes.pop(0)
+
+
+class DaemonLoopTest(unittest.TestCase):
+
+    def test_changed_devices_passed_on(self):
+        monitor = FakeLinkMonitor([set(["tap0"]), set(), None])
+        agent = linux_agent.LinuxBridgeQuantumAgent(
+            linux_agent.BRIDGE_NAME_PREFIX, 'eth1', 2, 'sudo',
+            resync_interval=3600, link_monitor=monitor)
+        agent.linux_br = FakeLinuxBridge()
+        calls = []
+
+        def manage_networks_on_host(conn, old_vlan_bindings,
+                                    old_port_bindings, changed_devices):
+            calls.append((changed_devices, agent.linux_br.cache_clears))
+            return {linux_agent.VLAN_BINDINGS: {},
+                    linux_agent.PORT_BINDINGS: {}}
+        agent.manage_networks_on_host = manage_networks_on_host
+
+        self.assertRaises(StopLoop, agent.daemon_loop, None)
+        # The device cache is only dropped when something changed
+        self.assertEqual(calls, [(None, 1),
+                                 (set(["tap0"]), 2),
+                                 (set(), 2),
+                                 (None, 3)])
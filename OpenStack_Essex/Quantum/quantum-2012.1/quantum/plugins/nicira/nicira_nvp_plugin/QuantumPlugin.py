@@ -518,6 +518,31 @@ class NvpPlugin(object):
         '''
         if not nvplib.check_tenant(self.controller, netw_id, tenant_id):
             raise exception.NetworkNotFound(net_id=netw_id)
+        d = self._get_port_details(netw_id, portw_id)
+        LOG.debug("Port details for tenant %s: %s" % (tenant_id, d))
+        return d
+
+    def get_ports_details(self, tenant_id, netw_id, port_ids):
+        '''
+        Retrieves the details of several ports on the specified Virtual
+        Network, issuing the requests for the ports concurrently.
+
+        :returns: a list of mapping sequences as returned by
+                  get_port_details, in the order of port_ids
+        :raises: exception.PortNotFound
+        :raises: exception.NetworkNotFound
+        '''
+        if not nvplib.check_tenant(self.controller, netw_id, tenant_id):
+            raise exception.NetworkNotFound(net_id=netw_id)
+        ports = nvplib.do_concurrent_requests(
+            self.controller,
+            lambda portw_id: self._get_port_details(netw_id, portw_id),
+            port_ids)
+        LOG.debug("Details of %d ports for tenant %s" % (len(ports),
+                                                          tenant_id))
+        return ports
+
+    def _get_port_details(self, netw_id, portw_id):
         port = nvplib.get_port(self.controller, netw_id, portw_id,
           "LogicalPortAttachment")
         state = "ACTIVE" if port["admin_status_enabled"] else "DOWN"
@@ -530,11 +555,9 @@ class NvpPlugin(object):
         if attach_type == "VifAttachment":
             vif_uuid = relation["LogicalPortAttachment"]["vif_uuid"]
 
-        d = {"port-id": portw_id, "attachment": vif_uuid,
-             "net-id": netw_id, "port-state": state,
-             "port-op-status": op_status}
-        LOG.debug("Port details for tenant %s: %s" % (tenant_id, d))
-        return d
+        return {"port-id": portw_id, "attachment": vif_uuid,
+                "net-id": netw_id, "port-state": state,
+                "port-op-status": op_status}
 
     def plug_interface(self, tenant_id, netw_id, portw_id,
                        remote_interface_id):
@@ -106,6 +106,10 @@ class NvpApiClientEventlet(object):
     def auth_cookie(self):
         return self._cookie
 
+    @property
+    def concurrent_connections(self):
+        return self._concurrent_connections
+
     def acquire_connection(self):
         '''Check out an available HTTPConnection instance.
 
@@ -15,20 +15,66 @@
 # @author: Brad Hall, Nicira Networks, Inc.
 
 from quantum.common import exceptions as exception
+import eventlet
 import json
 import logging
 import NvpApiClient
+import time
 
 LOG = logging.getLogger("nvplib")
 LOG.setLevel(logging.INFO)
 
+# Number of results requested per page when listing NVP resources
+QUERY_PAGE_LENGTH = 1000
+
 
 def do_single_request(*args, **kwargs):
     """Issue a request to a specified controller if specified via kwargs
        (controller=<controller>)."""
     controller = kwargs["controller"]
     LOG.debug("Issuing request to controller: %s" % controller.name)
-    return controller.api_client.request(*args)
+    start = time.time()
+    try:
+        return controller.api_client.request(*args)
+    finally:
+        LOG.debug("%s %s completed in %0.3f seconds" %
+                  (args[0], args[1], time.time() - start))
+
+
+def do_concurrent_requests(controller, func, items):
+    """Call func(item) for each item, with at most as many calls in flight
+       as the controller has API connections. Returns the results in the
+       order of items once all calls are done, or re-raises the exception
+       of the first item whose call failed."""
+    items = list(items)
+    if len(items) < 2:
+        return [func(item) for item in items]
+    pool = eventlet.GreenPool(controller.api_client.concurrent_connections)
+    threads = [pool.spawn(func, item) for item in items]
+    pool.waitall()
+    return [thread.wait() for thread in threads]
+
+
+def do_query_request(uri, **kwargs):
+    """Issue a GET for a listing of resources and return the results of all
+       of its pages, following the page cursors returned by NVP."""
+    controller = kwargs["controller"]
+    sep = "&" if "?" in uri else "?"
+    results = []
+    cursor = None
+    while True:
+        page_uri = "%s%s_page_length=%d" % (uri, sep, QUERY_PAGE_LENGTH)
+        if cursor:
+            page_uri += "&_page_cursor=%s" % cursor
+        resp_obj = do_single_request("GET", page_uri, controller=controller)
+        if not resp_obj:
+            break
+        page = json.loads(resp_obj)
+        results.extend(page["results"])
+        cursor = page.get("page_cursor")
+        if not cursor:
+            break
+    return results
 
 
 def check_default_transport_zone(c):
@@ -120,15 +166,14 @@ def get_all_networks(controller, tenant_id, networks):
        """
     uri = "/ws.v1/lswitch?fields=*&tag=%s&tag_scope=os_tid" % tenant_id
     try:
-        resp_obj = do_single_request("GET", uri, controller=controller)
+        lswitches = do_query_request(uri, controller=controller)
     except NvpApiClient.NvpApiException as e:
         raise exception.QuantumException()
-    if not resp_obj:
-        return []
-    lswitches = json.loads(resp_obj)["results"]
+    known = set(x["net-id"] for x in networks)
     for lswitch in lswitches:
         net_id = lswitch["uuid"]
-        if net_id not in [x["net-id"] for x in networks]:
+        if net_id not in known:
+            known.add(net_id)
             networks.append({"net-id": net_id,
                              "net-name": lswitch["display_name"]})
     return networks
@@ -140,12 +185,9 @@ def query_networks(controller, tenant_id, fields="*", tags=None):
         for t in tags:
             uri += "&tag=%s&tag_scope=%s" % (t[0], t[1])
     try:
-        resp_obj = do_single_request("GET", uri, controller=controller)
+        lswitches = do_query_request(uri, controller=controller)
     except NvpApiClient.NvpApiException as e:
         raise exception.QuantumException()
-    if not resp_obj:
-        return []
-    lswitches = json.loads(resp_obj)["results"]
     nets = [{'net-id': lswitch["uuid"],
              'net-name': lswitch["display_name"]}
              for lswitch in lswitches]
@@ -157,7 +199,7 @@ def delete_network(controller, network):
 
 
 def delete_networks(controller, networks):
-    for network in networks:
+    def _delete_network(network):
         path = "/ws.v1/lswitch/%s" % network
 
         try:
@@ -168,6 +210,8 @@ def delete_networks(controller, networks):
         except NvpApiClient.NvpApiException as e:
             raise exception.QuantumException()
 
+    do_concurrent_requests(controller, _delete_network, networks)
+
 
 def create_network(tenant_id, net_name, **kwargs):
     controller = kwargs["controller"]
@@ -229,14 +273,12 @@ def query_ports(controller, network, relations=None, fields="*", filters=None):
     if filters and "attachment" in filters:
         uri += "&attachment_vif_uuid=%s" % filters["attachment"]
     try:
-        resp_obj = do_single_request("GET", uri,
-          controller=controller)
+        return do_query_request(uri, controller=controller)
     except NvpApiClient.ResourceNotFound as e:
         LOG.error("Network not found, Error: %s" % str(e))
         raise exception.NetworkNotFound(net_id=network)
     except NvpApiClient.NvpApiException as e:
         raise exception.QuantumException()
-    return json.loads(resp_obj)["results"]
 
 
 def delete_port(controller, network, port):
@@ -251,15 +293,16 @@ def delete_port(controller, network, port):
 
 
 def delete_all_ports(controller, ls_uuid):
-    res = do_single_request("GET",
-      "/ws.v1/lswitch/%s/lport?fields=uuid" % ls_uuid,
-      controller=controller)
-    res = json.loads(res)
-    for r in res["results"]:
+    res = do_query_request("/ws.v1/lswitch/%s/lport?fields=uuid" % ls_uuid,
+                           controller=controller)
+
+    def _delete_port(r):
         do_single_request("DELETE",
           "/ws.v1/lswitch/%s/lport/%s" % (ls_uuid, r["uuid"]),
           controller=controller)
 
+    do_concurrent_requests(controller, _delete_port, res)
+
 
 def get_port(controller, network, port, relations=None):
     uri = "/ws.v1/lswitch/" + network + "/lport/" + port + "?"
@@ -0,0 +1,103 @@
+# Copyright 2012 Nicira Networks, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+import urlparse
+
+import eventlet
+
+from quantum.common import exceptions as exception
+from nicira_nvp_plugin import NvpApiClient
+from nicira_nvp_plugin import nvplib
+
+
+class FakeApiClient(object):
+    """Answers lswitch listings one page at a time and records the number
+    of requests in flight."""
+
+    concurrent_connections = 3
+
+    def __init__(self, lswitches):
+        self.lswitches = lswitches
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def request(self, method, url, body="", content_type="application/json"):
+        self.requests.append((method, url))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            eventlet.sleep(0.01)
+            if method == "DELETE":
+                uuid = url.rsplit("/", 1)[1]
+                if uuid not in [ls["uuid"] for ls in self.lswitches]:
+                    raise NvpApiClient.ResourceNotFound()
+                return ""
+            query = urlparse.parse_qs(urlparse.urlparse(url).query)
+            length = int(query["_page_length"][0])
+            start = int(query.get("_page_cursor", [0])[0])
+            page = {"results": self.lswitches[start:start + length],
+                    "result_count": len(self.lswitches)}
+            if start + length < len(self.lswitches):
+                page["page_cursor"] = str(start + length)
+            return json.dumps(page)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeController(object):
+    name = "fake"
+
+    def __init__(self, api_client):
+        self.api_client = api_client
+
+
+class NvpLibTest(unittest.TestCase):
+    def setUp(self):
+        self.lswitches = [{"uuid": "net%d" % i, "display_name": "n%d" % i}
+                          for i in range(10)]
+        self.api_client = FakeApiClient(self.lswitches)
+        self.controller = FakeController(self.api_client)
+        self.page_length = nvplib.QUERY_PAGE_LENGTH
+        nvplib.QUERY_PAGE_LENGTH = 4
+
+    def tearDown(self):
+        nvplib.QUERY_PAGE_LENGTH = self.page_length
+
+    def test_get_all_networks_pages(self):
+        networks = [{"net-id": "net3", "net-name": "n3"},
+                    {"net-id": "other", "net-name": "other"}]
+        nvplib.get_all_networks(self.controller, "tenant", networks)
+        self.assertEqual(len(self.api_client.requests), 3)
+        self.assertEqual([net["net-id"] for net in networks],
+                         ["net3", "other"] +
+                         ["net%d" % i for i in range(10) if i != 3])
+
+    def test_query_networks_pages(self):
+        nets = nvplib.query_networks(self.controller, "tenant")
+        self.assertEqual([net["net-id"] for net in nets],
+                         [ls["uuid"] for ls in self.lswitches])
+
+    def test_delete_networks_concurrently(self):
+        nvplib.delete_networks(self.controller,
+                               [ls["uuid"] for ls in self.lswitches])
+        self.assertEqual(len(self.api_client.requests), 10)
+        self.assertEqual(self.api_client.max_in_flight,
+                         FakeApiClient.concurrent_connections)
+
+    def test_delete_networks_not_found(self):
+        self.assertRaises(exception.NetworkNotFound, nvplib.delete_networks,
+                          self.controller, ["net1", "missing", "net2"])
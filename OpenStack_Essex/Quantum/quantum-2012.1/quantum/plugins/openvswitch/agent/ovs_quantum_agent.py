@@ -20,6 +20,7 @@
 # @author: Dave Lapsley, Nicira Networks, Inc.
 
 import ConfigParser
+import itertools
 import logging as LOG
 import shlex
 import sys
@@ -30,6 +31,8 @@ from optparse import OptionParser
 from sqlalchemy.ext.sqlsoup import SqlSoup
 from subprocess import *
 
+import ovsdb_monitor
+
 
 # Global constants.
 OP_STATUS_UP = "UP"
@@ -58,15 +61,28 @@ class VifPort:
 
 
 class OVSBridge:
+    # An ovsdb_monitor.OVSDBMonitor, if the bridge is read from a replica
+    # of the database instead of with ovs-vsctl.
+    monitor = None
+
     def __init__(self, br_name, root_helper):
         self.br_name = br_name
         self.root_helper = root_helper
-
-    def run_cmd(self, args):
+        self.xapi_iface_ids = {}
+        # (command, flow) pairs to apply on the next flush(), or None if
+        # flows are changed right away
+        self.deferred_flows = None
+        # True if the next flush() replaces the whole flow table
+        self.resync_flows = False
+
+    def run_cmd(self, args, process_input=None):
         cmd = shlex.split(self.root_helper) + args
         LOG.debug("## running command: " + " ".join(cmd))
-        p = Popen(cmd, stdout=PIPE)
-        retval = p.communicate()[0]
+        if process_input is None:
+            p = Popen(cmd, stdout=PIPE)
+        else:
+            p = Popen(cmd, stdin=PIPE, stdout=PIPE)
+        retval = p.communicate(process_input)[0]
         if p.returncode == -(signal.SIGALRM):
             LOG.debug("## timeout running command: " + " ".join(cmd))
         return retval
@@ -84,18 +100,72 @@ class OVSBridge:
           port_name])
 
     def set_db_attribute(self, table_name, record, column, value):
+        if self.monitor and (table_name, column) == ("Port", "tag"):
+            # written by the next flush()
+            self.monitor.set_port_tag(record, value)
+            return
         args = ["set", table_name, record, "%s=%s" % (column, value)]
         self.run_vsctl(args)
 
     def clear_db_attribute(self, table_name, record, column):
+        if self.monitor and (table_name, column) == ("Port", "tag"):
+            self.monitor.set_port_tag(record, None)
+            return
         args = ["clear", table_name, record, column]
         self.run_vsctl(args)
 
-    def run_ofctl(self, cmd, args):
+    def defer_flows(self):
+        """Queues flow changes until the next flush().
+
+        Consecutive adds are then applied with a single ovs-ofctl
+        command, which reads the flows from its stdin.  Deletes are
+        applied one by one in between, in the order they were queued.
+        """
+        if self.deferred_flows is None:
+            self.deferred_flows = []
+
+    def flush(self):
+        """Writes the port tags and flows queued since the last flush."""
+        if self.monitor:
+            self.monitor.commit()
+        if self.deferred_flows or self.resync_flows:
+            self._apply_flows()
+
+    def _apply_flows(self):
+        flows, self.deferred_flows = self.deferred_flows, []
+        if self.resync_flows:
+            # ovs-ofctl dumps the flow table once and only changes the
+            # flows that differ from the ones queued since
+            self.resync_flows = False
+            table = []
+            for cmd, flow_str in flows:
+                if cmd == "add-flows":
+                    table.append(flow_str)
+                else:
+                    table = [f for f in table
+                             if not _flow_matches(f, flow_str)]
+            self.run_ofctl("replace-flows", ["-"],
+                           "".join(f + "\n" for f in table))
+            return
+        for cmd, group in itertools.groupby(flows, lambda flow: flow[0]):
+            if cmd == "add-flows":
+                self.run_ofctl(cmd, ["-"],
+                               "".join(f + "\n" for c, f in group))
+            else:
+                # del-flows only takes a flow on its command line
+                for c, flow_str in group:
+                    self.run_ofctl(cmd, [flow_str])
+
+    def run_ofctl(self, cmd, args, process_input=None):
         full_args = ["ovs-ofctl", cmd, self.br_name] + args
-        return self.run_cmd(full_args)
+        return self.run_cmd(full_args, process_input)
 
     def remove_all_flows(self):
+        if self.deferred_flows is not None:
+            # the flows added until the next flush() replace the table
+            self.deferred_flows = []
+            self.resync_flows = True
+            return
         self.run_ofctl("del-flows", [])
 
     def get_port_ofport(self, port_name):
@@ -111,6 +181,9 @@ class OVSBridge:
         if "match" in dict:
             flow_str += "," + dict["match"]
         flow_str += ",actions=%s" % (dict["actions"])
+        if self.deferred_flows is not None:
+            self.deferred_flows.append(("add-flows", flow_str))
+            return
         self.run_ofctl("add-flow", [flow_str])
 
     def delete_flows(self, **dict):
@@ -122,6 +195,12 @@ class OVSBridge:
         if "actions" in dict:
             all_args.append("actions=%s" % (dict["actions"]))
         flow_str = ",".join(all_args)
+        if self.deferred_flows is not None:
+            if not flow_str:
+                self.remove_all_flows()
+            else:
+                self.deferred_flows.append(("del-flows", flow_str))
+            return
         self.run_ofctl("del-flows", [flow_str])
 
     def add_tunnel_port(self, port_name, remote_ip):
@@ -159,6 +238,8 @@ class OVSBridge:
         return ret
 
     def get_port_name_list(self):
+        if self.monitor:
+            return self.monitor.get_port_names(self.br_name)
         res = self.run_vsctl(["list-ports", self.br_name])
         return res.split("\n")[0:-1]
 
@@ -173,8 +254,30 @@ class OVSBridge:
                         "param-key=nicira-iface-id",
                         "uuid=%s" % xs_vif_uuid]).strip()
 
+    def _get_monitored_vif_ports(self):
+        edge_ports = []
+        for iface in self.monitor.get_interfaces(self.br_name):
+            external_ids = iface.external_ids
+            if "attached-mac" not in external_ids:
+                continue
+            if "iface-id" in external_ids:
+                iface_id = external_ids["iface-id"]
+            elif "xs-vif-uuid" in external_ids:
+                xs_vif_uuid = external_ids["xs-vif-uuid"]
+                if xs_vif_uuid not in self.xapi_iface_ids:
+                    self.xapi_iface_ids[xs_vif_uuid] = \
+                        self.get_xapi_iface_id(xs_vif_uuid)
+                iface_id = self.xapi_iface_ids[xs_vif_uuid]
+            else:
+                continue
+            edge_ports.append(VifPort(iface.name, iface.ofport, iface_id,
+                                      external_ids["attached-mac"], self))
+        return edge_ports
+
     # returns a VIF object for each VIF port
     def get_vif_ports(self):
+        if self.monitor:
+            return self._get_monitored_vif_ports()
         edge_ports = []
         port_names = self.get_port_name_list()
         for name in port_names:
@@ -196,6 +299,57 @@ class OVSBridge:
         return edge_ports
 
 
+def _flow_matches(flow_str, match_str):
+    """Returns True if del-flows would delete flow_str given match_str."""
+    def fields(s):
+        return set(f for f in s.split("actions=")[0].split(",")
+                   if f and not f.startswith("priority="))
+    return fields(match_str) <= fields(flow_str)
+
+
+def get_port_bindings(db, vif_ids=None):
+    """Reads Quantum ports from the database.
+
+    :param vif_ids: if given, only the ports attached to these interfaces
+        are read, rather than every port in the cloud.
+    :returns: a dictionary of ports by interface id.
+    """
+    if vif_ids is None:
+        ports = db.ports.all()
+    elif vif_ids:
+        ports = db.ports.filter(db.ports.interface_id.in_(vif_ids)).all()
+    else:
+        ports = []
+    return dict([(port.interface_id, port) for port in ports])
+
+
+def get_vlan_bindings(db, net_ids=None):
+    """Reads vlan bindings from the database.
+
+    :param net_ids: if given, only the bindings of these networks are read.
+    :returns: a dictionary of vlan ids by network id.
+    """
+    if net_ids is None:
+        binds = db.vlan_bindings.all()
+    elif net_ids:
+        binds = db.vlan_bindings.filter(
+            db.vlan_bindings.network_id.in_(net_ids)).all()
+    else:
+        binds = []
+    return dict([(bind.network_id, bind.vlan_id) for bind in binds])
+
+
+def wait_for_changes(bridge, interval):
+    """Sleeps for interval seconds.
+
+    Wakes up early if the bridge is monitored and its database changes.
+    """
+    if bridge.monitor:
+        bridge.monitor.run(interval)
+    else:
+        time.sleep(interval)
+
+
 class LocalVLANMapping:
     def __init__(self, vlan, lsw_id, vif_ids=None):
         if vif_ids is None:
@@ -210,8 +364,9 @@ class LocalVLANMapping:
 
 class OVSQuantumAgent(object):
 
-    def __init__(self, integ_br, root_helper):
+    def __init__(self, integ_br, root_helper, monitor=None):
         self.root_helper = root_helper
+        self.monitor = monitor
         self.setup_integration_br(integ_br)
 
     def port_bound(self, port, vlan_id):
@@ -225,6 +380,11 @@ class OVSQuantumAgent(object):
 
     def setup_integration_br(self, integ_br):
         self.int_br = OVSBridge(integ_br, self.root_helper)
+        if self.monitor:
+            self.int_br.monitor = self.monitor
+        # Existing flows are only replaced once the first pass of the
+        # daemon loop has queued the ones that should be there.
+        self.int_br.defer_flows()
         self.int_br.remove_all_flows()
         # switch all traffic using L2 learning
         self.int_br.add_flow(priority=1, actions="normal")
@@ -235,32 +395,34 @@ class OVSQuantumAgent(object):
         old_vif_ports = {}
 
         while True:
+            vif_ports = self.int_br.get_vif_ports()
 
-            all_bindings = {}
+            # Only the ports of local interfaces, including those that
+            # just disappeared, are of interest.
+            vif_ids = set(p.vif_id for p in vif_ports)
+            vif_ids.update(old_vif_ports)
             try:
-                ports = db.ports.all()
+                all_bindings = get_port_bindings(db, vif_ids)
             except:
-                ports = []
-            for port in ports:
-                all_bindings[port.interface_id] = port
+                all_bindings = {}
 
-            vlan_bindings = {}
             try:
-                vlan_binds = db.vlan_bindings.all()
+                vlan_bindings = get_vlan_bindings(
+                    db, set(port.network_id
+                            for port in all_bindings.itervalues()))
             except:
-                vlan_binds = []
-            for bind in vlan_binds:
-                vlan_bindings[bind.network_id] = bind.vlan_id
+                vlan_bindings = {}
 
             new_vif_ports = {}
             new_local_bindings = {}
-            vif_ports = self.int_br.get_vif_ports()
             for p in vif_ports:
                 new_vif_ports[p.vif_id] = p
                 if p.vif_id in all_bindings:
                     net_id = all_bindings[p.vif_id].network_id
                     new_local_bindings[p.vif_id] = net_id
-                else:
+                elif (p.vif_id not in old_vif_ports or
+                      p.vif_id in old_local_bindings or
+                      old_vif_ports[p.vif_id].ofport != p.ofport):
                     # no binding, put him on the 'dead vlan'
                     self.int_br.set_db_attribute("Port", p.port_name, "tag",
                                                  DEAD_VLAN_TAG)
@@ -299,8 +461,9 @@ class OVSQuantumAgent(object):
 
             old_vif_ports = new_vif_ports
             old_local_bindings = new_local_bindings
+            self.int_br.flush()
             db.commit()
-            time.sleep(REFRESH_INTERVAL)
+            wait_for_changes(self.int_br, REFRESH_INTERVAL)
 
 
 class OVSQuantumTunnelAgent(object):
@@ -328,14 +491,17 @@ class OVSQuantumTunnelAgent(object):
     MAX_VLAN_TAG = 4094
 
     def __init__(self, integ_br, tun_br, remote_ip_file, local_ip,
-                 root_helper):
+                 root_helper, monitor=None):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
         :param tun_br: name of the tunnel bridge.
         :param remote_ip_file: name of file containing list of hypervisor IPs.
-        :param local_ip: local IP address of this hypervisor.'''
+        :param local_ip: local IP address of this hypervisor.
+        :param monitor: optional ovsdb_monitor.OVSDBMonitor to read the
+            integration bridge with.'''
         self.root_helper = root_helper
+        self.monitor = monitor
         self.available_local_vlans = set(
             xrange(OVSQuantumTunnelAgent.MIN_VLAN_TAG,
                    OVSQuantumTunnelAgent.MAX_VLAN_TAG))
@@ -426,10 +592,14 @@ class OVSQuantumTunnelAgent(object):
     def setup_integration_br(self, integ_br):
         '''Setup the integration bridge.
 
-        Create patch ports and remove all existing flows.
+        Create patch ports and remove all existing flows. Flows are
+        changed on the next flush() of the bridge.
 
         :param integ_br: the name of the integration bridge.'''
         self.int_br = OVSBridge(integ_br, self.root_helper)
+        if self.monitor:
+            self.int_br.monitor = self.monitor
+        self.int_br.defer_flows()
         self.int_br.delete_port("patch-tun")
         self.patch_tun_ofport = self.int_br.add_patch_port("patch-tun",
                                                            "patch-int")
@@ -443,12 +613,14 @@ class OVSQuantumTunnelAgent(object):
         Reads in list of IP addresses. Creates GRE tunnels to each of these
         addresses and then clears out existing flows. local_ip is the address
         of the local node. A tunnel is not created to this IP address.
+        Flows are changed on the next flush() of the bridge.
 
         :param tun_br: the name of the tunnel bridge.
         :param remote_ip_file: path to file that contains list of destination
             IP addresses.
         :param local_ip: the ip address of this node.'''
         self.tun_br = OVSBridge(tun_br, self.root_helper)
+        self.tun_br.defer_flows()
         self.tun_br.reset_bridge()
         self.patch_int_ofport = self.tun_br.add_patch_port("patch-int",
                                                            "patch-tun")
@@ -468,36 +640,33 @@ class OVSQuantumTunnelAgent(object):
         # default drop
         self.tun_br.add_flow(priority=1, actions="drop")
 
-    def get_db_port_bindings(self, db):
+    def get_db_port_bindings(self, db, vif_ids=None):
         '''Get database port bindings from central Quantum database.
 
         The central quantum database 'ovs_quantum' resides on the openstack
         mysql server.
 
+        :param vif_ids: if given, only get the bindings of these interfaces.
         :returns: a dictionary containing port bindings.'''
-        ports = []
         try:
-            ports = db.ports.all()
+            return get_port_bindings(db, vif_ids)
         except Exception, e:
             LOG.info("Exception accessing db.ports: %s" % e)
+            return {}
 
-        return dict([(port.interface_id, port) for port in ports])
-
-    def get_db_vlan_bindings(self, db):
+    def get_db_vlan_bindings(self, db, net_ids=None):
         '''Get database vlan bindings from central Quantum database.
 
         The central quantum database 'ovs_quantum' resides on the openstack
         mysql server.
 
+        :param net_ids: if given, only get the bindings of these networks.
         :returns: a dictionary containing vlan bindings.'''
-        lsw_id_binds = []
         try:
-            lsw_id_binds.extend(db.vlan_bindings.all())
+            return get_vlan_bindings(db, net_ids)
         except Exception, e:
             LOG.info("Exception accessing db.vlan_bindings: %s" % e)
-
-        return dict([(bind.network_id, bind.vlan_id)
-            for bind in lsw_id_binds])
+            return {}
 
     def daemon_loop(self, db):
         '''Main processing loop (not currently used).
@@ -506,21 +675,27 @@ class OVSQuantumTunnelAgent(object):
         '''
         old_local_bindings = {}
         old_vif_ports = {}
+        old_dead_vif_ports = set()
 
         while True:
-            # Get bindings from db.
-            all_bindings = self.get_db_port_bindings(db)
-            all_bindings_vif_port_ids = set(all_bindings.keys())
-            lsw_id_bindings = self.get_db_vlan_bindings(db)
-
             # Get bindings from OVS bridge.
             vif_ports = self.int_br.get_vif_ports()
             new_vif_ports = dict([(p.vif_id, p) for p in vif_ports])
             new_vif_ports_ids = set(new_vif_ports.keys())
-
             old_vif_ports_ids = set(old_vif_ports.keys())
+
+            # Get bindings of the local ports from db.
+            all_bindings = self.get_db_port_bindings(db, new_vif_ports_ids)
+            all_bindings_vif_port_ids = set(all_bindings.keys())
+            lsw_id_bindings = self.get_db_vlan_bindings(
+                db, set(port.network_id for port in all_bindings.values()))
+
             dead_vif_ports_ids = new_vif_ports_ids - all_bindings_vif_port_ids
-            dead_vif_ports = [new_vif_ports[p] for p in dead_vif_ports_ids]
+            # Ports already put on the dead vlan are left alone.
+            new_dead_vif_ports = set((p, new_vif_ports[p].ofport)
+                                     for p in dead_vif_ports_ids)
+            dead_vif_ports = [new_vif_ports[p] for p, ofport
+                              in new_dead_vif_ports - old_dead_vif_ports]
             disappeared_vif_ports_ids = old_vif_ports_ids - new_vif_ports_ids
             new_local_bindings_ids = all_bindings_vif_port_ids.intersection(
                 new_vif_ports_ids)
@@ -590,7 +765,10 @@ class OVSQuantumTunnelAgent(object):
 
             old_vif_ports = new_vif_ports
             old_local_bindings = new_local_bindings
-            time.sleep(REFRESH_INTERVAL)
+            old_dead_vif_ports = new_dead_vif_ports
+            self.int_br.flush()
+            self.tun_br.flush()
+            wait_for_changes(self.int_br, REFRESH_INTERVAL)
 
 
 def main():
@@ -643,6 +821,18 @@ def main():
                   % (config_file, str(e)))
         sys.exit(1)
 
+    # Read the bridges from a replica of the OVS database when possible.
+    ovsdb_connection = ovsdb_monitor.DEFAULT_CONNECTION
+    if config.has_option("OVS", "ovsdb-connection"):
+        ovsdb_connection = config.get("OVS", "ovsdb-connection")
+    ovsdb_schema = ovsdb_monitor.DEFAULT_SCHEMA
+    if config.has_option("OVS", "ovsdb-schema"):
+        ovsdb_schema = config.get("OVS", "ovsdb-schema")
+    monitor = None
+    if ovsdb_connection:
+        monitor = ovsdb_monitor.create_monitor(ovsdb_connection,
+                                               ovsdb_schema)
+
     if enable_tunneling:
         # Get parameters for OVSQuantumTunnelAgent
         try:
@@ -667,10 +857,10 @@ def main():
             sys.exit(1)
 
         plugin = OVSQuantumTunnelAgent(integ_br, tun_br, remote_ip_file,
-                                       local_ip, root_helper)
+                                       local_ip, root_helper, monitor)
     else:
         # Get parameters for OVSQuantumAgent.
-        plugin = OVSQuantumAgent(integ_br, root_helper)
+        plugin = OVSQuantumAgent(integ_br, root_helper, monitor)
 
     # Start everything.
     options = {"sql_connection": db_connection_url}
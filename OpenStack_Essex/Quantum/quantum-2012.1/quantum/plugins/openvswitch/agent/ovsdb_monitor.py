@@ -0,0 +1,210 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 Nicira Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keeps an in-memory replica of the local Open vSwitch database.
+
+The agents read bridge ports and interfaces from the replica instead of
+forking ovs-vsctl for every port on every poll. The replica is kept up to
+date by an OVSDB monitor on the database server's socket, so only rows that
+changed are sent to the agent. Port tags are written back in batches, one
+transaction at a time.
+
+This requires the Open vSwitch python library (python-openvswitch). Agents
+fall back to ovs-vsctl when it is not installed.
+"""
+
+import logging as LOG
+import os
+import time
+
+try:
+    import ovs.db.idl
+    import ovs.db.schema
+    import ovs.json
+    import ovs.poller
+except ImportError:
+    ovs = None
+
+
+DEFAULT_CONNECTION = "unix:/var/run/openvswitch/db.sock"
+DEFAULT_SCHEMA = "/usr/share/openvswitch/vswitch.ovsschema"
+
+# The only tables and columns the agents use.
+MONITORED_COLUMNS = {
+    "Bridge": ["name", "ports"],
+    "Port": ["name", "interfaces", "tag"],
+    "Interface": ["name", "external_ids", "ofport"],
+}
+
+# How long to wait for the initial contents of the database.
+CONNECT_TIMEOUT = 10
+
+
+def is_available(schema_path=DEFAULT_SCHEMA):
+    return ovs is not None and os.path.exists(schema_path)
+
+
+def _load_schema(schema_path):
+    schema = ovs.db.schema.DbSchema.from_json(ovs.json.from_file(schema_path))
+    for table_name in schema.tables.keys():
+        if table_name not in MONITORED_COLUMNS:
+            del schema.tables[table_name]
+            continue
+        columns = schema.tables[table_name].columns
+        for column_name in columns.keys():
+            if column_name not in MONITORED_COLUMNS[table_name]:
+                del columns[column_name]
+    return schema
+
+
+class Interface(object):
+    """An interface on a bridge, as read from the replica."""
+
+    def __init__(self, name, ofport, external_ids):
+        self.name = name
+        self.ofport = ofport
+        self.external_ids = external_ids
+
+
+class OVSDBMonitor(object):
+
+    def __init__(self, connection=DEFAULT_CONNECTION,
+                 schema_path=DEFAULT_SCHEMA):
+        self.idl = ovs.db.idl.Idl(connection, _load_schema(schema_path))
+        # port name -> new tag (None to clear it), written by commit()
+        self.pending_tags = {}
+        self._bridges = {}
+        self._bridges_seqno = None
+
+    def connect(self, timeout=CONNECT_TIMEOUT):
+        """Waits for the initial contents of the database.
+
+        :returns: True if the replica was loaded within timeout seconds.
+        """
+        deadline = time.time() + timeout
+        while not self.idl.has_ever_connected():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self.run(remaining)
+        return True
+
+    def close(self):
+        self.idl.close()
+
+    def run(self, timeout=0):
+        """Processes updates from the database server.
+
+        Waits up to timeout seconds for a change if none is pending.
+
+        :returns: True if the replica changed.
+        """
+        changed = self.idl.run()
+        if not changed and timeout > 0:
+            poller = ovs.poller.Poller()
+            self.idl.wait(poller)
+            poller.timer_wait(int(timeout * 1000))
+            poller.block()
+            changed = self.idl.run()
+        return changed
+
+    def _index(self):
+        """Indexes interfaces by bridge, once per change to the replica."""
+        if self._bridges_seqno == self.idl.change_seqno:
+            return self._bridges
+        bridges = {}
+        for bridge in self.idl.tables["Bridge"].rows.itervalues():
+            interfaces = bridges[bridge.name] = []
+            for port in bridge.ports:
+                # Like ovs-vsctl list-ports, leave out the bridge's own
+                # local port
+                if port is None or port.name == bridge.name:
+                    continue
+                for iface in port.interfaces:
+                    if iface is None:
+                        continue
+                    ofport = iface.ofport
+                    interfaces.append(Interface(
+                        iface.name, ofport and str(ofport[0]) or "",
+                        iface.external_ids))
+        self._bridges = bridges
+        self._bridges_seqno = self.idl.change_seqno
+        return bridges
+
+    def get_interfaces(self, br_name):
+        """Returns the Interfaces on a bridge."""
+        return self._index().get(br_name, [])
+
+    def get_port_names(self, br_name):
+        return [iface.name for iface in self.get_interfaces(br_name)]
+
+    def set_port_tag(self, port_name, tag):
+        """Queues a change to the tag of a port.
+
+        :param tag: the new tag, or None to clear it.
+        """
+        self.pending_tags[port_name] = tag
+
+    def commit(self):
+        """Writes the queued port tags in a single transaction.
+
+        Tags that could not be written are kept for the next commit.
+
+        :returns: True if all queued tags were written.
+        """
+        if not self.pending_tags:
+            return True
+        ports = dict((port.name, port)
+                     for port in self.idl.tables["Port"].rows.itervalues())
+        txn = ovs.db.idl.Transaction(self.idl)
+        txn.add_comment("quantum agent: set port tags")
+        for port_name, tag in self.pending_tags.iteritems():
+            port = ports.get(port_name)
+            if port is None:
+                # the port has been deleted already
+                continue
+            if tag is None:
+                port.tag = []
+            else:
+                port.tag = [int(tag)]
+        status = txn.commit_block()
+        if status in (ovs.db.idl.Transaction.SUCCESS,
+                      ovs.db.idl.Transaction.UNCHANGED):
+            self.pending_tags = {}
+            return True
+        LOG.warn("Unable to set port tags %s: %s" %
+                 (self.pending_tags, txn.get_error() or status))
+        return False
+
+
+def create_monitor(connection=DEFAULT_CONNECTION, schema_path=DEFAULT_SCHEMA):
+    """Returns a connected OVSDBMonitor, or None if one can not be used."""
+    if not is_available(schema_path):
+        LOG.info("Open vSwitch python library or schema %s not found, "
+                 "using ovs-vsctl" % schema_path)
+        return None
+    try:
+        monitor = OVSDBMonitor(connection, schema_path)
+    except Exception, e:
+        LOG.warn("Unable to monitor %s, using ovs-vsctl: %s" %
+                 (connection, e))
+        return None
+    if not monitor.connect():
+        LOG.warn("Unable to connect to %s, using ovs-vsctl" % connection)
+        monitor.close()
+        return None
+    LOG.info("Monitoring Open vSwitch database at %s" % connection)
+    return monitor
@@ -89,6 +89,9 @@ class VlanMap(object):
 
 class OVSQuantumPlugin(QuantumPluginBase):
 
+    supported_network_filters = db.NETWORK_FILTERS
+    supported_port_filters = db.PORT_FILTERS
+
     def __init__(self, configfile=None):
         config = ConfigParser.ConfigParser()
         if configfile is None:
@@ -119,7 +122,7 @@ class OVSQuantumPlugin(QuantumPluginBase):
 
     def get_all_networks(self, tenant_id, **kwargs):
         nets = []
-        for x in db.network_list(tenant_id):
+        for x in db.network_list(tenant_id, kwargs.get('filter_opts')):
             LOG.debug("Adding network: %s" % x.uuid)
             nets.append(self._make_net_dict(str(x.uuid), x.name,
                                             None, x.op_status))
@@ -184,8 +187,7 @@ class OVSQuantumPlugin(QuantumPluginBase):
     def get_all_ports(self, tenant_id, net_id, **kwargs):
         ids = []
         db.validate_network_ownership(tenant_id, net_id)
-        ports = db.port_list(net_id)
-        # This plugin does not perform filtering at the moment
+        ports = db.port_list(net_id, kwargs.get('filter_opts'))
         return [{'port-id': str(p.uuid)} for p in ports]
 
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
@@ -214,6 +216,11 @@ class OVSQuantumPlugin(QuantumPluginBase):
         port = db.port_get(port_id, net_id)
         return self._make_port_dict(port)
 
+    def get_ports_details(self, tenant_id, net_id, port_ids):
+        db.validate_network_ownership(tenant_id, net_id)
+        return [self._make_port_dict(port)
+                for port in db.ports_get(port_ids, net_id)]
+
     def plug_interface(self, tenant_id, net_id, port_id, remote_iface_id):
         db.validate_port_ownership(tenant_id, net_id, port_id)
         db.port_set_attachment(port_id, net_id, remote_iface_id)
@@ -0,0 +1,81 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 Nicira Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mox
+import unittest
+from agent import ovs_quantum_agent
+
+BRIDGE = 'br-int'
+
+
+class DeferredFlowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mox = mox.Mox()
+        self.br = ovs_quantum_agent.OVSBridge(BRIDGE, 'sudo')
+        self.mox.StubOutWithMock(self.br, 'run_cmd')
+
+    def tearDown(self):
+        self.mox.UnsetStubs()
+
+    def testFlowsAppliedImmediately(self):
+        self.br.run_cmd(['ovs-ofctl', 'add-flow', BRIDGE,
+                         'priority=1,actions=normal'], None)
+        self.mox.ReplayAll()
+
+        self.br.add_flow(priority=1, actions='normal')
+        self.mox.VerifyAll()
+
+    def testFlowsBatched(self):
+        # consecutive adds are applied in one command and deletes one by
+        # one, in the order they were queued
+        self.br.run_cmd(['ovs-ofctl', 'add-flows', BRIDGE, '-'],
+                        'priority=2,in_port=1,actions=drop\n'
+                        'priority=2,in_port=2,actions=drop\n')
+        self.br.run_cmd(['ovs-ofctl', 'del-flows', BRIDGE, 'in_port=3'],
+                        None)
+        self.br.run_cmd(['ovs-ofctl', 'del-flows', BRIDGE, 'tun_id=42'],
+                        None)
+        self.br.run_cmd(['ovs-ofctl', 'add-flows', BRIDGE, '-'],
+                        'priority=3,tun_id=42,actions=normal\n')
+        self.mox.ReplayAll()
+
+        self.br.defer_flows()
+        self.br.add_flow(priority=2, match='in_port=1', actions='drop')
+        self.br.add_flow(priority=2, match='in_port=2', actions='drop')
+        self.br.delete_flows(match='in_port=3')
+        self.br.delete_flows(match='tun_id=42')
+        self.br.add_flow(priority=3, match='tun_id=42', actions='normal')
+        self.br.flush()
+        # nothing left to apply
+        self.br.flush()
+        self.mox.VerifyAll()
+
+    def testResync(self):
+        self.br.run_cmd(['ovs-ofctl', 'replace-flows', BRIDGE, '-'],
+                        'priority=1,actions=normal\n'
+                        'priority=2,in_port=2,actions=drop\n')
+        self.mox.ReplayAll()
+
+        self.br.defer_flows()
+        self.br.add_flow(priority=2, match='in_port=5', actions='drop')
+        self.br.remove_all_flows()
+        self.br.add_flow(priority=1, actions='normal')
+        self.br.add_flow(priority=2, match='in_port=1', actions='drop')
+        self.br.add_flow(priority=2, match='in_port=2', actions='drop')
+        self.br.delete_flows(match='in_port=1')
+        self.br.flush()
+        self.mox.VerifyAll()
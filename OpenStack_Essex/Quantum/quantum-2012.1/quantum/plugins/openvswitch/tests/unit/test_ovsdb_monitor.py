@@ -0,0 +1,168 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 Nicira Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mox
+import unittest
+from agent import ovs_quantum_agent
+from agent import ovsdb_monitor
+
+BRIDGE = 'br-int'
+VIF_ID = '404deaec-5d37-11e1-a64b-000c29d5f0a8'
+VIF_MAC = '3c:09:24:1e:78:23'
+
+
+class FakeMonitor(object):
+    def __init__(self, interfaces):
+        self.interfaces = interfaces
+        self.pending_tags = {}
+        self.commits = 0
+
+    def get_interfaces(self, br_name):
+        return self.interfaces.get(br_name, [])
+
+    def get_port_names(self, br_name):
+        return [iface.name for iface in self.get_interfaces(br_name)]
+
+    def set_port_tag(self, port_name, tag):
+        self.pending_tags[port_name] = tag
+
+    def commit(self):
+        self.commits += 1
+        self.pending_tags = {}
+        return True
+
+
+class MonitoredBridgeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mox = mox.Mox()
+        self.monitor = FakeMonitor({BRIDGE: [
+            ovsdb_monitor.Interface('tap0', '1', {'iface-id': VIF_ID,
+                                                  'attached-mac': VIF_MAC}),
+            ovsdb_monitor.Interface('vif1.0', '2', {'xs-vif-uuid': 'xs-uuid',
+                                                    'attached-mac': VIF_MAC}),
+            ovsdb_monitor.Interface('patch-tun', '3', {}),
+        ]})
+        self.br = ovs_quantum_agent.OVSBridge(BRIDGE, 'sudo')
+        self.br.monitor = self.monitor
+        self.mox.StubOutWithMock(self.br, 'run_vsctl')
+
+    def tearDown(self):
+        self.mox.UnsetStubs()
+
+    def testGetVifPorts(self):
+        self.mox.StubOutWithMock(self.br, 'get_xapi_iface_id')
+        # looked up in XAPI once, however often the bridge is read
+        self.br.get_xapi_iface_id('xs-uuid').AndReturn('xs-iface-id')
+        self.mox.ReplayAll()
+
+        for i in range(2):
+            ports = self.br.get_vif_ports()
+            self.assertEqual([(p.port_name, p.ofport, p.vif_id)
+                              for p in ports],
+                             [('tap0', '1', VIF_ID),
+                              ('vif1.0', '2', 'xs-iface-id')])
+        self.assertEqual(self.br.get_port_name_list(),
+                         ['tap0', 'vif1.0', 'patch-tun'])
+        self.mox.VerifyAll()
+
+    def testPortTagsFlushed(self):
+        self.mox.ReplayAll()
+
+        self.br.set_db_attribute('Port', 'tap0', 'tag', '5')
+        self.br.clear_db_attribute('Port', 'vif1.0', 'tag')
+        self.assertEqual(self.monitor.pending_tags,
+                         {'tap0': '5', 'vif1.0': None})
+        self.br.flush()
+        self.assertEqual(self.monitor.commits, 1)
+        self.assertEqual(self.monitor.pending_tags, {})
+        self.mox.VerifyAll()
+
+    def testOtherAttributesUseVsctl(self):
+        self.br.run_vsctl(['set', 'Interface', 'tap0', 'type=internal'])
+        self.mox.ReplayAll()
+
+        self.br.set_db_attribute('Interface', 'tap0', 'type', 'internal')
+        self.assertEqual(self.monitor.pending_tags, {})
+        self.mox.VerifyAll()
+
+
+class Row(object):
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+
+
+class FakeTable(object):
+    def __init__(self, rows):
+        self.rows = dict(enumerate(rows))
+
+
+class FakeIdl(object):
+    def __init__(self, bridges):
+        self.tables = {"Bridge": FakeTable(bridges)}
+        self.change_seqno = 1
+
+
+class OVSDBMonitorTest(unittest.TestCase):
+
+    def testLocalPortLeftOut(self):
+        def port(name, ofport, external_ids):
+            iface = Row(name=name, ofport=[ofport],
+                        external_ids=external_ids)
+            return Row(name=name, interfaces=[iface])
+
+        bridge = Row(name=BRIDGE, ports=[
+            port(BRIDGE, 65534, {}),
+            port('tap0', 1, {'iface-id': VIF_ID}),
+        ])
+        monitor = ovsdb_monitor.OVSDBMonitor.__new__(
+            ovsdb_monitor.OVSDBMonitor)
+        monitor.idl = FakeIdl([bridge])
+        monitor._bridges = {}
+        monitor._bridges_seqno = None
+
+        self.assertEqual(monitor.get_port_names(BRIDGE), ['tap0'])
+        interfaces = monitor.get_interfaces(BRIDGE)
+        self.assertEqual([(i.name, i.ofport) for i in interfaces],
+                         [('tap0', '1')])
+
+
+class PortBindingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mox = mox.Mox()
+
+    def tearDown(self):
+        self.mox.UnsetStubs()
+
+    def testScopedToVifIds(self):
+        db = self.mox.CreateMockAnything()
+        db.ports = self.mox.CreateMockAnything()
+        db.ports.interface_id = self.mox.CreateMockAnything()
+        query = self.mox.CreateMockAnything()
+        port = self.mox.CreateMockAnything()
+        port.interface_id = VIF_ID
+        db.ports.interface_id.in_(set([VIF_ID])).AndReturn('clause')
+        db.ports.filter('clause').AndReturn(query)
+        query.all().AndReturn([port])
+        self.mox.ReplayAll()
+
+        self.assertEqual(ovs_quantum_agent.get_port_bindings(db,
+                                                             set([VIF_ID])),
+                         {VIF_ID: port})
+        # nothing is read for a bridge without interfaces
+        self.assertEqual(ovs_quantum_agent.get_port_bindings(db, set()), {})
+        self.mox.VerifyAll()
@@ -65,6 +65,7 @@ class TunnelTest(unittest.TestCase):
         self.mox.StubOutClassWithMocks(ovs_quantum_agent, 'OVSBridge')
         self.mock_int_bridge = ovs_quantum_agent.OVSBridge(self.INT_BRIDGE,
                                                            'sudo')
+        self.mock_int_bridge.defer_flows()
         self.mock_int_bridge.delete_port('patch-tun')
         self.mock_int_bridge.add_patch_port(
             'patch-tun', 'patch-int').AndReturn(self.TUN_OFPORT)
@@ -73,6 +74,7 @@ class TunnelTest(unittest.TestCase):
 
         self.mock_tun_bridge = ovs_quantum_agent.OVSBridge(self.TUN_BRIDGE,
                                                            'sudo')
+        self.mock_tun_bridge.defer_flows()
         self.mock_tun_bridge.reset_bridge()
         self.mock_tun_bridge.add_patch_port(
             'patch-int', 'patch-tun').AndReturn(self.INT_OFPORT)
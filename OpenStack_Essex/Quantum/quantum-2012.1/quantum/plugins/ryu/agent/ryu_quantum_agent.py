@@ -32,6 +32,9 @@ from subprocess import PIPE, Popen
 from ryu.app import rest_nw_id
 from ryu.app.client import OFPClient
 
+from quantum.plugins.openvswitch.agent import ovs_quantum_agent
+from quantum.plugins.openvswitch.agent import ovsdb_monitor
+
 
 OP_STATUS_UP = "UP"
 OP_STATUS_DOWN = "DOWN"
@@ -59,6 +62,10 @@ class VifPort:
 
 
 class OVSBridge:
+    # An ovsdb_monitor.OVSDBMonitor, if the bridge is read from a replica
+    # of the database instead of with ovs-vsctl.
+    monitor = None
+
     def __init__(self, br_name, root_helper):
         self.br_name = br_name
         self.root_helper = root_helper
@@ -121,45 +128,53 @@ class OVSBridge:
                         "param-key=nicira-iface-id",
                         "uuid=%s" % xs_vif_uuid]).strip()
 
-    def _vifport(self, name, external_ids):
-        ofport = self.db_get_val("Interface", name, "ofport")
-        return VifPort(name, ofport, external_ids["iface-id"],
-                       external_ids["attached-mac"], self)
+    def _get_interfaces(self):
+        """returns an ovsdb_monitor.Interface for each port"""
+        if self.monitor:
+            return self.monitor.get_interfaces(self.br_name)
+        return [ovsdb_monitor.Interface(
+                    name, None,
+                    self.db_get_map("Interface", name, "external_ids"))
+                for name in self.get_port_name_list()]
+
+    def _get_ofport(self, iface):
+        if iface.ofport is None:
+            return self.db_get_val("Interface", iface.name, "ofport")
+        return iface.ofport
+
+    def _vifport(self, iface, iface_id):
+        return VifPort(iface.name, self._get_ofport(iface), iface_id,
+                       iface.external_ids["attached-mac"], self)
 
     def _get_ports(self, get_port):
         ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            port = get_port(name)
+        for iface in self._get_interfaces():
+            port = get_port(iface)
             if port:
                 ports.append(port)
 
         return ports
 
-    def _get_vif_port(self, name):
-        external_ids = self.db_get_map("Interface", name, "external_ids")
+    def _get_vif_port(self, iface):
+        external_ids = iface.external_ids
         if "iface-id" in external_ids and "attached-mac" in external_ids:
-            return self._vifport(name, external_ids)
+            return self._vifport(iface, external_ids["iface-id"])
         elif ("xs-vif-uuid" in external_ids and
               "attached-mac" in external_ids):
             # if this is a xenserver and iface-id is not automatically
             # synced to OVS from XAPI, we grab it from XAPI directly
-            ofport = self.db_get_val("Interface", name, "ofport")
             iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-            return VifPort(name, ofport, iface_id,
-                           external_ids["attached-mac"], self)
+            return self._vifport(iface, iface_id)
 
     def get_vif_ports(self):
         "returns a VIF object for each VIF port"
         return self._get_ports(self._get_vif_port)
 
-    def _get_external_port(self, name):
-        external_ids = self.db_get_map("Interface", name, "external_ids")
-        if external_ids:
+    def _get_external_port(self, iface):
+        if iface.external_ids:
             return
 
-        ofport = self.db_get_val("Interface", name, "ofport")
-        return VifPort(name, ofport, None, None, self)
+        return VifPort(iface.name, self._get_ofport(iface), None, None, self)
 
     def get_external_ports(self):
         return self._get_ports(self._get_external_port)
@@ -193,8 +208,9 @@ def check_ofp_mode(db):
 
 
 class OVSQuantumOFPRyuAgent:
-    def __init__(self, integ_br, db, root_helper):
+    def __init__(self, integ_br, db, root_helper, monitor=None):
         self.root_helper = root_helper
+        self.monitor = monitor
         (ofp_controller_addr, ofp_rest_api_addr) = check_ofp_mode(db)
 
         self.nw_id_external = rest_nw_id.NW_ID_EXTERNAL
@@ -203,6 +219,8 @@ class OVSQuantumOFPRyuAgent:
 
     def _setup_integration_br(self, integ_br, ofp_controller_addr):
         self.int_br = OVSBridge(integ_br, self.root_helper)
+        if self.monitor:
+            self.int_br.monitor = self.monitor
         self.int_br.find_datapath_id()
         self.int_br.set_controller(ofp_controller_addr)
         for port in self.int_br.get_external_ports():
@@ -211,13 +229,9 @@ class OVSQuantumOFPRyuAgent:
     def _port_update(self, network_id, port):
         self.api.update_port(network_id, port.switch.datapath_id, port.ofport)
 
-    def _all_bindings(self, db):
-        """return interface id -> port which include network id bindings"""
-        return dict((port.interface_id, port) for port in db.ports.all())
-
     def daemon_loop(self, db):
         # on startup, register all existing ports
-        all_bindings = self._all_bindings(db)
+        all_bindings = ovs_quantum_agent.get_port_bindings(db)
 
         local_bindings = {}
         vif_ports = {}
@@ -236,11 +250,14 @@ class OVSQuantumOFPRyuAgent:
         old_local_bindings = local_bindings
 
         while True:
-            all_bindings = self._all_bindings(db)
+            ports = self.int_br.get_vif_ports()
+            vif_ids = set(port.vif_id for port in ports)
+            vif_ids.update(old_vif_ports)
+            all_bindings = ovs_quantum_agent.get_port_bindings(db, vif_ids)
 
             new_vif_ports = {}
             new_local_bindings = {}
-            for port in self.int_br.get_vif_ports():
+            for port in ports:
                 new_vif_ports[port.vif_id] = port
                 if port.vif_id in all_bindings:
                     net_id = all_bindings[port.vif_id].network_id
@@ -271,7 +288,11 @@ class OVSQuantumOFPRyuAgent:
             old_vif_ports = new_vif_ports
             old_local_bindings = new_local_bindings
             db.commit()
-            time.sleep(2)
+            if self.monitor:
+                # wake up early if the bridge changes
+                self.monitor.run(2)
+            else:
+                time.sleep(2)
 
 
 def main():
@@ -303,12 +324,24 @@ def main():
 
     root_helper = config.get("AGENT", "root_helper")
 
+    # Read the bridge from a replica of the OVS database when possible.
+    ovsdb_connection = ovsdb_monitor.DEFAULT_CONNECTION
+    if config.has_option("OVS", "ovsdb-connection"):
+        ovsdb_connection = config.get("OVS", "ovsdb-connection")
+    ovsdb_schema = ovsdb_monitor.DEFAULT_SCHEMA
+    if config.has_option("OVS", "ovsdb-schema"):
+        ovsdb_schema = config.get("OVS", "ovsdb-schema")
+    monitor = None
+    if ovsdb_connection:
+        monitor = ovsdb_monitor.create_monitor(ovsdb_connection,
+                                               ovsdb_schema)
+
     options = {"sql_connection": config.get("DATABASE", "sql_connection")}
     db = SqlSoup(options["sql_connection"])
 
     LOG.info("Connecting to database \"%s\" on %s",
              db.engine.url.database, db.engine.url.host)
-    plugin = OVSQuantumOFPRyuAgent(integ_br, db, root_helper)
+    plugin = OVSQuantumOFPRyuAgent(integ_br, db, root_helper, monitor)
     plugin.daemon_loop(db)
 
     sys.exit(0)
@@ -52,6 +52,10 @@ class OVSQuantumPluginBase(QuantumPluginBase):
     Subclass of OVSQuantumPluginBase must set self.driver to a subclass of
     OVSQuantumPluginDriverBase.
     """
+
+    supported_network_filters = db.NETWORK_FILTERS
+    supported_port_filters = db.PORT_FILTERS
+
     def __init__(self, conf_file, mod_file, configfile=None):
         super(OVSQuantumPluginBase, self).__init__()
         config = ConfigParser.ConfigParser()
@@ -77,7 +81,7 @@ class OVSQuantumPluginBase(QuantumPluginBase):
 
     def get_all_networks(self, tenant_id, **kwargs):
         nets = []
-        for net in db.network_list(tenant_id):
+        for net in db.network_list(tenant_id, kwargs.get('filter_opts')):
             LOG.debug("Adding network: %s", net.uuid)
             nets.append(self._make_net_dict(str(net.uuid), net.name,
                                             None, net.op_status))
@@ -137,8 +141,7 @@ class OVSQuantumPluginBase(QuantumPluginBase):
 
     def get_all_ports(self, tenant_id, net_id, **kwargs):
         db.validate_network_ownership(tenant_id, net_id)
-        ports = db.port_list(net_id)
-        # This plugin does not perform filtering at the moment
+        ports = db.port_list(net_id, kwargs.get('filter_opts'))
         return [{'port-id': str(port.uuid)} for port in ports]
 
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
@@ -167,6 +170,11 @@ class OVSQuantumPluginBase(QuantumPluginBase):
         port = db.port_get(port_id, net_id)
         return self._make_port_dict(port)
 
+    def get_ports_details(self, tenant_id, net_id, port_ids):
+        db.validate_network_ownership(tenant_id, net_id)
+        return [self._make_port_dict(port)
+                for port in db.ports_get(port_ids, net_id)]
+
     def plug_interface(self, tenant_id, net_id, port_id, remote_iface_id):
         db.validate_port_ownership(tenant_id, net_id, port_id)
         db.port_set_attachment(port_id, net_id, remote_iface_id)
@@ -30,6 +30,13 @@ class QuantumPluginBase(object):
 
     __metaclass__ = ABCMeta
 
+    # Names of the filter_opts that get_all_networks() and get_all_ports()
+    # apply themselves.  The API layer passes only these to the plugin and
+    # applies any others to the results.  None means the plugin receives all
+    # filter_opts and removes those it applied.
+    supported_network_filters = None
+    supported_port_filters = None
+
     @abstractmethod
     def get_all_networks(self, tenant_id, **kwargs):
         """
@@ -215,6 +222,20 @@ class QuantumPluginBase(object):
         """
         pass
 
+    def get_ports_details(self, tenant_id, net_id, port_ids):
+        """
+        Retrieves the details of several ports on the specified Virtual
+        Network at once.  Plugins should override this to avoid fetching
+        the ports one at a time.
+
+        :returns: a list with the mapping sequence get_port_details()
+                  returns for each of port_ids, in the same order
+        :raises: exception.PortNotFound
+        :raises: exception.NetworkNotFound
+        """
+        return [self.get_port_details(tenant_id, net_id, port_id)
+                for port_id in port_ids]
+
     @abstractmethod
     def plug_interface(self, tenant_id, net_id, port_id, remote_interface_id):
         """
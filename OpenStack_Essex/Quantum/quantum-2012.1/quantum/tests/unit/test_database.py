@@ -23,6 +23,7 @@ import logging
 import unittest
 
 
+from quantum.common import exceptions as q_exc
 from quantum.db import api as db
 from quantum.tests.unit import database_stubs as db_stubs
 
@@ -116,3 +117,57 @@ class QuantumDBTest(unittest.TestCase):
         self.dbtest.unplug_interface(net1["id"], port1["id"])
         port = self.dbtest.get_port(net1["id"], port1["id"])
         self.assertTrue(port[0]["attachment"] is None)
+
+    def testh_filter_networks(self):
+        """test to filter networks by their ports"""
+        net1 = db.network_create(self.tenant_id, "plugin_test1")
+        net2 = db.network_create(self.tenant_id, "plugin_test2")
+        port1 = db.port_create(net1.uuid, "ACTIVE")
+        db.port_create(net2.uuid, "DOWN")
+        db.port_set_attachment(port1.uuid, net1.uuid, "vif1.1")
+
+        def net_names(filters):
+            return sorted(net.name
+                          for net in db.network_list(self.tenant_id, filters))
+
+        self.assertEqual(net_names({"name": "plugin_test2"}),
+                         ["plugin_test2"])
+        self.assertEqual(net_names({"port-state": "ACTIVE"}),
+                         ["plugin_test1"])
+        self.assertEqual(net_names({"port-op-status": "DOWN"}),
+                         ["plugin_test2"])
+        self.assertEqual(net_names({"has-attachment": "false"}),
+                         ["plugin_test2"])
+        self.assertEqual(net_names({"attachment": "vif1.1",
+                                    "port": port1.uuid}),
+                         ["plugin_test1"])
+        self.assertEqual(net_names({"attachment": "vif1.1",
+                                    "port-state": "DOWN"}), [])
+
+    def testi_filter_ports(self):
+        """test to filter ports"""
+        net1 = db.network_create(self.tenant_id, "plugin_test1")
+        port1 = db.port_create(net1.uuid, "ACTIVE")
+        port2 = db.port_create(net1.uuid, "DOWN")
+        db.port_set_attachment(port1.uuid, net1.uuid, "vif1.1")
+
+        def port_ids(filters):
+            return [port.uuid for port in db.port_list(net1.uuid, filters)]
+
+        self.assertEqual(port_ids({"state": "DOWN"}), [port2.uuid])
+        self.assertEqual(port_ids({"op-status": "DOWN"}), [port2.uuid])
+        self.assertEqual(port_ids({"has-attachment": "True"}), [port1.uuid])
+        self.assertEqual(port_ids({"attachment": "vif1.2"}), [])
+
+    def testj_get_ports(self):
+        """test to get several ports at once"""
+        net1 = db.network_create(self.tenant_id, "plugin_test1")
+        net2 = db.network_create(self.tenant_id, "plugin_test2")
+        port1 = db.port_create(net1.uuid)
+        port2 = db.port_create(net1.uuid)
+        port3 = db.port_create(net2.uuid)
+        ports = db.ports_get([port2.uuid, port1.uuid], net1.uuid)
+        self.assertEqual([port.uuid for port in ports],
+                         [port2.uuid, port1.uuid])
+        self.assertRaises(q_exc.PortNotFound, db.ports_get,
+                          [port1.uuid, port3.uuid], net1.uuid)
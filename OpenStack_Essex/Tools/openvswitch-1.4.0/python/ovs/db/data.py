@@ -63,6 +63,8 @@ def returnUnchanged(x):
 
 
 class Atom(object):
+    __slots__ = ("type", "value")
+
     def __init__(self, type_, value=None):
         self.type = type_
         if value is not None:
@@ -80,6 +82,16 @@ class Atom(object):
         else:
             return 0
 
+    def __eq__(self, other):
+        if not isinstance(other, Atom):
+            return NotImplemented
+        return self.type == other.type and self.value == other.value
+
+    def __ne__(self, other):
+        if not isinstance(other, Atom):
+            return NotImplemented
+        return self.type != other.type or self.value != other.value
+
     def __hash__(self):
         return hash(self.value)
 
@@ -251,6 +263,8 @@ class Atom(object):
 
 
 class Datum(object):
+    __slots__ = ("type", "values")
+
     def __init__(self, type_, values={}):
         self.type = type_
         self.values = values
@@ -265,6 +279,16 @@ class Datum(object):
         else:
             return 0
 
+    def __eq__(self, other):
+        if not isinstance(other, Datum):
+            return NotImplemented
+        return self.values == other.values
+
+    def __ne__(self, other):
+        if not isinstance(other, Datum):
+            return NotImplemented
+        return self.values != other.values
+
     __hash__ = None
 
     def __contains__(self, item):
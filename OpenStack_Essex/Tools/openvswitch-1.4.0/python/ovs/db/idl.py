@@ -71,6 +71,10 @@ class Idl:
 
     - 'txn': The ovs.db.idl.Transaction object for the database transaction
       currently being constructed, if there is one, or None otherwise.
+
+    To find rows by the value of a column without scanning a whole table, the
+    client may ask the IDL to index the column with Idl.index() and then look
+    rows up with Idl.lookup().
 """
 
     def __init__(self, remote, schema):
@@ -107,6 +111,17 @@ class Idl:
         self.txn = None
         self._outstanding_txns = {}
 
+        # Secondary indexes, maintained as updates are applied.  Maps from a
+        # table name to a dict that maps from an indexed column name to a dict
+        # from each value in the column to the rows that have it, keyed by
+        # UUID.
+        self._indexes = {}
+
+        # Maps from a table name to the data of a row with default values in
+        # every column.  Datums are never modified in place, so new rows share
+        # these until the database server sends their real values.
+        self._default_data = {}
+
         for table in schema.tables.itervalues():
             for column in table.columns.itervalues():
                 if not hasattr(column, 'alert'):
@@ -114,6 +129,9 @@ class Idl:
             table.need_table = False
             table.rows = {}
             table.idl = self
+            self._default_data[table.name] = dict(
+                (column.name, ovs.db.data.Datum.default(column.type))
+                for column in table.columns.itervalues())
 
     def close(self):
         """Closes the connection to the database.  The IDL will no longer
@@ -252,6 +270,37 @@ class Idl:
             self.lock_name = lock_name
             self.__send_lock_request()
 
+    def index(self, table_name, column_name):
+        """Starts maintaining an index of the rows in the table named
+        'table_name' by the value of its column named 'column_name', for use
+        with Idl.lookup().  Indexing a column that is already indexed has no
+        effect.
+
+        A transaction must not be in progress."""
+        assert not self.txn
+        table = self.tables[table_name]
+        assert column_name in table.columns
+        indexes = self._indexes.setdefault(table_name, {})
+        if column_name in indexes:
+            return
+
+        index = indexes[column_name] = {}
+        for row in table.rows.itervalues():
+            _index_add(index, row._data[column_name], row)
+
+    def lookup(self, table_name, column_name, value):
+        """Returns a list of the rows in the table named 'table_name' whose
+        column named 'column_name' has the given 'value'.  For a set column,
+        returns the rows whose set includes 'value'; for a map column, the
+        rows whose map has 'value' as a key.  A row is represented by its Row
+        object and a UUID by its uuid.UUID.
+
+        The column must have been indexed with Idl.index().  The index
+        reflects the database as of the last call to Idl.run(), not any
+        changes made by the transaction in progress."""
+        index = self._indexes[table_name][column_name]
+        return index.get(_row_to_uuid(value), {}).values()
+
     def __clear(self):
         changed = False
 
@@ -260,6 +309,10 @@ class Idl:
                 changed = True
                 table.rows = {}
 
+        for indexes in self._indexes.itervalues():
+            for index in indexes.itervalues():
+                index.clear()
+
         if changed:
             self.change_seqno += 1
 
@@ -353,10 +406,19 @@ class Idl:
                                       'is not an object'
                                       % (table_name, uuid_string))
 
-                parser = ovs.db.parser.Parser(row_update, "row-update")
-                old = parser.get_optional("old", [dict])
-                new = parser.get_optional("new", [dict])
-                parser.finish()
+                # A large update has many thousands of <row-update>s, so only
+                # use an ovs.db.parser.Parser, which is slow, to report what is
+                # wrong with one that is malformed.
+                old = row_update.get("old")
+                new = row_update.get("new")
+                n_members = (old is not None) + (new is not None)
+                if (type(old) not in (dict, type(None))
+                    or type(new) not in (dict, type(None))
+                    or len(row_update) != n_members):
+                    parser = ovs.db.parser.Parser(row_update, "row-update")
+                    old = parser.get_optional("old", [dict])
+                    new = parser.get_optional("new", [dict])
+                    parser.finish()
 
                 if not old and not new:
                     raise error.Error('<row-update> missing "old" and '
@@ -368,6 +430,20 @@ class Idl:
     def __process_update(self, table, uuid, old, new):
         """Returns True if a column changed, False otherwise."""
         row = table.rows.get(uuid)
+        indexes = self._indexes.get(table.name)
+        if row and indexes:
+            for column_name, index in indexes.iteritems():
+                _index_remove(index, row._data[column_name], row)
+
+        changed = self.__do_process_update(table, uuid, row, old, new)
+
+        row = table.rows.get(uuid)
+        if row and indexes:
+            for column_name, index in indexes.iteritems():
+                _index_add(index, row._data[column_name], row)
+        return changed
+
+    def __do_process_update(self, table, uuid, row, old, new):
         changed = False
         if not new:
             # Delete row.
@@ -396,6 +472,11 @@ class Idl:
                 # XXX rate-limit
                 vlog.warn("cannot modify missing row %s in table %s"
                           % (uuid, table.name))
+            else:
+                # 'new' includes every column but 'old' only those that
+                # changed, so don't parse the others again.
+                new = dict((column_name, new[column_name])
+                           for column_name in old if column_name in new)
             if self.__row_update(table, row, new):
                 changed = True
         return changed
@@ -429,9 +510,7 @@ class Idl:
         return changed
 
     def __create_row(self, table, uuid):
-        data = {}
-        for column in table.columns.itervalues():
-            data[column.name] = ovs.db.data.Datum.default(column.type)
+        data = dict(self._default_data[table.name])
         row = table.rows[uuid] = Row(self, table, uuid, data)
         return row
 
@@ -449,6 +528,20 @@ class Idl:
             txn._process_reply(msg)
 
 
+def _index_add(index, datum, row):
+    for atom in datum.values:
+        index.setdefault(atom.value, {})[row.uuid] = row
+
+
+def _index_remove(index, datum, row):
+    for atom in datum.values:
+        rows = index.get(atom.value)
+        if rows is not None:
+            rows.pop(row.uuid, None)
+            if not rows:
+                del index[atom.value]
+
+
 def _uuid_to_row(atom, base):
     if base.ref_table:
         return base.ref_table.rows.get(atom)
@@ -494,13 +587,17 @@ class Row(object):
         d["a"] = "b"
         row.mycolumn = d
 """
+    # An IDL replica may hold many thousands of rows, so don't give each one
+    # an instance dictionary.
+    __slots__ = ("uuid", "_idl", "_table", "_data", "_changes", "_prereqs")
+
     def __init__(self, idl, table, uuid, data):
-        # All of the explicit references to self.__dict__ below are required
-        # to set real attributes with invoking self.__getattr__().
-        self.__dict__["uuid"] = uuid
+        # All of the explicit calls to object.__setattr__() below are required
+        # to set real attributes without invoking self.__setattr__().
+        object.__setattr__(self, "uuid", uuid)
 
-        self.__dict__["_idl"] = idl
-        self.__dict__["_table"] = table
+        object.__setattr__(self, "_idl", idl)
+        object.__setattr__(self, "_table", table)
 
         # _data is the committed data.  It takes the following values:
         #
@@ -509,7 +606,7 @@ class Row(object):
         #
         #   - None, if this row is newly inserted within the active transaction
         #     and thus has no committed form.
-        self.__dict__["_data"] = data
+        object.__setattr__(self, "_data", data)
 
         # _changes describes changes to this row within the active transaction.
         # It takes the following values:
@@ -524,12 +621,12 @@ class Row(object):
         #     is newly inserted within the active transaction.
         #
         #   - None, if this transaction deletes this row.
-        self.__dict__["_changes"] = {}
+        object.__setattr__(self, "_changes", {})
 
         # A dictionary whose keys are the names of columns that must be
         # verified as prerequisites when the transaction commits.  The values
         # in the dictionary are all None.
-        self.__dict__["_prereqs"] = {}
+        object.__setattr__(self, "_prereqs", {})
 
     def __getattr__(self, column_name):
         assert self._changes is not None
@@ -597,7 +694,7 @@ class Row(object):
         assert self._changes is not None
         if self._data is None:
             del self._idl.txn._txn_rows[self.uuid]
-        self.__dict__["_changes"] = None
+        object.__setattr__(self, "_changes", None)
         del self._table.rows[self.uuid]
 
 
@@ -707,8 +804,8 @@ class Transaction(object):
                 row._table.rows[row.uuid] = row
             elif row._data is None:
                 del row._table.rows[row.uuid]
-            row.__dict__["_changes"] = {}
-            row.__dict__["_prereqs"] = {}
+            object.__setattr__(row, "_changes", {})
+            object.__setattr__(row, "_prereqs", {})
         self._txn_rows = {}
 
     def commit(self):
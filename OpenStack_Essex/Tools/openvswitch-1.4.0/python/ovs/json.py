@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import absolute_import
+
+import json
 import re
 import StringIO
 import sys
@@ -153,12 +156,30 @@ def from_string(s):
 
 
 class Parser(object):
+    """Parses JSON text that is fed to it in pieces.
+
+    A top-level object or array is first only scanned for its end, which is
+    quick to find.  Once all of it has been fed, it is decoded by Python's
+    json module, whose decoder is written in C, and checked against the
+    rules of this parser.  Only text that the json module does not decode
+    the same way (including any text with errors) is lexed and parsed one
+    character at a time, which gives the same results and error messages as
+    when the fast path is turned off with 'use_fast_path'."""
+
     ## Maximum height of parsing stack. ##
     MAX_HEIGHT = 1000
 
     def __init__(self, check_trailer=False):
         self.check_trailer = check_trailer
 
+        # Fast path: whether it may still be used, the text fed since the
+        # start of input, and the state of the scan for the end of the
+        # top-level value, as a (depth, max_depth, in_string, escaped)
+        # tuple, or None if the value has not started yet.
+        self.use_fast_path = True
+        self.pending = []
+        self.scan_state = None
+
         # Lexical analysis.
         self.lex_state = Parser.__lex_start
         self.buffer = ""
@@ -239,56 +260,65 @@ class Parser(object):
     __number_re = re.compile("(-)?(0|[1-9][0-9]*)"
             "(?:\.([0-9]+))?(?:[eE]([-+]?[0-9]+))?$")
 
-    def __lex_finish_number(self):
-        s = self.buffer
+    @staticmethod
+    def __number_value(s):
+        """Returns the value of number 's' as an int, long or float, or an
+        error message string if it is out of range, or None if 's' is not
+        a valid number."""
         m = Parser.__number_re.match(s)
-        if m:
-            sign, integer, fraction, exp = m.groups()
-            if (exp is not None and
-                (long(exp) > sys.maxint or long(exp) < -sys.maxint - 1)):
-                self.__error("exponent outside valid range")
-                return
-
-            if fraction is not None and len(fraction.lstrip('0')) == 0:
-                fraction = None
-
-            sig_string = integer
-            if fraction is not None:
-                sig_string += fraction
-            significand = int(sig_string)
+        if not m:
+            return None
+
+        sign, integer, fraction, exp = m.groups()
+        if (exp is not None and
+            (long(exp) > sys.maxint or long(exp) < -sys.maxint - 1)):
+            return "exponent outside valid range"
+
+        if fraction is not None and len(fraction.lstrip('0')) == 0:
+            fraction = None
+
+        sig_string = integer
+        if fraction is not None:
+            sig_string += fraction
+        significand = int(sig_string)
+
+        pow10 = 0
+        if fraction is not None:
+            pow10 -= len(fraction)
+        if exp is not None:
+            pow10 += long(exp)
+
+        if significand == 0:
+            return 0
+        elif significand <= 2 ** 63:
+            while pow10 > 0 and significand <= 2 ** 63:
+                significand *= 10
+                pow10 -= 1
+            while pow10 < 0 and significand % 10 == 0:
+                significand /= 10
+                pow10 += 1
+            if (pow10 == 0 and
+                ((not sign and significand < 2 ** 63) or
+                 (sign and significand <= 2 ** 63))):
+                if sign:
+                    return -significand
+                else:
+                    return significand
+
+        value = float(s)
+        if value == float("inf") or value == float("-inf"):
+            return "number outside valid range"
+        if value == 0:
+            # Suppress negative zero.
+            value = 0
+        return value
 
-            pow10 = 0
-            if fraction is not None:
-                pow10 -= len(fraction)
-            if exp is not None:
-                pow10 += long(exp)
-
-            if significand == 0:
-                self.__parser_input(0)
-                return
-            elif significand <= 2 ** 63:
-                while pow10 > 0 and significand <= 2 ** 63:
-                    significand *= 10
-                    pow10 -= 1
-                while pow10 < 0 and significand % 10 == 0:
-                    significand /= 10
-                    pow10 += 1
-                if (pow10 == 0 and
-                    ((not sign and significand < 2 ** 63) or
-                     (sign and significand <= 2 ** 63))):
-                    if sign:
-                        self.__parser_input(-significand)
-                    else:
-                        self.__parser_input(significand)
-                    return
-
-            value = float(s)
-            if value == float("inf") or value == float("-inf"):
-                self.__error("number outside valid range")
-                return
-            if value == 0:
-                # Suppress negative zero.
-                value = 0
+    def __lex_finish_number(self):
+        s = self.buffer
+        value = Parser.__number_value(s)
+        if type(value) == str:
+            self.__error(value)
+        elif value is not None:
             self.__parser_input(value)
         elif re.match("-?0[0-9]", s):
             self.__error("leading zeros not allowed")
@@ -552,7 +582,7 @@ class Parser(object):
                              self.byte_number, message))
             self.done = True
 
-    def feed(self, s):
+    def __feed_slow(self, s):
         i = 0
         while True:
             if self.done or i >= len(s):
@@ -560,10 +590,168 @@ class Parser(object):
             if self.__lex_input(s[i]):
                 i += 1
 
+    # Used to find the end of a top-level value without lexing it.
+    __space_re = re.compile(r'[ \t\n\r]*')
+    __struct_re = re.compile(r'["\[\]{}]')
+    __string_re = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+    # Escapes that the json module accepts but this parser rejects.
+    __bad_escape_re = re.compile(r'\\u(?:0000|[dD][89abAB])')
+
+    # Matches a string, or a number or keyword and the character after it.
+    __token_re = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[-+.0-9a-zA-Z]+(.)',
+                            re.DOTALL)
+
+    def __scan(self, s, i):
+        """Scans 's' from index 'i' for the end of the top-level value.
+        Returns the index just past its end, or -1 if it does not end in
+        's'."""
+        depth, max_depth, in_string, escaped = self.scan_state
+        n = len(s)
+        end = -1
+        while i < n:
+            if escaped:
+                i += 1
+                escaped = False
+            elif in_string:
+                i = Parser.__string_re.match(s, i).end()
+                if i < n:
+                    if s[i] == '\\':
+                        escaped = True
+                    else:
+                        in_string = False
+                    i += 1
+            else:
+                m = Parser.__struct_re.search(s, i)
+                if m is None:
+                    break
+                c = m.group()
+                i = m.end()
+                if c == '"':
+                    in_string = True
+                elif c in "[{":
+                    depth += 1
+                    max_depth = max(depth, max_depth)
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        end = i
+                        break
+        self.scan_state = (depth, max_depth, in_string, escaped)
+        return end
+
+    @staticmethod
+    def __decode_number(s):
+        value = Parser.__number_value(s)
+        if value is None or type(value) == str:
+            raise ValueError("invalid number %s" % s)
+        return value
+
+    @staticmethod
+    def __decode_int(s):
+        value = int(s)
+        if -2 ** 63 < value < 2 ** 63:
+            return value
+        return Parser.__decode_number(s)
+
+    @staticmethod
+    def __decode_constant(s):
+        raise ValueError("invalid keyword %s" % s)
+
+    def __decode(self, text):
+        """Returns (True, value) if the json module decodes 'text' to the
+        same value as this parser would, otherwise (False, None)."""
+        if (self.scan_state[1] > Parser.MAX_HEIGHT
+            or Parser.__bad_escape_re.search(text)):
+            return False, None
+        try:
+            return True, json.loads(text,
+                                    parse_float=Parser.__decode_number,
+                                    parse_int=Parser.__decode_int,
+                                    parse_constant=Parser.__decode_constant)
+        except (ValueError, RuntimeError):
+            return False, None
+
+    def __count(self, text):
+        """Advances the position by 'text', as if it had been lexed."""
+        self.byte_number += len(text)
+        last_newline = text.rfind('\n')
+        if last_newline >= 0:
+            self.line_number += text.count('\n')
+            self.column_number = len(text) - last_newline - 1
+        else:
+            self.column_number += len(text)
+
+        # The character that ends a number or keyword is lexed twice.
+        for m in Parser.__token_re.finditer(text):
+            c = m.group(1)
+            if c is None:
+                continue
+            self.byte_number += 1
+            if c == '\n':
+                self.line_number += 1
+            elif m.start(1) > last_newline:
+                self.column_number += 1
+
+    def __fall_back(self, s):
+        """Stops using the fast path.  Lexes the text fed so far one
+        character at a time, then 's'."""
+        self.use_fast_path = False
+        pending = "".join(self.pending)
+        self.pending = []
+        self.__feed_slow(pending)
+        return self.__feed_slow(s)
+
+    def __feed_fast(self, s):
+        i = 0
+        if self.scan_state is None:
+            i = Parser.__space_re.match(s).end()
+            if i >= len(s):
+                self.pending.append(s[:])
+                return len(s)
+            elif s[i] not in "[{":
+                return self.__fall_back(s)
+            self.scan_state = (0, 0, False, False)
+
+        end = self.__scan(s, i)
+        if end < 0:
+            self.pending.append(s[:])
+            return len(s)
+
+        text = "".join(self.pending) + s[:end]
+        ok, value = self.__decode(text)
+        if not ok:
+            return self.__fall_back(s)
+
+        self.use_fast_path = False
+        self.pending = []
+        self.stack.append(value)
+        self.parse_state = Parser.__parse_end
+        if not self.check_trailer:
+            self.done = True
+            return end
+        # The position only appears in errors, which can now only be found
+        # in the trailer.
+        self.__count(text)
+        return end + self.__feed_slow(s[end:])
+
+    def feed(self, s):
+        """Feeds 's' to the parser.  Returns the number of characters of 's'
+        consumed, which is less than len(s) only if the end of a top-level
+        value was reached (without 'check_trailer') or an error was found.
+        """
+        if self.use_fast_path:
+            return self.__feed_fast(s)
+        return self.__feed_slow(s)
+
     def is_done(self):
         return self.done
 
     def finish(self):
+        if self.pending:
+            # The input ended within a top-level value.
+            self.__fall_back("")
+
         if self.lex_state == Parser.__lex_start:
             pass
         elif self.lex_state in (Parser.__lex_string,
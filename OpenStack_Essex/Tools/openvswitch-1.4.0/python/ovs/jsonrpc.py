@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import errno
 import os
 
@@ -178,12 +179,31 @@ class Message(object):
 
 
 class Connection(object):
+    # Number of bytes to receive at a time.  The receive size doubles each
+    # time a receive fills it, up to MAX_RECV_SIZE, so that large replies
+    # (such as the initial contents of a monitored database) take few
+    # calls.  It halves again when receives come back less than half full.
+    MIN_RECV_SIZE = 4096
+    MAX_RECV_SIZE = 256 * 1024
+
+    # Queued messages smaller than this are joined before they are sent, so
+    # that a burst of small messages takes a single call.
+    SEND_SIZE = 64 * 1024
+
     def __init__(self, stream):
         self.name = stream.name
         self.stream = stream
         self.status = 0
+        # Received data, of which the first 'input_offset' bytes have been
+        # fed to 'parser' already.
         self.input = ""
-        self.output = ""
+        self.input_offset = 0
+        self.recv_size = Connection.MIN_RECV_SIZE
+        # Queue of strings to send, of which the first 'output_offset' bytes
+        # have been sent already, and the number of bytes left to send.
+        self.output = collections.deque()
+        self.output_offset = 0
+        self.backlog = 0
         self.parser = None
 
     def close(self):
@@ -194,10 +214,16 @@ class Connection(object):
         if self.status:
             return
 
-        while len(self.output):
-            retval = self.stream.send(self.output)
+        while self.output:
+            self.__join_output()
+            head = self.output[0]
+            retval = self.stream.send(buffer(head, self.output_offset))
             if retval >= 0:
-                self.output = self.output[retval:]
+                self.backlog -= retval
+                self.output_offset += retval
+                if self.output_offset >= len(head):
+                    self.output.popleft()
+                    self.output_offset = 0
             else:
                 if retval != -errno.EAGAIN:
                     vlog.warn("%s: send error: %s" %
@@ -205,11 +231,28 @@ class Connection(object):
                     self.error(-retval)
                 break
 
+    def __join_output(self):
+        """Joins the messages at the head of the output queue into a single
+        string of up to SEND_SIZE bytes, if they are small enough."""
+        limit = Connection.SEND_SIZE
+        if (len(self.output) < 2
+            or len(self.output[0]) + len(self.output[1]) > limit):
+            return
+
+        chunks = [self.output.popleft()[self.output_offset:]]
+        size = len(chunks[0])
+        self.output_offset = 0
+        while self.output and size + len(self.output[0]) <= limit:
+            chunk = self.output.popleft()
+            chunks.append(chunk)
+            size += len(chunk)
+        self.output.appendleft("".join(chunks))
+
     def wait(self, poller):
         if not self.status:
             self.stream.run_wait(poller)
-            if len(self.output):
-                self.stream.send_wait()
+            if self.output:
+                self.stream.send_wait(poller)
 
     def get_status(self):
         return self.status
@@ -218,7 +261,7 @@ class Connection(object):
         if self.status != 0:
             return 0
         else:
-            return len(self.output)
+            return self.backlog
 
     def __log_msg(self, title, msg):
         vlog.dbg("%s: %s %s" % (self.name, title, msg))
@@ -229,8 +272,13 @@ class Connection(object):
 
         self.__log_msg("send", msg)
 
-        was_empty = len(self.output) == 0
-        self.output += ovs.json.to_string(msg.to_json())
+        was_empty = not self.output
+        s = ovs.json.to_string(msg.to_json())
+        if type(s) == unicode:
+            # Queue bytes, since parts of the queue are sent through buffers.
+            s = s.encode("utf-8")
+        self.output.append(s)
+        self.backlog += len(s)
         if was_empty:
             self.run()
         return self.status
@@ -254,8 +302,8 @@ class Connection(object):
             return self.status, None
 
         while True:
-            if not self.input:
-                error, data = self.stream.recv(4096)
+            if self.input_offset >= len(self.input):
+                error, data = self.stream.recv(self.recv_size)
                 if error:
                     if error == errno.EAGAIN:
                         return error, None
@@ -269,11 +317,15 @@ class Connection(object):
                     self.error(EOF)
                     return EOF, None
                 else:
-                    self.input += data
+                    self.__adjust_recv_size(len(data))
+                    self.input = data
+                    self.input_offset = 0
             else:
                 if self.parser is None:
                     self.parser = ovs.json.Parser()
-                self.input = self.input[self.parser.feed(self.input):]
+                # Feed a view of the unparsed data, to avoid copying it.
+                self.input_offset += self.parser.feed(
+                    buffer(self.input, self.input_offset))
                 if self.parser.is_done():
                     msg = self.__process_msg()
                     if msg:
@@ -281,6 +333,14 @@ class Connection(object):
                     else:
                         return self.status, None
 
+    def __adjust_recv_size(self, n):
+        if n >= self.recv_size:
+            self.recv_size = min(self.recv_size * 2,
+                                 Connection.MAX_RECV_SIZE)
+        elif n < self.recv_size / 2:
+            self.recv_size = max(self.recv_size / 2,
+                                 Connection.MIN_RECV_SIZE)
+
     def recv_block(self):
         while True:
             error, msg = self.recv()
@@ -326,7 +386,7 @@ class Connection(object):
         return msg
 
     def recv_wait(self, poller):
-        if self.status or self.input:
+        if self.status or self.input_offset < len(self.input):
             poller.immediate_wake()
         else:
             self.stream.recv_wait(poller)
@@ -335,7 +395,9 @@ class Connection(object):
         if self.status == 0:
             self.status = error
             self.stream.close()
-            self.output = ""
+            self.output.clear()
+            self.output_offset = 0
+            self.backlog = 0
 
 
 class Session(object):
@@ -323,6 +323,9 @@ tests_test_byte_order_LDADD = lib/libopenvswitch.a
 
 # Python tests.
 EXTRA_DIST += \
+	tests/bench-idl.py \
+	tests/bench-json.py \
+	tests/bench-jsonrpc.py \
 	tests/test-daemon.py \
 	tests/test-json.py \
 	tests/test-jsonrpc.py \
@@ -0,0 +1,188 @@
+# Copyright (c) 2012 Nicira Networks
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how fast ovs.db.idl applies updates to a large database and how
+much memory its rows take.
+
+The updates are built in memory, as ovs.jsonrpc would deliver them, and fed
+straight to the Idl, so JSON parsing and the network are not measured."""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import uuid
+
+import ovs.db.idl
+import ovs.db.schema
+import ovs.json
+
+STATISTICS = ("collisions", "rx_bytes", "rx_crc_err", "rx_dropped",
+              "rx_errors", "rx_packets", "tx_bytes", "tx_dropped",
+              "tx_errors", "tx_packets")
+
+
+def load_schema(schema_file):
+    schema = ovs.db.schema.DbSchema.from_json(ovs.json.from_file(schema_file))
+    for table_name in schema.tables.keys():
+        if table_name not in ("Bridge", "Port", "Interface"):
+            del schema.tables[table_name]
+    return schema
+
+
+def interface_json(i, n_updates):
+    return {"name": "tap%08d" % i,
+            "type": "",
+            "ofport": i + 1,
+            "admin_state": "up",
+            "link_state": "up",
+            "mtu": 1500,
+            "mac": "fe:16:3e:%02x:%02x:%02x" % (
+                (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff),
+            "options": ["map", []],
+            "external_ids": ["map", [
+                ["attached-mac", "fa:16:3e:00:00:01"],
+                ["iface-id", str(uuid.uuid5(uuid.NAMESPACE_OID, str(i)))],
+                ["iface-status", "active"]]],
+            "statistics": ["map", [[k, i * n_updates]
+                                   for k in STATISTICS]]}
+
+
+def synthesize_database(n_interfaces):
+    """Returns the reply to a "monitor" request for a bridge with
+    'n_interfaces' ports of one interface each, and the interface UUIDs."""
+    iface_uuids = [str(uuid.uuid4()) for i in range(n_interfaces)]
+    port_uuids = [str(uuid.uuid4()) for i in range(n_interfaces)]
+    interfaces = {}
+    ports = {}
+    for i in range(n_interfaces):
+        interfaces[iface_uuids[i]] = {"new": interface_json(i, 0)}
+        ports[port_uuids[i]] = {"new": {
+            "name": "tap%08d" % i,
+            "interfaces": ["uuid", iface_uuids[i]],
+            "tag": 1 + i % 4094,
+            "trunks": ["set", []]}}
+    bridges = {str(uuid.uuid4()): {"new": {
+        "name": "br-int",
+        "ports": ["set", [["uuid", port] for port in sorted(port_uuids)]]}}}
+    return ({"Bridge": bridges, "Port": ports, "Interface": interfaces},
+            iface_uuids)
+
+
+def synthesize_update(iface_uuids, n):
+    """Returns the n'th "update" for interfaces 'iface_uuids', in which each
+    interface's statistics changed."""
+    interfaces = {}
+    for i, iface_uuid in enumerate(iface_uuids):
+        new = interface_json(i, n)
+        interfaces[iface_uuid] = {"old": {"statistics": ["map", [
+            [k, i * (n - 1)] for k in STATISTICS]]},
+                                  "new": new}
+    return {"Interface": interfaces}
+
+
+def object_size(obj, seen):
+    """Returns the bytes taken by 'obj' and the objects it refers to, except
+    for those in 'seen'."""
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if type(obj) == dict:
+        for key, value in obj.iteritems():
+            size += object_size(key, seen) + object_size(value, seen)
+    elif type(obj) in (list, tuple, set):
+        for element in obj:
+            size += object_size(element, seen)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += object_size(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if hasattr(obj, slot):
+                    size += object_size(getattr(obj, slot), seen)
+    return size
+
+
+def row_size(idl, table_name):
+    """Returns the average bytes taken by a row of 'table_name', not counting
+    the schema, which all rows share."""
+    table = idl.tables[table_name]
+    seen = set([id(idl), id(table)])
+    for column in table.columns.itervalues():
+        object_size(column, seen)
+    return sum(object_size(row, seen)
+               for row in table.rows.itervalues()) / len(table.rows)
+
+
+def parse_update(idl, update):
+    # Only Idl.run() applies updates, and it needs a database server to talk
+    # to, so reach in and apply them directly.
+    idl._Idl__do_parse_update(update)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Applies updates to a large ovs.db.idl.Idl.")
+    parser.add_argument("schema", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__),
+                                             os.pardir, "vswitchd",
+                                             "vswitch.ovsschema"),
+                        help="vswitch.ovsschema (default: %(default)s)")
+    parser.add_argument("--interfaces", type=int, default=10000,
+                        help="interfaces in the database "
+                        "(default: %(default)s)")
+    parser.add_argument("--updates", type=int, default=5,
+                        help="updates to all interfaces' statistics "
+                        "(default: %(default)s)")
+    args = parser.parse_args()
+
+    idl = ovs.db.idl.Idl("unix:/nonexistent", load_schema(args.schema))
+    database, iface_uuids = synthesize_database(args.interfaces)
+    updates = [synthesize_update(iface_uuids, n + 1)
+               for n in range(args.updates)]
+
+    gc.collect()
+    start = time.time()
+    parse_update(idl, database)
+    load_time = time.time() - start
+
+    start = time.time()
+    for update in updates:
+        parse_update(idl, update)
+    update_time = time.time() - start
+
+    lookup_time = None
+    if hasattr(idl, "index"):
+        idl.index("Interface", "name")
+        start = time.time()
+        for i in range(args.interfaces):
+            idl.lookup("Interface", "name", "tap%08d" % i)
+        lookup_time = time.time() - start
+
+    print "%d interfaces" % args.interfaces
+    print "initial load:     %8.3f s  (%.0f rows/s)" % (
+        load_time, args.interfaces * 2 / load_time)
+    print "updates:          %8.3f s  (%.0f rows/s)" % (
+        update_time, args.interfaces * args.updates / update_time)
+    if lookup_time is not None:
+        print "lookups by name:  %8.3f s  (%.0f lookups/s)" % (
+            lookup_time, args.interfaces / lookup_time)
+    print "bytes per Interface row: %d" % row_size(idl, "Interface")
+    print "bytes per Port row:      %d" % row_size(idl, "Port")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Copyright (c) 2012 Nicira Networks
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the throughput of ovs.json.Parser with and without its fast
+path, on large monitor updates fed to it in pieces as ovs.jsonrpc does."""
+
+import argparse
+import sys
+import time
+import uuid
+
+import ovs.json
+
+
+def synthesize_update(n_rows):
+    """Returns an "update" notification for 'n_rows' rows of the Interface
+    table whose statistics changed, as ovsdb-server would send it."""
+    rows = {}
+    for i in range(n_rows):
+        old = {"statistics": ["map", [["rx_bytes", i], ["rx_packets", i],
+                                      ["tx_bytes", i], ["tx_packets", i]]]}
+        new = {"name": "tap%08d" % i,
+               "ofport": i + 1,
+               "external_ids": ["map", [
+                   ["attached-mac", "fa:16:3e:00:00:01"],
+                   ["iface-id", str(uuid.uuid4())],
+                   ["iface-status", "active"]]],
+               "statistics": ["map", [["rx_bytes", i * 1500.5],
+                                      ["rx_packets", i + 1],
+                                      ["tx_bytes", i * 1500],
+                                      ["tx_packets", i + 1]]]}
+        rows[str(uuid.uuid4())] = {"old": old, "new": new}
+    return ovs.json.to_string({"id": None,
+                               "method": "update",
+                               "params": [None, {"Interface": rows}]})
+
+
+def parse(data, chunk_size, use_fast_path):
+    parser = ovs.json.Parser()
+    parser.use_fast_path = use_fast_path
+    i = 0
+    while i < len(data) and not parser.is_done():
+        i += parser.feed(buffer(data, i, chunk_size))
+    return parser.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares ovs.json.Parser with and without its fast "
+        "path.")
+    parser.add_argument("recording", nargs="?",
+                        help="file holding a single JSON-RPC message, for "
+                        "example a monitor update received from "
+                        "ovsdb-server")
+    parser.add_argument("--rows", type=int, default=5000,
+                        help="rows in the synthesized update used when no "
+                        "recording is given (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=4096,
+                        help="bytes fed to the parser at a time "
+                        "(default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.recording:
+        data = open(args.recording).read()
+    else:
+        data = synthesize_update(args.rows)
+    if type(data) == unicode:
+        data = data.encode("utf-8")
+
+    results = {}
+    print "%10s %10s %10s %10s" % ("parser", "bytes", "seconds", "MB/s")
+    for use_fast_path in (False, True):
+        start = time.time()
+        results[use_fast_path] = parse(data, args.chunk_size, use_fast_path)
+        elapsed = time.time() - start
+        print "%10s %10d %10.3f %10.1f" % (
+            use_fast_path and "fast" or "slow", len(data), elapsed,
+            len(data) / elapsed / 1e6)
+
+    if results[False] != results[True]:
+        sys.stderr.write("parsers disagree\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Copyright (c) 2012 Nicira Networks
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures how fast ovs.jsonrpc sends and receives a large monitor reply.
+
+The reply is replayed through a socket pair: a child process writes it to
+one end while a Connection receives it from the other, then a Connection
+sends it back while the child reads it."""
+
+import argparse
+import os
+import socket
+import sys
+import time
+import uuid
+
+import ovs.json
+import ovs.jsonrpc
+import ovs.stream
+
+
+def synthesize_monitor_reply(n_rows):
+    """Returns a reply to a "monitor" request for the Interface table of a
+    switch with 'n_rows' interfaces, as ovsdb-server would send it."""
+    rows = {}
+    for i in range(n_rows):
+        name = "tap%08d" % i
+        rows[str(uuid.uuid4())] = {"new": {
+            "name": name,
+            "type": "",
+            "ofport": i + 1,
+            "admin_state": "up",
+            "link_state": "up",
+            "mac_in_use": "fe:16:3e:%02x:%02x:%02x" % (
+                (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff),
+            "options": ["map", []],
+            "external_ids": ["map", [
+                ["attached-mac", "fa:16:3e:00:00:01"],
+                ["iface-id", str(uuid.uuid4())],
+                ["iface-status", "active"],
+                ["vm-uuid", str(uuid.uuid4())]]],
+            "statistics": ["map", [[k, i] for k in (
+                "collisions", "rx_bytes", "rx_crc_err", "rx_dropped",
+                "rx_errors", "rx_packets", "tx_bytes", "tx_dropped",
+                "tx_errors", "tx_packets")]]}}
+    msg = ovs.jsonrpc.Message.create_reply({"Interface": rows}, 0)
+    return ovs.json.to_string(msg.to_json())
+
+
+def read_messages(data):
+    """Splits recorded JSON-RPC traffic into messages."""
+    messages = []
+    while data:
+        parser = ovs.json.Parser()
+        n = parser.feed(data)
+        data = data[n:].lstrip()
+        json = parser.finish()
+        if type(json) in [str, unicode]:
+            sys.stderr.write("error parsing recording: %s\n" % json)
+            sys.exit(1)
+        msg = ovs.jsonrpc.Message.from_json(json)
+        if not isinstance(msg, ovs.jsonrpc.Message):
+            sys.stderr.write("bad JSON-RPC message in recording: %s\n" % msg)
+            sys.exit(1)
+        messages.append(msg)
+    return messages
+
+
+def replay(messages):
+    data = "".join(ovs.json.to_string(msg.to_json()) for msg in messages)
+    sock, child_sock = socket.socketpair()
+    pid = os.fork()
+    if not pid:
+        sock.close()
+        child_sock.sendall(data)
+        n = 0
+        while n < len(data):
+            n += len(child_sock.recv(65536))
+        os._exit(0)
+    child_sock.close()
+    sock.setblocking(0)
+    rpc = ovs.jsonrpc.Connection(ovs.stream.Stream(sock, "replay", None, 0))
+
+    start = time.time()
+    for i in range(len(messages)):
+        error, msg = rpc.recv_block()
+        if error:
+            sys.stderr.write("receive failed: %s\n" % os.strerror(error))
+            sys.exit(1)
+    recv_time = time.time() - start
+
+    start = time.time()
+    for msg in messages[:-1]:
+        rpc.send(msg)
+    error = rpc.send_block(messages[-1])
+    if error:
+        sys.stderr.write("send failed: %s\n" % os.strerror(error))
+        sys.exit(1)
+    send_time = time.time() - start
+
+    rpc.close()
+    os.waitpid(pid, 0)
+    return len(data), recv_time, send_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replays a monitor reply through ovs.jsonrpc.")
+    parser.add_argument("recording", nargs="?",
+                        help="file of JSON-RPC messages as received from "
+                        "ovsdb-server, for example the reply to a "
+                        "\"monitor\" request captured with socat -v")
+    parser.add_argument("--rows", type=int, default=5000,
+                        help="rows in the synthesized reply used when no "
+                        "recording is given (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of replays (default: %(default)s)")
+    args = parser.parse_args()
+
+    if args.recording:
+        messages = read_messages(open(args.recording).read().strip())
+    else:
+        messages = read_messages(synthesize_monitor_reply(args.rows))
+
+    print "%10s %10s %10s %10s %10s" % ("bytes", "recv s", "recv MB/s",
+                                        "send s", "send MB/s")
+    for i in range(args.repeat):
+        size, recv_time, send_time = replay(messages)
+        print "%10d %10.3f %10.1f %10.3f %10.1f" % (
+            size, recv_time, size / recv_time / 1e6,
+            send_time, size / send_time / 1e6)
+
+
+if __name__ == "__main__":
+    main()